@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+缓存并发性能测试脚本
+
+比较单锁的 LocMemBackend 与分段加锁的 ShardedBackend 在不同线程数下的吞吐量。
+用法: python benchmark_cache.py [每线程操作数]
+"""
+import os
+import sys
+import time
+import random
+import threading
+import django
+
+# 设置Django环境
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'library_management.settings')
+django.setup()
+
+from library_management.cache import EnhancedCache
+from library_management.cache_backends import create_cache_backend
+
+
+THREAD_COUNTS = [1, 2, 4, 8, 16]
+KEY_COUNT = 500
+READ_RATIO = 0.9
+
+
+def build_cache(backend_name):
+    """创建预热好的缓存实例"""
+    if backend_name == 'sharded':
+        backend = create_cache_backend('sharded', shards=16, max_size=KEY_COUNT * 2)
+    else:
+        backend = create_cache_backend('locmem', max_size=KEY_COUNT * 2)
+    cache = EnhancedCache(default_timeout=600, backend=backend)
+    for i in range(KEY_COUNT):
+        cache.set(f"book_{i}", {'id': i, 'title': f"图书{i}"}, namespace='books')
+    return cache
+
+
+def run_workload(cache, thread_count, ops_per_thread):
+    """多线程混合读写，返回每秒操作数"""
+    barrier = threading.Barrier(thread_count + 1)
+
+    def worker(seed):
+        rng = random.Random(seed)
+        keys = [f"book_{rng.randrange(KEY_COUNT)}" for _ in range(ops_per_thread)]
+        barrier.wait()
+        for key in keys:
+            if rng.random() < READ_RATIO:
+                cache.get(key, namespace='books')
+            else:
+                cache.set(key, {'title': key}, namespace='books')
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(thread_count)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start_time = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start_time
+    return thread_count * ops_per_thread / elapsed
+
+
+def benchmark_cache_scaling(ops_per_thread=20000):
+    """测试吞吐量随线程数的变化"""
+    print("=== 缓存并发吞吐量测试 ===")
+    print(f"键数量: {KEY_COUNT}，读比例: {READ_RATIO:.0%}，每线程操作数: {ops_per_thread}")
+    print(f"\n{'线程数':>6} | {'locmem ops/s':>14} | {'sharded ops/s':>14} | {'提升':>8}")
+    print('-' * 52)
+
+    for thread_count in THREAD_COUNTS:
+        locmem_ops = run_workload(build_cache('locmem'), thread_count, ops_per_thread)
+        sharded_ops = run_workload(build_cache('sharded'), thread_count, ops_per_thread)
+        improvement = (sharded_ops - locmem_ops) / locmem_ops * 100
+        print(f"{thread_count:>6} | {locmem_ops:>14,.0f} | {sharded_ops:>14,.0f} | {improvement:>7.1f}%")
+
+    sharded = build_cache('sharded')
+    run_workload(sharded, 4, ops_per_thread)
+    print(f"\n分段键分布: {sharded.backend.shard_sizes()}")
+    print(f"合并后的统计: {sharded.get_stats()}")
+
+
+if __name__ == "__main__":
+    try:
+        ops = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+        benchmark_cache_scaling(ops)
+        print("\n[成功] 性能测试完成！")
+    except Exception as e:
+        print(f"\n[错误] 测试过程中出现错误: {str(e)}")
+        import traceback
+        traceback.print_exc()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+数据库索引测试脚本
+
+在测试数据库中生成图书和借阅记录，对 books/views.py、borrowing/views.py、borrowing/emails.py
+中的高频查询分别在删除和重新创建 Book、BorrowRecord 的 Meta.indexes 前后执行 EXPLAIN 并计时，
+对比查询计划从全表扫描 / 临时排序变为索引查找。
+用法: python benchmark_indexes.py [图书数量] [借阅记录数量]
+"""
+import os
+import sys
+import time
+import re
+import random
+from datetime import timedelta
+import django
+
+# 设置Django环境
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'library_management.settings')
+django.setup()
+
+from django.db import connection
+from django.db.models import F
+from django.utils import timezone
+
+RUNS = 20
+
+
+def populate(book_count, record_count, seed=42):
+    """批量生成图书、用户和借阅记录（bulk_create 不触发信号）"""
+    from books.models import Book
+    from borrowing.models import BorrowRecord
+    from categories.models import Category
+    from accounts.models import CustomUser
+
+    rng = random.Random(seed)
+    now = timezone.now()
+    categories = Category.objects.bulk_create([Category(name=f"分类{i}") for i in range(20)])
+    users = CustomUser.objects.bulk_create([
+        CustomUser(username=f"reader{i}", email=f"reader{i}@example.com") for i in range(500)
+    ])
+    Book.objects.bulk_create([
+        Book(title=f"图书{rng.randrange(book_count):07d}", author=f"作者{i % 3000}", isbn=f"978{i:010d}",
+             category=rng.choice(categories), total_copies=3,
+             available_copies=0 if i % 8 == 0 else rng.randint(1, 3),
+             status='borrowed' if i % 8 == 0 else 'available')
+        for i in range(book_count)
+    ], batch_size=2000)
+    book_ids = list(Book.objects.values_list('id', flat=True))
+
+    records = []
+    for i in range(record_count):
+        # 大部分记录已归还；约 5% 仍在借阅中，借阅时间在最近 45 天内（借期 30 天，部分已逾期）
+        status = 'borrowed' if rng.random() < 0.05 else 'returned'
+        borrow_date = now - timedelta(days=rng.randint(0, 45 if status == 'borrowed' else 720))
+        records.append(BorrowRecord(
+            user=rng.choice(users), book_id=rng.choice(book_ids), status=status,
+            due_date=borrow_date + timedelta(days=30),
+            return_date=None if status == 'borrowed' else borrow_date + timedelta(days=rng.randint(1, 30)),
+        ))
+    BorrowRecord.objects.bulk_create(records, batch_size=2000)
+    # bulk_create 时 auto_now_add 使用当前时间，按应还时间改回借阅时间
+    BorrowRecord.objects.update(borrow_date=F('due_date') - timedelta(days=30))
+    return users[0], book_ids[0], categories[0]
+
+
+def hot_queries(user, book_id, category):
+    """与视图中相同的查询（名称, QuerySet）"""
+    from books.models import Book
+    from borrowing.models import BorrowRecord
+    now = timezone.now()
+    return [
+        ('图书列表（书名排序）', Book.objects.order_by('title', 'id')[:12]),
+        ('分类图书列表', Book.objects.filter(category=category).order_by('title', 'id')[:12]),
+        ('最新图书', Book.objects.order_by('-created_at')[:8]),
+        ('可借图书数', Book.objects.filter(available_copies__gt=0)),
+        ('已借出图书数', Book.objects.filter(available_copies=0, status='borrowed')),
+        ('借阅记录列表', BorrowRecord.objects.order_by('-borrow_date')[:20]),
+        ('我的借阅记录', BorrowRecord.objects.filter(user=user).order_by('-borrow_date')[:10]),
+        ('重复借阅检查', BorrowRecord.objects.filter(
+            user=user, book_id=book_id, status__in=['borrowed', 'overdue'])[:1]),
+        # check_and_update_overdue_status 执行 UPDATE，不排序
+        ('个人逾期检查', BorrowRecord.objects.filter(user=user, status='borrowed', due_date__lt=now).order_by()),
+        ('逾期检查', BorrowRecord.objects.filter(status='borrowed', due_date__lt=now).order_by()),
+        ('到期提醒', BorrowRecord.objects.filter(status='borrowed')),
+    ]
+
+
+def plan(queryset):
+    """EXPLAIN 结果压缩为一行"""
+    # SQLite 的每行以节点编号开头（"3 0 0 SCAN ..."），去掉编号
+    lines = [re.sub(r'^\d+ \d+ \d+ ', '', line.strip()) for line in queryset.explain().splitlines()]
+    return '; '.join(line for line in lines if line)
+
+
+def timed(queryset):
+    """执行多次取平均耗时（毫秒），只取主键，避免创建模型实例的开销掩盖查询本身"""
+    start = time.perf_counter()
+    for _ in range(RUNS):
+        list(queryset.values_list('pk', flat=True))
+    return (time.perf_counter() - start) / RUNS * 1000
+
+
+def model_indexes():
+    """(模型, 索引) 列表：只删除和重建 Meta.indexes，不回退迁移，其他字段保持不变"""
+    from books.models import Book
+    from borrowing.models import BorrowRecord
+    return [(model, index) for model in (Book, BorrowRecord) for index in model._meta.indexes]
+
+
+def measure(queries):
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE")
+    return {name: (plan(queryset), timed(queryset)) for name, queryset in queries}
+
+
+def benchmark_indexes(book_count=50000, record_count=200000):
+    """对比添加索引前后的查询计划和耗时"""
+    print("=== 数据库索引测试 ===")
+    print(f"数据库: {connection.vendor}，图书: {book_count:,}，借阅记录: {record_count:,}")
+
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        queries = hot_queries(*populate(book_count, record_count))
+
+        indexes = model_indexes()
+        with connection.schema_editor() as schema_editor:
+            for model, index in indexes:
+                schema_editor.remove_index(model, index)
+        before = measure(queries)
+        with connection.schema_editor() as schema_editor:
+            for model, index in indexes:
+                schema_editor.add_index(model, index)
+        after = measure(queries)
+
+        for name, _ in queries:
+            before_plan, before_ms = before[name]
+            after_plan, after_ms = after[name]
+            print(f"\n{name}: {before_ms:.2f} ms -> {after_ms:.2f} ms")
+            print(f"  添加索引前: {before_plan}")
+            print(f"  添加索引后: {after_plan}")
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == "__main__":
+    try:
+        books = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+        records = int(sys.argv[2]) if len(sys.argv) > 2 else 200000
+        benchmark_indexes(books, records)
+        print("\n[成功] 测试完成！")
+    except Exception as e:
+        print(f"\n[错误] 测试过程中出现错误: {str(e)}")
+        import traceback
+        traceback.print_exc()
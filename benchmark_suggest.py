@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+搜索建议索引性能测试脚本
+
+用合成的图书数据（不访问数据库）构建 books/suggest.py 的 n-gram 索引，
+报告构建时间、内存占用，以及正确输入、错字输入和 ISBN 前缀的查询延迟。
+用法: python benchmark_suggest.py [图书数量]
+"""
+import os
+import sys
+import gc
+import time
+import random
+import django
+
+# 设置Django环境
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'library_management.settings')
+django.setup()
+
+from books.suggest import TrigramIndex
+
+
+# 常用词放在词表前部，按词频排名的倒数（近似 Zipf 分布）抽取，其余为随机生成的词
+CJK_WORDS = ['三体', '活着', '围城', '平凡', '世界', '红楼', '梦想', '百年', '孤独', '时间', '简史', '人类',
+             '历史', '算法', '导论', '数据', '结构', '深入', '理解', '计算机', '系统', '设计', '模式', '哲学',
+             '经济', '原理', '中国', '文学', '故事', '城市', '记忆', '银河', '帝国', '科学', '艺术', '生活']
+LATIN_WORDS = ['python', 'django', 'database', 'history', 'science', 'design', 'patterns', 'learning',
+               'machine', 'network', 'system', 'world', 'galaxy', 'empire', 'garden', 'silence',
+               'harry', 'potter', 'stone', 'chamber', 'secret', 'night', 'river', 'mountain']
+SYLLABLES = ['ka', 'lo', 'mi', 'ra', 'ten', 'vor', 'sha', 'din', 'el', 'qu', 'bar', 'nis', 'ot', 'pe',
+             'lum', 'gra', 'fi', 'sto', 'wen', 'ix']
+SURNAMES = '王李张刘陈杨黄赵吴周徐孙马朱胡郭何高林罗'
+GIVEN = '伟芳娜敏静丽强磊军洋勇艳杰娟涛明超秀霞平刚桂英华慈欣'
+LATIN_AUTHORS = ['Rowling', 'Tolkien', 'Orwell', 'Knuth', 'Hawking', 'Asimov', 'Austen', 'Dickens']
+VOCABULARY_SIZE = 5000
+
+
+def build_vocabulary(rng):
+    """生成中文和英文词表及对应的累计权重"""
+    common_chars = [chr(0x4e00 + rng.randrange(0x51a5)) for _ in range(3000)]
+    cjk = list(CJK_WORDS)
+    while len(cjk) < VOCABULARY_SIZE:
+        cjk.append(''.join(rng.choices(common_chars, k=rng.randint(2, 3))))
+    latin = list(LATIN_WORDS)
+    while len(latin) < VOCABULARY_SIZE:
+        latin.append(''.join(rng.choices(SYLLABLES, k=rng.randint(2, 4))))
+    weights = []
+    total = 0.0
+    for rank in range(VOCABULARY_SIZE):
+        total += 1.0 / (rank + 1)
+        weights.append(total)
+    return cjk, latin, weights
+
+
+def generate_books(count, seed=42):
+    """生成 (图书ID, 书名, 作者, ISBN) 列表"""
+    rng = random.Random(seed)
+    cjk, latin, weights = build_vocabulary(rng)
+    books = []
+    for book_id in range(1, count + 1):
+        if rng.random() < 0.7:
+            title = ''.join(rng.choices(cjk, cum_weights=weights, k=rng.randint(2, 4)))
+            author = rng.choice(SURNAMES) + ''.join(rng.choices(GIVEN, k=rng.randint(1, 2)))
+        else:
+            title = ' '.join(rng.choices(latin, cum_weights=weights, k=rng.randint(2, 5))).title()
+            author = rng.choice(LATIN_AUTHORS)
+        title = f"{title} {rng.randint(1, 999)}" if rng.random() < 0.3 else title
+        isbn = f"978{book_id:010d}"
+        books.append((book_id, title, author, isbn))
+    return books
+
+
+def add_typo(text, rng):
+    """随机替换一个字符，模拟输错"""
+    position = rng.randrange(len(text))
+    replacement = rng.choice('abcdefghijklmnopqrstuvwxyz') if text[position].isascii() else rng.choice(GIVEN)
+    return text[:position] + replacement + text[position + 1:]
+
+
+def measure(index, queries, limit=10):
+    """返回 (p50, p95, 最大值) 毫秒与有结果的查询比例"""
+    timings = []
+    found = 0
+    for query in queries:
+        start = time.perf_counter()
+        results = index.suggest(query, limit)
+        timings.append((time.perf_counter() - start) * 1000)
+        found += bool(results)
+    timings.sort()
+    return (timings[len(timings) // 2], timings[int(len(timings) * 0.95)], timings[-1],
+            found / len(queries) * 100)
+
+
+def benchmark_suggest(count=1000000, query_count=1000):
+    """测试索引的构建时间、内存占用和查询延迟"""
+    print("=== 搜索建议索引性能测试 ===")
+    print(f"图书数量: {count:,}，每类查询数: {query_count}")
+
+    books = generate_books(count)
+
+    gc.collect()
+    start_time = time.perf_counter()
+    index = TrigramIndex()
+    index.load(books)
+    build_seconds = time.perf_counter() - start_time
+
+    stats = index.get_stats()
+    print(f"\n构建时间: {build_seconds:.1f}s（{count / build_seconds:,.0f} 本/秒）")
+    print(f"索引内存: {index.memory_usage() / 1024 / 1024:.0f} MB")
+    print(f"n-gram 数: {stats['grams']:,}，倒排条目数: {stats['entries']:,}")
+
+    rng = random.Random(7)
+    samples = rng.sample(books, query_count)
+    workloads = {
+        '书名前缀': [title[:rng.randint(2, 6)] for _, title, _, _ in samples],
+        '书名错字': [add_typo(title[:8], rng) for _, title, _, _ in samples],
+        '作者': [author for _, _, author, _ in samples],
+        'ISBN前缀': [isbn[:rng.randint(6, 12)] for _, _, _, isbn in samples],
+    }
+    print(f"\n{'查询类型':<8} | {'p50 ms':>8} | {'p95 ms':>8} | {'max ms':>8} | {'有结果':>7}")
+    print('-' * 52)
+    for name, queries in workloads.items():
+        p50, p95, worst, found = measure(index, queries)
+        print(f"{name:<8} | {p50:>8.2f} | {p95:>8.2f} | {worst:>8.2f} | {found:>6.1f}%")
+
+    start_time = time.perf_counter()
+    for book_id, title, author, isbn in samples:
+        index.add(book_id, title + ' 修订版', author, isbn)
+    print(f"\n增量更新: {(time.perf_counter() - start_time) / query_count * 1000:.3f} ms/本")
+    print(f"查询示例: {index.suggest(add_typo('harry potter', rng), 3)}")
+
+
+if __name__ == "__main__":
+    try:
+        total = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+        benchmark_suggest(total)
+        print("\n[成功] 性能测试完成！")
+    except Exception as e:
+        print(f"\n[错误] 测试过程中出现错误: {str(e)}")
+        import traceback
+        traceback.print_exc()
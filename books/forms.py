@@ -1,6 +1,8 @@
 from django import forms
 from django.core.exceptions import ValidationError
+from django.db.models import Q
 from .models import Book
+from .isbn import normalize_isbn
 from categories.models import Category
 
 class BookForm(forms.ModelForm):
@@ -53,6 +55,14 @@ class BookForm(forms.ModelForm):
             import re
             if not re.match(r'^[\d-]{10,17}$', isbn.replace('-', '')):
                 raise ValidationError('ISBN格式不正确')
+            # 按原样和规范化的 ISBN-13 查重（同一本书的 ISBN-10 或带连字符的写法；
+            # 无法规范化或 ISBN-13 因重复留空的旧数据只能按原样比较）
+            duplicates = Q(isbn=isbn)
+            isbn13 = normalize_isbn(isbn)
+            if isbn13:
+                duplicates |= Q(isbn13=isbn13)
+            if Book.objects.filter(duplicates).exclude(pk=self.instance.pk).exists():
+                raise ValidationError('已存在相同ISBN的图书')
         return isbn
 
     def clean(self):
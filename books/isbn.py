@@ -0,0 +1,66 @@
+"""
+ISBN 规范化
+
+图书的 ISBN 可能带连字符或空格，也可能是 ISBN-10。保存时统一换算为 13 位数字的 ISBN-13
+写入 Book.isbn13（唯一索引），查重和按 ISBN 精确查找都使用该列，ISBN-10 与 ISBN-13 的换算只在这里进行。
+"""
+import re
+
+_SEPARATORS = re.compile(r'[\s\-]')
+_ISBN10 = re.compile(r'^\d{9}[\dX]$')
+_ISBN13 = re.compile(r'^\d{13}$')
+# ISBN 形式的搜索输入：只含数字、X、连字符和空格
+_ISBN_QUERY = re.compile(r'^[\dXx\s\-]+$')
+
+
+def compact_isbn(value):
+    """去掉连字符和空格并转大写，例如 '7-5366-9293-x' -> '753669293X'"""
+    return _SEPARATORS.sub('', str(value or '')).upper()
+
+
+def isbn10_check_digit(first9):
+    total = sum((10 - i) * int(digit) for i, digit in enumerate(first9))
+    check = (11 - total % 11) % 11
+    return 'X' if check == 10 else str(check)
+
+
+def isbn13_check_digit(first12):
+    total = sum((3 if i % 2 else 1) * int(digit) for i, digit in enumerate(first12))
+    return str((10 - total % 10) % 10)
+
+
+def isbn10_to_isbn13(isbn10):
+    """ISBN-10 换算为 ISBN-13（加 978 前缀并重新计算校验位）"""
+    first12 = '978' + isbn10[:9]
+    return first12 + isbn13_check_digit(first12)
+
+
+def normalize_isbn(value):
+    """
+    把 ISBN 规范化为 13 位数字
+
+    Args:
+        value: 原始 ISBN（可带连字符或空格，可以是 ISBN-10）
+
+    Returns:
+        ISBN-13 字符串；校验位错误的 ISBN-10 或不是 10/13 位的值返回 None
+    """
+    isbn = compact_isbn(value)
+    if _ISBN13.match(isbn):
+        # 已有数据中存在校验位不规范的 13 位编号，原样保留以便精确查找
+        return isbn
+    if _ISBN10.match(isbn) and isbn10_check_digit(isbn[:9]) == isbn[9]:
+        return isbn10_to_isbn13(isbn)
+    return None
+
+
+def isbn_query(query):
+    """
+    判断搜索输入是否为完整的 ISBN
+
+    Returns:
+        规范化后的 ISBN-13；不是 ISBN 形式的输入返回 None
+    """
+    if not query or not _ISBN_QUERY.match(query):
+        return None
+    return normalize_isbn(query)
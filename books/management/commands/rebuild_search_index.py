@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from books.search import rebuild_index
+from library_management.cache import process_local_invalidation_warning
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = '重建图书全文搜索索引（批量导入、update() 等不触发信号的写入之后执行）'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database',
+            default=None,
+            help='数据库别名，默认为图书模型的写库',
+        )
+
+    def handle(self, *args, **options):
+        count = rebuild_index(using=options['database'])
+        warning = process_local_invalidation_warning()
+        if warning:
+            self.stdout.write(self.style.WARNING(warning))
+        self.stdout.write(
+            self.style.SUCCESS(f'已重建搜索索引，共 {count} 本图书')
+        )
+        logger.info(f'重建图书搜索索引: {count} 本')
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+from books.models import Book, cover_exists
+from library_management.cache import cache, process_local_invalidation_warning
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = '重新检查图书封面文件是否存在并更新 has_cover（直接在存储中增删封面文件之后执行）'
+
+    def handle(self, *args, **options):
+        with_cover, without_cover = [], []
+        books = Book.objects.exclude(cover_image='').exclude(cover_image__isnull=True).only('id', 'cover_image', 'has_cover')
+        for book in books.iterator(chunk_size=1000):
+            exists = cover_exists(book.cover_image)
+            if exists != book.has_cover:
+                (with_cover if exists else without_cover).append(book.id)
+
+        now = timezone.now()
+        # update() 不会自动更新 auto_now 字段，片段缓存键依赖它
+        updated = Book.objects.filter(id__in=with_cover).update(has_cover=True, updated_at=now)
+        updated += Book.objects.filter(
+            Q(id__in=without_cover) | Q(cover_image='') | Q(cover_image__isnull=True), has_cover=True
+        ).update(has_cover=False, updated_at=now)
+        if updated:
+            # update() 不触发信号，手动失效缓存的列表页（其中缓存了封面URL）
+            cache.invalidate_tags('model:Book')
+            warning = process_local_invalidation_warning()
+            if warning:
+                self.stdout.write(self.style.WARNING(warning))
+
+        self.stdout.write(
+            self.style.SUCCESS(f'已更新 {updated} 本图书的封面状态')
+        )
+        logger.info(f'刷新图书封面状态: {updated} 本')
@@ -0,0 +1,117 @@
+import re
+
+from django.db import migrations
+
+# 以下为迁移编写时 books/search.py、books/isbn.py 中的表名和文档生成逻辑的副本：
+# 迁移不引用应用代码，之后修改这些模块不会改变本迁移的行为
+SQLITE_TABLE = 'books_book_fts'
+POSTGRES_TABLE = 'books_book_search'
+
+_CJK_RUN = re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+')
+_WORD = re.compile(r'[^\W_]+')
+_SEPARATORS = re.compile(r'[\s\-]')
+_ISBN10 = re.compile(r'^\d{9}[\dX]$')
+_ISBN13 = re.compile(r'^\d{13}$')
+
+
+def _split(text):
+    text = text or ''
+    position = 0
+    for match in _CJK_RUN.finditer(text):
+        for word in _WORD.findall(text[position:match.start()]):
+            yield False, word.lower()
+        yield True, match.group()
+        position = match.end()
+    for word in _WORD.findall(text[position:]):
+        yield False, word.lower()
+
+
+def _tokenize(text):
+    tokens = []
+    for is_cjk, part in _split(text):
+        if is_cjk and len(part) > 1:
+            tokens.extend(part[i:i + 2] for i in range(len(part) - 1))
+            tokens.append(part[-1])
+        else:
+            tokens.append(part)
+    return tokens
+
+
+def _compact_isbn(value):
+    return _SEPARATORS.sub('', str(value or '')).upper()
+
+
+def _normalize_isbn(value):
+    isbn = _compact_isbn(value)
+    if _ISBN13.match(isbn):
+        return isbn
+    if _ISBN10.match(isbn):
+        total = sum((10 - i) * int(digit) for i, digit in enumerate(isbn[:9]))
+        check = (11 - total % 11) % 11
+        if ('X' if check == 10 else str(check)) == isbn[9]:
+            first12 = '978' + isbn[:9]
+            total = sum((3 if i % 2 else 1) * int(digit) for i, digit in enumerate(first12))
+            return first12 + str((10 - total % 10) % 10)
+    return None
+
+
+def book_document(title, author, isbn):
+    """生成索引文档（书名、作者、ISBN 三列切分后的文本）"""
+    isbn_tokens = _tokenize(isbn)
+    for extra in (_compact_isbn(isbn).lower(), (_normalize_isbn(isbn) or '')):
+        if extra and extra not in isbn_tokens:
+            isbn_tokens.append(extra)
+    return ' '.join(_tokenize(title)), ' '.join(_tokenize(author)), ' '.join(isbn_tokens)
+
+
+def create_search_index(apps, schema_editor):
+    """创建全文搜索索引表（SQLite: FTS5；PostgreSQL: tsvector + GIN），并索引已有图书"""
+    connection = schema_editor.connection
+    Book = apps.get_model('books', 'Book')
+    book_table = schema_editor.quote_name(Book._meta.db_table)
+
+    if connection.vendor == 'sqlite':
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_TABLE} "
+            "USING fts5(title, author, isbn, tokenize = 'unicode61')"
+        )
+        insert_sql = f"INSERT INTO {SQLITE_TABLE} (rowid, title, author, isbn) VALUES (%s, %s, %s, %s)"
+    elif connection.vendor == 'postgresql':
+        schema_editor.execute(
+            f"CREATE TABLE IF NOT EXISTS {POSTGRES_TABLE} ("
+            f"book_id bigint PRIMARY KEY REFERENCES {book_table} (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+            "document tsvector NOT NULL)"
+        )
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {POSTGRES_TABLE}_document_gin ON {POSTGRES_TABLE} USING GIN (document)"
+        )
+        insert_sql = (
+            f"INSERT INTO {POSTGRES_TABLE} (book_id, document) VALUES (%s, "
+            "setweight(to_tsvector('simple', %s), 'A') || setweight(to_tsvector('simple', %s), 'B') || "
+            "setweight(to_tsvector('simple', %s), 'C'))"
+        )
+    else:
+        return
+
+    with connection.cursor() as cursor:
+        for book_id, title, author, isbn in Book.objects.values_list('id', 'title', 'author', 'isbn').iterator():
+            cursor.execute(insert_sql, [book_id, *book_document(title, author, isbn)])
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {SQLITE_TABLE}")
+    elif vendor == 'postgresql':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {POSTGRES_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0002_alter_book_category'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
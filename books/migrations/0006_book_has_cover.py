@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-17 05:07
+
+from django.db import migrations, models
+
+
+def populate_has_cover(apps, schema_editor):
+    """检查已有图书的封面文件是否存在（只在迁移时访问一次存储）"""
+    Book = apps.get_model('books', 'Book')
+    ids = []
+    for book in Book.objects.exclude(cover_image='').exclude(cover_image__isnull=True).only('id', 'cover_image'):
+        try:
+            if book.cover_image.storage.exists(book.cover_image.name):
+                ids.append(book.id)
+        except Exception:
+            continue
+    Book.objects.filter(id__in=ids).update(has_cover=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0005_book_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='has_cover',
+            field=models.BooleanField(default=False, editable=False, verbose_name='有封面'),
+        ),
+        migrations.RunPython(populate_has_cover, migrations.RunPython.noop),
+    ]
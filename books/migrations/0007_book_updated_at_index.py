@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 05:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0006_book_has_cover'),
+        ('categories', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['updated_at'], name='books_book_updated_f9663f_idx'),
+        ),
+    ]
@@ -1,14 +1,26 @@
 from django.db import models, transaction
 from django.db.models import F
+from django.utils import timezone
 from categories.models import Category
-from django.db.models.signals import post_save, post_delete
-from django.dispatch import receiver
-from library_management.cache import (
-    cache, CACHE_KEY_HOME_STATS, CACHE_KEY_CATEGORIES, CACHE_KEY_BOOK_LIST,
-    CACHE_KEY_POPULAR_BOOKS, CACHE_KEY_RECENT_BOOKS, CACHE_KEY_SEARCH_RESULTS,
-    invalidate_book_cache
-)
+from library_management.cache import invalidate_book_cache, connect_cache_tags
+from books.search import connect_search_index
+from books.suggest import connect_suggest_index
+from books.isbn import normalize_isbn
 from django.templatetags.static import static
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def cover_exists(cover_image):
+    """检查封面文件是否存在于存储中（保存图书和 refresh_cover_flags 命令使用）"""
+    try:
+        return bool(cover_image.name) and cover_image.storage.exists(cover_image.name)
+    except Exception:
+        # 存储不可用时按没有封面处理，显示默认图片
+        return False
+
+
 class Book(models.Model):
     STATUS_CHOICES = [
         ('available', '可借阅'),
@@ -20,11 +32,15 @@ class Book(models.Model):
     title = models.CharField(max_length=200, verbose_name='书名')
     author = models.CharField(max_length=100, verbose_name='作者')
     isbn = models.CharField(max_length=20, unique=True, verbose_name='ISBN')
+    # 由 isbn 换算的 ISBN-13（保存时计算），用于查重和按 ISBN 精确查找；无法换算时为空
+    isbn13 = models.CharField(max_length=13, unique=True, null=True, blank=True, editable=False, verbose_name='ISBN-13')
     publisher = models.CharField(max_length=100, blank=True, null=True, verbose_name='出版社')
     publication_date = models.DateField(blank=True, null=True, verbose_name='出版日期')
     category = models.ForeignKey(Category, on_delete=models.PROTECT, null=True, blank=True, verbose_name='分类')
     description = models.TextField(blank=True, null=True, verbose_name='描述')
     cover_image = models.ImageField(upload_to='book_covers/', blank=True, null=True, verbose_name='封面图片')
+    # 封面文件是否存在（上传保存时确定），渲染时据此选择封面或默认图片，不再逐本检查磁盘
+    has_cover = models.BooleanField(default=False, editable=False, verbose_name='有封面')
     total_copies = models.PositiveIntegerField(default=1, verbose_name='总册数')
     available_copies = models.PositiveIntegerField(default=1, verbose_name='可借册数')
     location = models.CharField(max_length=50, blank=True, null=True, verbose_name='书架位置')
@@ -35,31 +51,62 @@ class Book(models.Model):
     class Meta:
         verbose_name = '图书'
         verbose_name_plural = '图书'
+        indexes = [
+            models.Index(fields=['title', 'id']),                 # 列表按 (title, id) 排序和游标翻页
+            models.Index(fields=['category', 'title', 'id']),     # 按分类筛选的列表
+            models.Index(fields=['-created_at']),                 # 首页最新图书
+            models.Index(fields=['available_copies', 'status']),  # 可借/已借出数量统计
+            models.Index(fields=['updated_at']),                  # 搜索建议索引读取其他进程的变更
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.author}"
 
-    # 在文件顶部添加导入
-    
-    
-    # 然后在cover_image_url方法中使用
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'isbn' in update_fields:
+            self.isbn13 = self._resolve_isbn13()
+        if update_fields is None or 'cover_image' in update_fields:
+            self.has_cover = self._resolve_has_cover()
+        if update_fields is not None:
+            derived = {'isbn': 'isbn13', 'cover_image': 'has_cover'}
+            kwargs['update_fields'] = {*update_fields, *(derived[f] for f in update_fields if f in derived)}
+        super().save(*args, **kwargs)
+
+    def _resolve_isbn13(self):
+        """
+        保存时计算 ISBN-13；与其他图书重复时保持为空
+
+        迁移 0004 把换算后重复的旧数据留为空，这些图书再次保存（如借阅更新状态）时不能因唯一约束失败；
+        新录入的重复 ISBN 由表单和导入在保存前拒绝。
+        """
+        isbn13 = normalize_isbn(self.isbn)
+        if isbn13 is None or isbn13 == self.isbn13:
+            return isbn13
+        if Book.objects.filter(isbn13=isbn13).exclude(pk=self.pk).exists():
+            logger.warning(f"图书(ID:{self.pk}) 的 ISBN {self.isbn} 与其他图书重复，ISBN-13 保持为空")
+            return None
+        return isbn13
+
+    def _resolve_has_cover(self):
+        """保存时判断封面文件是否存在；只有已记录为缺失的旧文件才访问存储"""
+        if not self.cover_image:
+            return False
+        if not getattr(self.cover_image, '_committed', True):
+            # 新上传的文件在保存时写入存储
+            return True
+        if self.has_cover:
+            return True
+        return cover_exists(self.cover_image)
+
     @property
     def cover_image_url(self):
-        """返回图书封面图片URL，如果没有则返回默认图片"""
-        if self.cover_image and hasattr(self.cover_image, 'url'):
-            try:
-                # 尝试检查文件是否存在
-                import os
-                from django.conf import settings
-                image_path = os.path.join(settings.MEDIA_ROOT, self.cover_image.name)
-                if os.path.exists(image_path):
-                    return self.cover_image.url
-            except:
-                # 如果检查失败，默认使用默认图片
-                pass
+        """返回图书封面图片URL，如果没有则返回默认图片（按 has_cover 判断，不访问磁盘）"""
+        if self.has_cover and self.cover_image:
+            return self.cover_image.url
         # 返回默认图片URL
         return static('images/default-book-cover.png')
-    
+
     @property
     def is_available(self):
         return self.available_copies > 0 and self.status == 'available'
@@ -74,121 +121,68 @@ class Book(models.Model):
     @transaction.atomic
     def borrow_book(self):
         """原子性地借阅图书，防止并发问题"""
-        try:
-            # 使用select_for_update来锁定记录，防止并发借阅
-            book = Book.objects.select_for_update().filter(id=self.id).first()
-    
-            if book.available_copies <= 0:
-                return False
-    
-            # 使用F()原子性更新
-            Book.objects.filter(id=self.id).update(
-                available_copies=F('available_copies') - 1
-            )
-    
-            # 更新状态 - 修改部分
-            updated_book = Book.objects.get(id=self.id)
-            # 当没有可借册数时，更新为已借出状态
-            if updated_book.available_copies == 0:
-                updated_book.status = 'borrowed'
-                updated_book.save()
-            # 当还有可借册数但不是全部可借时，也应该反映出部分借出状态
-            # 注意：这里保持status为'available'，因为还有可借册数
-            # 但在前端显示时，应该根据available_copies和total_copies来显示实际可借状态
-    
-            # 清除缓存
-            cache.delete(CACHE_KEY_HOME_STATS)
-            cache.delete(CACHE_KEY_BOOK_LIST)
-            
-            return True
-        except Exception:
-            return False
+        # 没有可借册数时返回 False；数据库错误直接抛出，由事务回滚已扣减的册数
+        # 使用select_for_update来锁定记录，防止并发借阅
+        book = Book.objects.select_for_update().filter(id=self.id).first()
 
-    @transaction.atomic
-    def return_book(self):
-        """原子性地归还图书，防止并发问题"""
-        try:
-            # 使用select_for_update来锁定记录，防止并发归还
-            book = Book.objects.select_for_update().filter(id=self.id).first()
+        if book is None or book.available_copies <= 0:
+            return False
 
-            if book.available_copies >= book.total_copies:
-                return False
+        # 使用F()原子性更新
+        Book.objects.filter(id=self.id).update(
+            available_copies=F('available_copies') - 1,
+            updated_at=timezone.now()  # update() 不会自动更新 auto_now 字段，片段缓存键依赖它
+        )
 
-            # 使用F()原子性更新
-            Book.objects.filter(id=self.id).update(
-                available_copies=F('available_copies') + 1
-            )
+        # 更新状态 - 修改部分
+        updated_book = Book.objects.get(id=self.id)
+        # 当没有可借册数时，更新为已借出状态
+        if updated_book.available_copies == 0:
+            updated_book.status = 'borrowed'
+            updated_book.save(update_fields=['status', 'updated_at'])
+        # 当还有可借册数但不是全部可借时，也应该反映出部分借出状态
+        # 注意：这里保持status为'available'，因为还有可借册数
+        # 但在前端显示时，应该根据available_copies和total_copies来显示实际可借状态
 
-            # 更新状态
-            updated_book = Book.objects.get(id=self.id)
-            if updated_book.available_copies > 0:
-                updated_book.status = 'available'
-                updated_book.save()
+        # 可借册数通过 update() 修改，不触发 post_save，需手动失效缓存标签
+        invalidate_book_cache(self.id)
 
-                # 如果有预约队列，处理预约通知
-                from borrowing.models import BookReservation
-                BookReservation.process_available_book(updated_book)
+        return True
 
-            # 清除缓存
-            cache.delete(CACHE_KEY_HOME_STATS)
-            cache.delete(CACHE_KEY_BOOK_LIST)
+    @transaction.atomic
+    def return_book(self):
+        """原子性地归还图书，防止并发问题"""
+        # 已全部归还时返回 False；数据库错误直接抛出，由事务回滚已增加的册数
+        # 使用select_for_update来锁定记录，防止并发归还
+        book = Book.objects.select_for_update().filter(id=self.id).first()
 
-            return True
-        except Exception:
+        if book is None or book.available_copies >= book.total_copies:
             return False
 
-# 图书保存后清除相关缓存
-@receiver(post_save, sender=Book)
-def clear_book_cache_on_save(sender, instance, **kwargs):
-    """图书保存后清除相关缓存"""
-    try:
-        # 使用新的缓存失效函数
-        invalidate_book_cache(instance.id)
-
-        # 清除特定的缓存键
-        cache.delete(CACHE_KEY_HOME_STATS, namespace='books')
-        cache.delete(CACHE_KEY_CATEGORIES, namespace='books')
-        cache.delete(CACHE_KEY_BOOK_LIST, namespace='books')
-        cache.delete(CACHE_KEY_POPULAR_BOOKS, namespace='books')
-        cache.delete(CACHE_KEY_RECENT_BOOKS, namespace='books')
-
-        # 清除所有搜索结果缓存
-        cache.clear(namespace='books:search')
-        # 清除分页相关缓存
-        cache.clear(namespace='pagination')
-        cache.delete('category_list', namespace='books')
-
-        # 使用分页缓存管理器失效缓存
-        from library_management.pagination import PaginationCacheManager
-        PaginationCacheManager.invalidate_pagination_cache('book')
-
-    except Exception:
-        pass  # 如果缓存删除失败，忽略
-
-# 图书删除后清除相关缓存
-@receiver(post_delete, sender=Book)
-def clear_book_cache_on_delete(sender, instance, **kwargs):
-    """图书删除后清除相关缓存"""
-    try:
-        # 使用新的缓存失效函数
-        invalidate_book_cache(instance.id)
-
-        # 清除特定的缓存键
-        cache.delete(CACHE_KEY_HOME_STATS, namespace='books')
-        cache.delete(CACHE_KEY_CATEGORIES, namespace='books')
-        cache.delete(CACHE_KEY_BOOK_LIST, namespace='books')
-        cache.delete(CACHE_KEY_POPULAR_BOOKS, namespace='books')
-        cache.delete(CACHE_KEY_RECENT_BOOKS, namespace='books')
-
-        # 清除所有搜索结果缓存
-        cache.clear(namespace='books:search')
-        # 清除分页相关缓存
-        cache.clear(namespace='pagination')
-        cache.delete('category_list', namespace='books')
-
-        # 使用分页缓存管理器失效缓存
-        from library_management.pagination import PaginationCacheManager
-        PaginationCacheManager.invalidate_pagination_cache('book')
-
-    except Exception:
-        pass  # 如果缓存删除失败，忽略
\ No newline at end of file
+        # 使用F()原子性更新
+        Book.objects.filter(id=self.id).update(
+            available_copies=F('available_copies') + 1,
+            updated_at=timezone.now()  # update() 不会自动更新 auto_now 字段，片段缓存键依赖它
+        )
+
+        # 更新状态
+        updated_book = Book.objects.get(id=self.id)
+        if updated_book.available_copies > 0:
+            updated_book.status = 'available'
+            updated_book.save(update_fields=['status', 'updated_at'])
+
+            # 如果有预约队列，处理预约通知
+            from borrowing.models import BookReservation
+            BookReservation.process_available_book(updated_book)
+
+        # 可借册数通过 update() 修改，不触发 post_save，需手动失效缓存标签
+        invalidate_book_cache(self.id)
+
+        return True
+
+# 图书保存或删除后按标签失效相关缓存（book:<id>、category:<id>、model:Book）
+connect_cache_tags(Book)
+# 图书保存或删除后同步全文搜索索引
+connect_search_index(Book)
+# 图书变更提交后更新搜索建议索引（进程收到第一个请求时构建）
+connect_suggest_index(Book)
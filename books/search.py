@@ -0,0 +1,308 @@
+"""
+图书全文搜索
+
+为 Book 的书名、作者、ISBN 维护倒排索引，替代 icontains（LIKE '%q%'，每次搜索全表扫描）：
+- SQLite：FTS5 虚拟表 books_book_fts（rowid 为图书ID），按 bm25 排序
+- PostgreSQL：books_book_search 表的 tsvector 列 + GIN 索引，按 ts_rank 排序
+
+中文没有空格分词，索引和查询前统一切分：连续的汉字切成二元组并追加最后一个字
+（"三体运" -> "三体 体运 运"），英文和数字按词切分并转小写。查询中的多字中文词按二元组短语匹配，
+单个汉字和最后一个英文/数字词按前缀匹配。
+
+索引由 post_save/post_delete 信号维护（与图书写入在同一事务中）；update()、bulk_create 等
+不触发信号的批量写入后执行 python manage.py rebuild_search_index。
+其他数据库或索引表不存在时 search_book_ids 返回 None，由调用方退回 icontains 查询。
+"""
+import re
+import logging
+from django.conf import settings
+from django.db import connections, router, transaction, DatabaseError
+from library_management.cache import cache
+from books.isbn import compact_isbn, normalize_isbn, isbn_query
+
+logger = logging.getLogger(__name__)
+
+SQLITE_TABLE = 'books_book_fts'
+POSTGRES_TABLE = 'books_book_search'
+
+# 书名、作者、ISBN 的权重（bm25 的列权重；PostgreSQL 对应 A/B/C 级）
+COLUMN_WEIGHTS = (10.0, 5.0, 1.0)
+
+# 查询最多使用的词数，避免超长输入生成过大的查询
+MAX_QUERY_TERMS = 16
+
+_CJK_RUN = re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+')
+_WORD = re.compile(r'[^\W_]+')
+
+
+def _split(text):
+    """按汉字串和其他文本切分，依次产生 (是否汉字, 片段)"""
+    text = text or ''
+    position = 0
+    for match in _CJK_RUN.finditer(text):
+        for word in _WORD.findall(text[position:match.start()]):
+            yield False, word.lower()
+        yield True, match.group()
+        position = match.end()
+    for word in _WORD.findall(text[position:]):
+        yield False, word.lower()
+
+
+def tokenize(text):
+    """
+    切分待索引的文本
+
+    Args:
+        text: 原始文本
+
+    Returns:
+        词元列表，例如 '三体 Liu' -> ['三体', '体', 'liu']
+    """
+    tokens = []
+    for is_cjk, part in _split(text):
+        if is_cjk and len(part) > 1:
+            # 二元组保证多字查询按相邻关系匹配；末尾的单字使词尾的字也能被单字前缀查询命中
+            tokens.extend(part[i:i + 2] for i in range(len(part) - 1))
+            tokens.append(part[-1])
+        else:
+            tokens.append(part)
+    return tokens
+
+
+def parse_query(query):
+    """
+    切分查询
+
+    Args:
+        query: 用户输入
+
+    Returns:
+        [(词元元组, 是否前缀匹配)]，每一项为一个短语，各项之间为"且"的关系
+    """
+    terms = []
+    for is_cjk, part in _split(query):
+        if is_cjk and len(part) > 1:
+            terms.append((tuple(part[i:i + 2] for i in range(len(part) - 1)), False))
+        else:
+            terms.append(((part,), is_cjk))
+    terms = terms[:MAX_QUERY_TERMS]
+    if terms and not terms[-1][1]:
+        # 最后一个词按前缀匹配，支持边输入边搜索
+        tokens, _ = terms[-1]
+        terms[-1] = (tokens, True)
+    return terms
+
+
+def book_document(title, author, isbn):
+    """
+    生成索引文档（书名、作者、ISBN 三列切分后的文本）
+
+    ISBN 额外索引去掉连字符的形式和换算后的 ISBN-13，'978-7-5366-9293-0' 和 '9787536692930' 都能按前缀匹配，
+    ISBN-10 录入的图书也能用 ISBN-13 的前缀搜到。
+    """
+    isbn_tokens = tokenize(isbn)
+    for extra in (compact_isbn(isbn).lower(), (normalize_isbn(isbn) or '')):
+        if extra and extra not in isbn_tokens:
+            isbn_tokens.append(extra)
+    return ' '.join(tokenize(title)), ' '.join(tokenize(author)), ' '.join(isbn_tokens)
+
+
+def _fts5_expression(terms):
+    return ' AND '.join(
+        '"' + ' '.join(tokens) + '"' + ('*' if prefix else '') for tokens, prefix in terms
+    )
+
+
+def _tsquery_expression(terms):
+    return ' & '.join(
+        '(' + ' <-> '.join(tokens) + (':*' if prefix else '') + ')' for tokens, prefix in terms
+    )
+
+
+def _connection(using=None):
+    from books.models import Book
+    return connections[using or router.db_for_read(Book)]
+
+
+def _query_ids(connection, terms, category_id, limit):
+    """在搜索索引中查询，返回按相关度排序的图书ID；数据库不支持时返回 None"""
+    from books.models import Book
+    book_table = connection.ops.quote_name(Book._meta.db_table)
+
+    if connection.vendor == 'sqlite':
+        # FTS5 的 MATCH 和 bm25() 须使用表名，不能使用别名
+        category_join = f" JOIN {book_table} b ON b.id = {SQLITE_TABLE}.rowid" if category_id else ''
+        sql = (
+            f"SELECT {SQLITE_TABLE}.rowid FROM {SQLITE_TABLE}{category_join} "
+            f"WHERE {SQLITE_TABLE} MATCH %s{' AND b.category_id = %s' if category_id else ''} "
+            f"ORDER BY bm25({SQLITE_TABLE}, {', '.join(str(weight) for weight in COLUMN_WEIGHTS)}), "
+            f"{SQLITE_TABLE}.rowid LIMIT %s"
+        )
+        params = [_fts5_expression(terms)]
+    elif connection.vendor == 'postgresql':
+        category_join = f" JOIN {book_table} b ON b.id = s.book_id" if category_id else ''
+        sql = (
+            f"SELECT s.book_id FROM {POSTGRES_TABLE} s{category_join}, to_tsquery('simple', %s) q "
+            f"WHERE s.document @@ q{' AND b.category_id = %s' if category_id else ''} "
+            f"ORDER BY ts_rank(s.document, q) DESC, s.book_id LIMIT %s"
+        )
+        params = [_tsquery_expression(terms)]
+    else:
+        return None
+
+    if category_id:
+        params.append(category_id)
+    params.append(limit)
+    try:
+        # 保存点：PostgreSQL 中语句出错会中止整个事务
+        with transaction.atomic(using=connection.alias):
+            with connection.cursor() as cursor:
+                cursor.execute(sql, params)
+                return [row[0] for row in cursor.fetchall()]
+    except DatabaseError as e:
+        # 例如尚未执行迁移，索引表不存在
+        logger.warning(f"全文搜索不可用，改用普通查询: {str(e)}")
+        return None
+
+
+def search_book_ids(query, category_id=None, limit=None, using=None):
+    """
+    全文搜索图书
+
+    Args:
+        query: 搜索词
+        category_id: 分类ID（可选）
+        limit: 最多返回的结果数，默认读取 SEARCH_MAX_RESULTS
+        using: 数据库别名
+
+    Returns:
+        按相关度排序的图书ID列表；当前数据库不支持全文搜索，
+        或搜索词分词后为空（如只有标点）时返回 None，由调用方退回 icontains
+    """
+    isbn13 = isbn_query(query)
+    if isbn13:
+        # 完整的 ISBN（扫码枪输入等）：按规范化的 ISBN-13 在唯一索引上精确查找
+        return find_by_isbn(isbn13, category_id, using)
+
+    connection = _connection(using)
+    if connection.vendor not in ('sqlite', 'postgresql'):
+        return None
+    terms = parse_query(query)
+    if not terms:
+        # 分词器会丢弃标点，只含标点的搜索词（如 "#"、"++"）交给子串匹配
+        return None
+    limit = limit or getattr(settings, 'SEARCH_MAX_RESULTS', 1000)
+    category_id = str(category_id or '').strip() or None
+
+    key = ('ids', connection.alias, tuple(terms), category_id, limit)
+    ids = cache.get(key, namespace='search')
+    if ids is None:
+        ids = _query_ids(connection, terms, category_id, limit)
+        if ids is None:
+            return None
+        # 图书增删改都会失效 model:Book 标签
+        cache.set(key, ids, timeout=600, namespace='search', tags=['model:Book'])
+    return ids
+
+
+def find_by_isbn(isbn13, category_id=None, using=None):
+    """
+    按规范化的 ISBN-13 查找图书
+
+    Returns:
+        图书ID列表（最多一个）
+    """
+    from books.models import Book
+    books = Book.objects.using(using or router.db_for_read(Book)).filter(isbn13=isbn13)
+    category_id = str(category_id or '').strip()
+    if category_id:
+        books = books.filter(category_id=category_id)
+    return list(books.values_list('id', flat=True))
+
+
+def index_book(book, using=None):
+    """写入（或更新）一本图书的索引"""
+    connection = connections[using or router.db_for_write(type(book))]
+    title, author, isbn = book_document(book.title, book.author, book.isbn)
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f"DELETE FROM {SQLITE_TABLE} WHERE rowid = %s", [book.pk])
+            cursor.execute(
+                f"INSERT INTO {SQLITE_TABLE} (rowid, title, author, isbn) VALUES (%s, %s, %s, %s)",
+                [book.pk, title, author, isbn],
+            )
+        elif connection.vendor == 'postgresql':
+            cursor.execute(
+                f"INSERT INTO {POSTGRES_TABLE} (book_id, document) VALUES (%s, "
+                "setweight(to_tsvector('simple', %s), 'A') || setweight(to_tsvector('simple', %s), 'B') || "
+                "setweight(to_tsvector('simple', %s), 'C')) "
+                "ON CONFLICT (book_id) DO UPDATE SET document = EXCLUDED.document",
+                [book.pk, title, author, isbn],
+            )
+
+
+def unindex_book(book_id, using=None):
+    """删除一本图书的索引"""
+    from books.models import Book
+    connection = connections[using or router.db_for_write(Book)]
+    table, column = {'sqlite': (SQLITE_TABLE, 'rowid'), 'postgresql': (POSTGRES_TABLE, 'book_id')}.get(
+        connection.vendor, (None, None))
+    if table:
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {table} WHERE {column} = %s", [book_id])
+
+
+def rebuild_index(using=None, batch_size=1000):
+    """
+    重建全部图书的索引，并失效缓存的搜索结果
+
+    缓存失效只作用于当前进程可见的缓存后端：进程内后端（locmem、sharded）下从管理命令调用时，
+    运行中的 Web 进程仍使用旧的搜索结果直到缓存过期。
+
+    Returns:
+        写入索引的图书数量
+    """
+    from books.models import Book
+    connection = connections[using or router.db_for_write(Book)]
+    if connection.vendor not in ('sqlite', 'postgresql'):
+        return 0
+    count = 0
+    with transaction.atomic(using=connection.alias):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {SQLITE_TABLE if connection.vendor == 'sqlite' else POSTGRES_TABLE}")
+        books = Book.objects.using(connection.alias).only('id', 'title', 'author', 'isbn')
+        for book in books.iterator(chunk_size=batch_size):
+            index_book(book, using=connection.alias)
+            count += 1
+    cache.invalidate_tags('model:Book')
+    return count
+
+
+# 影响索引内容的字段，save(update_fields=...) 不含这些字段时无需重建索引
+INDEXED_FIELDS = {'title', 'author', 'isbn'}
+
+
+def _book_saved(sender, instance, using=None, update_fields=None, **kwargs):
+    if update_fields is not None and not INDEXED_FIELDS.intersection(update_fields):
+        return
+    try:
+        with transaction.atomic(using=using):
+            index_book(instance, using=using)
+    except DatabaseError as e:
+        logger.warning(f"更新图书搜索索引失败: {instance.pk} ({str(e)})")
+
+
+def _book_deleted(sender, instance, using=None, **kwargs):
+    try:
+        with transaction.atomic(using=using):
+            unindex_book(instance.pk, using=using)
+    except DatabaseError as e:
+        logger.warning(f"删除图书搜索索引失败: {instance.pk} ({str(e)})")
+
+
+def connect_search_index(model):
+    """为图书模型连接 post_save/post_delete 信号，保持搜索索引同步"""
+    from django.db.models.signals import post_save, post_delete
+    uid = f"search_index:{model._meta.label}"
+    post_save.connect(_book_saved, sender=model, dispatch_uid=uid)
+    post_delete.connect(_book_deleted, sender=model, dispatch_uid=uid)
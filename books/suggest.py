@@ -0,0 +1,528 @@
+"""
+图书搜索建议（自动补全）
+
+进程内的 n-gram 倒排索引，覆盖书名、作者和 ISBN，查询时不访问数据库：
+- 中文取单字和相邻二字（"三体" -> 三、体、三体），英文和数字按词加首尾空格取三元组
+  （"liu" -> " li"、"liu"、"iu "），输错个别字符时仍有足够多的公共 n-gram，实现容错匹配
+- 查询时按倒排列表从短到长累加候选，累加的条目数有上限（常见字的长列表不拖慢查询），
+  再对得分最高的少量候选按书名/作者精确计算相似度
+- ISBN 形式的输入（数字和连字符）同时按录入的 ISBN 和换算后的 ISBN-13 前缀二分查找，
+  并与书名匹配的结果合并（"1984" 既可能是 ISBN 前缀也可能是书名）
+
+100 万本图书时索引约占 420MB 内存、构建约 20s，查询 p50 低于 1ms（见 benchmark_suggest.py）。
+
+索引在加载 WSGI 应用时构建一次（library_management/wsgi.py），先加载再 fork 的部署
+（如 gunicorn --preload）中各 worker 继承主进程构建好的索引，不必各自查询数据库重建；
+post_save/post_delete 在事务提交后增量更新，其他进程的写入由定期同步（按 updated_at 增量读取）补上。
+SUGGEST_INDEX_ENABLED 关闭、图书数超过 SUGGEST_INDEX_MAX_BOOKS 或索引构建失败时不占用进程内存，
+改用所有进程共享的数据库全文索引（books/search.py）给出建议。
+"""
+import re
+import sys
+import time
+import bisect
+import logging
+import threading
+from array import array
+from collections import Counter
+from django.conf import settings
+from django.db import transaction
+from books.isbn import compact_isbn, normalize_isbn, isbn_query
+
+logger = logging.getLogger(__name__)
+
+# 单次查询最多累加的倒排条目数
+CANDIDATE_BUDGET = 5000
+# 精确打分的候选数 = 返回数 * 该倍数
+RESCORE_FACTOR = 2
+# 作者匹配的得分相对书名的权重
+AUTHOR_WEIGHT = 0.8
+# 低于该得分的结果不返回
+MIN_SCORE = 0.3
+# 失效条目超过总条目的该比例时重建倒排列表
+COMPACT_RATIO = 0.25
+
+# 与 books/search.py 的切分规则相同：连续的汉字为一段，其他文本按词切分
+_TOKEN = re.compile(r'([\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+)|([^\W_\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+)')
+_ISBN_QUERY = re.compile(r'^[0-9Xx-]{4,}$')
+_FIELD_SEP = '\x1f'
+
+
+def _isbn_keys(isbn):
+    """
+    ISBN 列表中一本书的键：录入的 ISBN（去掉连字符）和换算后的 ISBN-13，
+    ISBN-10 录入的图书按 ISBN-10 或 ISBN-13 的前缀都能找到
+    """
+    keys = {compact_isbn(isbn), normalize_isbn(isbn)}
+    keys.discard(None)
+    keys.discard('')
+    return keys
+
+
+def ngrams(text, prefix=False):
+    """
+    生成文本的 n-gram 集合
+
+    Args:
+        text: 文本
+        prefix: 是否为输入中的查询（最后一个英文词可能尚未输完，词尾不加空格）
+
+    Returns:
+        n-gram 集合
+    """
+    grams = set()
+    tokens = _TOKEN.findall((text or '').lower())
+    last = len(tokens) - 1
+    for index, (cjk, word) in enumerate(tokens):
+        if cjk:
+            grams.update(cjk)
+            grams.update([cjk[i:i + 2] for i in range(len(cjk) - 1)])
+        else:
+            padded = f" {word}" if prefix and index == last else f" {word} "
+            grams.update([padded[i:i + 3] for i in range(len(padded) - 2)])
+    return grams
+
+
+class TrigramIndex:
+    """
+    n-gram 倒排索引
+
+    倒排列表为 array('I')（每个条目 4 字节），更新和删除时不从列表中移除旧条目，
+    只记录失效数，查询时以文档当前内容精确打分，失效条目过多时整体重建倒排列表。
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._docs = {}        # 图书ID -> "书名\x1f作者\x1fISBN"
+        self._postings = {}    # n-gram -> array('I') 图书ID
+        self._isbn_keys = []   # 排好序的 ISBN（去掉连字符）
+        self._isbn_ids = array('I')  # 与 _isbn_keys 一一对应的图书ID
+        self._entries = 0
+        self._stale = 0
+
+    def __len__(self):
+        return len(self._docs)
+
+    def ids(self):
+        """当前索引中的图书ID（副本）"""
+        with self._lock:
+            return set(self._docs)
+
+    @staticmethod
+    def _doc_grams(doc):
+        title, author, _ = doc.split(_FIELD_SEP)
+        return ngrams(title) | ngrams(author)
+
+    def add(self, book_id, title, author, isbn):
+        """添加或更新一本图书"""
+        doc = _FIELD_SEP.join((title or '', author or '', isbn or ''))
+        with self._lock:
+            old = self._docs.get(book_id)
+            if old == doc:
+                return
+            old_grams = set()
+            old_isbn = None
+            if old is not None:
+                old_grams = self._doc_grams(old)
+                old_isbn = old.split(_FIELD_SEP)[2]
+            new_grams = self._doc_grams(doc)
+            for gram in new_grams - old_grams:
+                postings = self._postings.get(gram)
+                if postings is None:
+                    postings = self._postings[gram] = array('I')
+                postings.append(book_id)
+            self._entries += len(new_grams - old_grams)
+            self._stale += len(old_grams - new_grams)
+            self._docs[book_id] = doc
+            if (isbn or '') != old_isbn:
+                if old_isbn:
+                    self._remove_isbn(book_id, old_isbn)
+                if isbn:
+                    self._insert_isbn(book_id, isbn)
+            self._maybe_compact()
+
+    def remove(self, book_id):
+        """删除一本图书"""
+        with self._lock:
+            old = self._docs.pop(book_id, None)
+            if old is None:
+                return
+            self._stale += len(self._doc_grams(old))
+            self._remove_isbn(book_id, old.split(_FIELD_SEP)[2])
+            self._maybe_compact()
+
+    def _insert_isbn(self, book_id, isbn):
+        for key in _isbn_keys(isbn):
+            position = bisect.bisect_right(self._isbn_keys, key)
+            self._isbn_keys.insert(position, key)
+            self._isbn_ids.insert(position, book_id)
+
+    def _remove_isbn(self, book_id, isbn):
+        if not isbn:
+            return
+        for key in _isbn_keys(isbn):
+            position = bisect.bisect_left(self._isbn_keys, key)
+            while position < len(self._isbn_keys) and self._isbn_keys[position] == key:
+                if self._isbn_ids[position] == book_id:
+                    del self._isbn_keys[position]
+                    del self._isbn_ids[position]
+                    break
+                position += 1
+
+    def _maybe_compact(self):
+        if self._entries and self._stale > self._entries * COMPACT_RATIO:
+            self._rebuild_postings()
+
+    def _rebuild_postings(self):
+        postings = {}
+        entries = 0
+        for book_id, doc in self._docs.items():
+            for gram in self._doc_grams(doc):
+                target = postings.get(gram)
+                if target is None:
+                    target = postings[gram] = array('I')
+                target.append(book_id)
+                entries += 1
+        self._postings, self._entries, self._stale = postings, entries, 0
+
+    def load(self, rows):
+        """
+        批量构建索引（替换现有内容）
+
+        Args:
+            rows: (图书ID, 书名, 作者, ISBN) 的可迭代对象
+        """
+        docs = {}
+        isbns = []
+        for book_id, title, author, isbn in rows:
+            docs[book_id] = _FIELD_SEP.join((title or '', author or '', isbn or ''))
+            if isbn:
+                isbns.extend((key, book_id) for key in _isbn_keys(isbn))
+        isbns.sort()
+        with self._lock:
+            self._docs = docs
+            self._isbn_keys = [key for key, _ in isbns]
+            self._isbn_ids = array('I', (book_id for _, book_id in isbns))
+            self._rebuild_postings()
+
+    @staticmethod
+    def _field_score(query, query_grams, field):
+        """单个字段的相似度：以查询 n-gram 的覆盖率为主，长度相近、前缀或子串匹配时加分"""
+        field_grams = ngrams(field)
+        if not field_grams:
+            return 0.0
+        shared = len(query_grams & field_grams)
+        score = 0.7 * shared / len(query_grams) + 0.3 * 2 * shared / (len(query_grams) + len(field_grams))
+        field = field.lower()
+        if field.startswith(query):
+            score += 0.2
+        elif query in field:
+            score += 0.1
+        return score
+
+    def suggest(self, query, limit=10):
+        """
+        查询搜索建议
+
+        Args:
+            query: 用户输入
+            limit: 最多返回的条数
+
+        Returns:
+            字典列表：id、title、author、isbn、score，按得分从高到低排列
+        """
+        query = (query or '').strip()
+        if not query:
+            return []
+
+        # 纯数字的输入既可能是 ISBN 前缀，也可能是书名（如 "1984"），两种匹配合并排序
+        best = {}
+        if _ISBN_QUERY.match(query):
+            for book_id, doc in self._isbn_matches(query, limit):
+                best[book_id] = (1.0, doc)
+        for score, book_id, doc in self._gram_matches(query, limit):
+            if score > best.get(book_id, (0.0, None))[0]:
+                best[book_id] = (score, doc)
+
+        scored = sorted(
+            ((score, len(doc.split(_FIELD_SEP, 1)[0]), book_id, doc) for book_id, (score, doc) in best.items()),
+            key=lambda item: (-item[0], item[1], item[2]),
+        )
+        return [self._result(book_id, doc, score) for score, _, book_id, doc in scored[:limit]]
+
+    def _isbn_matches(self, query, limit):
+        """按录入形式和 ISBN-13 两种前缀在 ISBN 列表中二分查找，返回 [(图书ID, 文档)]"""
+        prefixes = {compact_isbn(query), isbn_query(query)}
+        prefixes.discard(None)
+        matches = {}
+        with self._lock:
+            for prefix in prefixes:
+                position = bisect.bisect_left(self._isbn_keys, prefix)
+                while position < len(self._isbn_keys) and len(matches) < limit:
+                    if not self._isbn_keys[position].startswith(prefix):
+                        break
+                    book_id = self._isbn_ids[position]
+                    doc = self._docs.get(book_id)
+                    if doc is not None:
+                        matches[book_id] = doc
+                    position += 1
+        return list(matches.items())
+
+    def _gram_matches(self, query, limit):
+        """按书名/作者的 n-gram 相似度匹配，返回 [(得分, 图书ID, 文档)]"""
+        query_grams = ngrams(query, prefix=True)
+        if not query_grams:
+            return []
+
+        with self._lock:
+            lists = sorted(
+                (postings for postings in map(self._postings.get, query_grams) if postings),
+                key=len,
+            )
+            counts = Counter()
+            if lists and len(lists[0]) > CANDIDATE_BUDGET // len(lists):
+                # 每个 n-gram 都很常见（输入很短或都是常用词）：各列表只取同一段最近加入的图书，
+                # 倒排列表基本按ID递增，按最短列表的ID范围截取可以让同一本书在各列表中同时被计数
+                share = CANDIDATE_BUDGET // len(lists)
+                threshold = lists[0][-share]
+                for postings in lists:
+                    counts.update(postings[max(bisect.bisect_left(postings, threshold), len(postings) - share):])
+            else:
+                # 从最短的倒排列表开始累加，超出预算后停止（剩余的 n-gram 只在精确打分时使用）
+                scanned = 0
+                for postings in lists:
+                    if scanned + len(postings) > CANDIDATE_BUDGET:
+                        break
+                    counts.update(postings)
+                    scanned += len(postings)
+            candidates = [(book_id, self._docs.get(book_id))
+                          for book_id, _ in counts.most_common(limit * RESCORE_FACTOR)]
+
+        lowered = query.lower()
+        scored = []
+        for book_id, doc in candidates:
+            if doc is None:
+                continue
+            title, author, _ = doc.split(_FIELD_SEP)
+            score = self._field_score(lowered, query_grams, title)
+            if score < AUTHOR_WEIGHT * 1.2:
+                # 作者按 AUTHOR_WEIGHT 折算，最高 AUTHOR_WEIGHT * 1.2，书名得分更高时无需计算
+                score = max(score, AUTHOR_WEIGHT * self._field_score(lowered, query_grams, author))
+            if score >= MIN_SCORE:
+                scored.append((score, book_id, doc))
+        return scored
+
+    @staticmethod
+    def _result(book_id, doc, score):
+        title, author, isbn = doc.split(_FIELD_SEP)
+        return {'id': book_id, 'title': title, 'author': author, 'isbn': isbn, 'score': round(score, 3)}
+
+    def memory_usage(self):
+        """估算索引占用的内存（字节）：文档、倒排列表和 ISBN 列表，需遍历全部条目"""
+        with self._lock:
+            size = sum(map(sys.getsizeof, (self._docs, self._postings, self._isbn_keys, self._isbn_ids)))
+            size += sum(sys.getsizeof(book_id) + sys.getsizeof(doc) for book_id, doc in self._docs.items())
+            size += sum(sys.getsizeof(gram) + sys.getsizeof(postings) for gram, postings in self._postings.items())
+            size += sum(map(sys.getsizeof, self._isbn_keys))
+            return size
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                'books': len(self._docs),
+                'grams': len(self._postings),
+                'entries': self._entries,
+                'stale_entries': self._stale,
+            }
+
+
+class BookSuggester:
+    """
+    图书搜索建议服务：管理索引的构建、增量更新和跨进程同步
+    """
+
+    def __init__(self, sync_interval=None):
+        self.index = TrigramIndex()
+        self.sync_interval = sync_interval
+        self._ready = threading.Event()
+        self._build_lock = threading.Lock()   # 同一时间只构建一次
+        self._state_lock = threading.Lock()
+        self._building = False
+        self._pending = []      # 构建期间收到的变更，构建完成后重放
+        self._synced_at = None
+        self._last_sync_check = 0.0
+        self._last_full_sync = 0.0
+        self._syncing = False
+        self.build_seconds = None
+
+    def _interval(self):
+        if self.sync_interval is not None:
+            return self.sync_interval
+        return getattr(settings, 'SUGGEST_INDEX_SYNC_INTERVAL', 30)
+
+    @staticmethod
+    def _full_sync_interval():
+        return getattr(settings, 'SUGGEST_INDEX_FULL_SYNC_INTERVAL', 600)
+
+    def build(self):
+        """
+        从数据库构建索引；其他线程正在构建时等待其完成
+
+        SUGGEST_INDEX_ENABLED 关闭或图书数超过 SUGGEST_INDEX_MAX_BOOKS 时不构建，
+        建议改由数据库全文索引给出
+        """
+        from books.models import Book
+        from django.utils import timezone
+        if not getattr(settings, 'SUGGEST_INDEX_ENABLED', True):
+            return
+        with self._build_lock:
+            if self._ready.is_set():
+                return
+            with self._state_lock:
+                self._building = True
+            try:
+                max_books = getattr(settings, 'SUGGEST_INDEX_MAX_BOOKS', None)
+                if max_books is not None:
+                    count = Book.objects.count()
+                    if count > max_books:
+                        logger.info(f"图书数 {count} 超过 SUGGEST_INDEX_MAX_BOOKS={max_books}，搜索建议改用全文索引")
+                        return
+                start = time.perf_counter()
+                started_at = timezone.now()
+                rows = Book.objects.values_list('id', 'title', 'author', 'isbn').iterator(chunk_size=5000)
+                self.index.load(rows)
+                with self._state_lock:
+                    pending, self._pending = self._pending, []
+                    self._synced_at = started_at
+                    self._last_sync_check = self._last_full_sync = time.monotonic()
+                    self._ready.set()
+                for change in pending:
+                    change()
+                self.build_seconds = round(time.perf_counter() - start, 3)
+                logger.info(f"图书搜索建议索引构建完成: {len(self.index)} 本，{self.build_seconds}s")
+            except Exception as e:
+                logger.warning(f"图书搜索建议索引构建失败: {str(e)}")
+            finally:
+                with self._state_lock:
+                    self._building = False
+                    self._pending = []
+
+    @staticmethod
+    def _start_thread(target, name):
+        def run():
+            from django.db import connections
+            try:
+                target()
+            finally:
+                # 后台线程的数据库连接不会被请求结束时的清理关闭
+                connections.close_all()
+        threading.Thread(target=run, name=name, daemon=True).start()
+
+    def is_ready(self):
+        return self._ready.is_set()
+
+    def suggest(self, query, limit=10):
+        """查询搜索建议；进程内索引未构建（未启用、超过上限或构建失败）时改用数据库全文索引"""
+        if not self._ready.is_set():
+            return self._search_fallback(query, limit)
+        self._maybe_sync()
+        return self.index.suggest(query, limit)
+
+    @staticmethod
+    def _search_fallback(query, limit):
+        """
+        由数据库全文索引给出建议：按相关度排序、最后一个词按前缀匹配，不容忍错字，
+        score 为 None；数据库不支持全文搜索时按书名子串匹配
+        """
+        from books.models import Book
+        from books.search import search_book_ids
+        ids = search_book_ids(query, limit=limit)
+        if ids is None:
+            ids = Book.objects.filter(title__icontains=query).order_by('title').values_list('id', flat=True)[:limit]
+        rows = {row[0]: row for row in Book.objects.filter(id__in=list(ids)).values_list('id', 'title', 'author', 'isbn')}
+        return [
+            {'id': book_id, 'title': title, 'author': author, 'isbn': isbn, 'score': None}
+            for book_id, title, author, isbn in (rows[book_id] for book_id in ids if book_id in rows)
+        ]
+
+    def _apply(self, change):
+        """应用一次变更；索引构建期间暂存，构建完成后重放"""
+        with self._state_lock:
+            if not self._ready.is_set():
+                if self._building:
+                    self._pending.append(change)
+                return
+        change()
+
+    def book_saved(self, book):
+        self._apply(lambda: self.index.add(book.pk, book.title, book.author, book.isbn))
+
+    def book_deleted(self, book_id):
+        self._apply(lambda: self.index.remove(book_id))
+
+    def _maybe_sync(self):
+        """距上次同步超过间隔时在后台读取其他进程写入的变更"""
+        now = time.monotonic()
+        with self._state_lock:
+            if not self._ready.is_set() or self._syncing or now - self._last_sync_check < self._interval():
+                return
+            self._last_sync_check = now
+            self._syncing = True
+        self._start_thread(self.sync, 'book-suggest-sync')
+
+    def sync(self):
+        """
+        读取其他进程写入的变更
+
+        本进程的变更已由信号增量更新。这里按 updated_at（有索引）读取上次同步之后修改的图书；
+        删除无法按时间查询，每隔 SUGGEST_INDEX_FULL_SYNC_INTERVAL 秒才对比一次全部ID。
+        """
+        from books.models import Book
+        from django.utils import timezone
+        from datetime import timedelta
+        try:
+            started_at = timezone.now()
+            # 留出余量，避免漏掉上次同步时尚未提交的写入
+            since = self._synced_at - timedelta(seconds=5)
+            changed = Book.objects.filter(updated_at__gte=since).values_list('id', 'title', 'author', 'isbn')
+            for book_id, title, author, isbn in changed.iterator(chunk_size=5000):
+                self.index.add(book_id, title, author, isbn)
+            self._synced_at = started_at
+
+            now = time.monotonic()
+            if now - self._last_full_sync >= self._full_sync_interval():
+                self._last_full_sync = now
+                indexed = self.index.ids()
+                existing = set(Book.objects.values_list('id', flat=True).iterator(chunk_size=10000))
+                for book_id in indexed - existing:
+                    self.index.remove(book_id)
+        except Exception as e:
+            logger.warning(f"图书搜索建议索引同步失败: {str(e)}")
+        finally:
+            with self._state_lock:
+                self._syncing = False
+
+    def get_stats(self):
+        stats = self.index.get_stats()
+        stats.update({'ready': self._ready.is_set(), 'build_seconds': self.build_seconds})
+        return stats
+
+
+book_suggester = BookSuggester()
+
+
+def _book_saved(sender, instance, using=None, **kwargs):
+    transaction.on_commit(lambda: book_suggester.book_saved(instance), using=using)
+
+
+def _book_deleted(sender, instance, using=None, **kwargs):
+    book_id = instance.pk
+    transaction.on_commit(lambda: book_suggester.book_deleted(book_id), using=using)
+
+
+def connect_suggest_index(model):
+    """为图书模型连接信号：变更提交后增量更新索引"""
+    from django.db.models.signals import post_save, post_delete
+    uid = f"suggest_index:{model._meta.label}"
+    post_save.connect(_book_saved, sender=model, dispatch_uid=uid)
+    post_delete.connect(_book_deleted, sender=model, dispatch_uid=uid)
@@ -0,0 +1,94 @@
+"""
+模板片段缓存标签（Russian-doll 风格）
+
+用法:
+    {% load fragment_cache %}
+    {% cachefragment 'book_grid' object_list user.is_admin %}
+        {% for book in object_list %}
+            {% cachefragment 'book_card' book user.is_admin %}...{% endcachefragment %}
+        {% endfor %}
+    {% endcachefragment %}
+
+缓存键由片段名称和各参数生成：模型实例和紧凑行（CompactRow）取 "<模型>:<主键>@<updated_at>"，列表取其中每个元素，
+因此对象更新后键自动变化。外层片段的键包含所有内层对象，任一对象变化时外层重新拼装，
+其余未变化的内层片段直接命中缓存。模型实例的主键和外键同时作为缓存标签
+（例如 book:42、category:7），关联对象（如分类改名）变更时片段随之失效。
+"""
+import hashlib
+from django import template
+from django.conf import settings
+from django.core.paginator import Page
+from django.db.models import Model, QuerySet
+from django.utils.safestring import mark_safe
+from library_management.cache import cache, model_cache_tags
+from library_management.pagination import CompactRow
+
+register = template.Library()
+
+
+def _vary_parts(value, tags):
+    """将片段参数转换为缓存键片段，并收集模型实例的缓存标签"""
+    if isinstance(value, Model):
+        updated_at = getattr(value, 'updated_at', None)
+        stamp = updated_at.timestamp() if updated_at else ''
+        # 去掉 'model:<类名>' 标签，避免任意一条记录变更就使所有片段失效
+        tags.update(model_cache_tags(value)[1:])
+        return f"{value._meta.label_lower}:{value.pk}@{stamp}"
+    if isinstance(value, CompactRow):
+        tags.update(value.cache_tags())
+        return value.cache_key()
+    if isinstance(value, (list, tuple, QuerySet, Page)):
+        return '[' + ','.join(_vary_parts(item, tags) for item in value) + ']'
+    if isinstance(value, dict):
+        return '{' + ','.join(f"{k}={_vary_parts(v, tags)}" for k, v in sorted(value.items())) + '}'
+    return str(value)
+
+
+def make_fragment_key(fragment_name, vary_on):
+    """
+    生成片段缓存键和标签
+
+    Args:
+        fragment_name: 片段名称
+        vary_on: 参数列表（模型实例、列表或普通值）
+
+    Returns:
+        (缓存键, 标签列表)
+    """
+    tags = set()
+    vary_string = '|'.join(_vary_parts(value, tags) for value in vary_on)
+    digest = hashlib.md5(vary_string.encode('utf-8')).hexdigest()
+    return f"{fragment_name}:{digest}", sorted(tags)
+
+
+class FragmentCacheNode(template.Node):
+    def __init__(self, nodelist, fragment_name, vary_on):
+        self.nodelist = nodelist
+        self.fragment_name = fragment_name
+        self.vary_on = vary_on
+
+    def render(self, context):
+        fragment_name = self.fragment_name.resolve(context)
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        key, tags = make_fragment_key(fragment_name, vary_on)
+        timeout = getattr(settings, 'FRAGMENT_CACHE_TIMEOUT', 3600)
+        return mark_safe(cache.get_or_set(
+            key, lambda: self.nodelist.render(context), timeout=timeout, namespace='fragments', tags=tags
+        ))
+
+
+@register.tag('cachefragment')
+def do_cachefragment(parser, token):
+    """
+    {% cachefragment <名称> [参数 ...] %} ... {% endcachefragment %}
+    """
+    bits = token.split_contents()
+    if len(bits) < 2:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' 标签至少需要一个参数（片段名称）")
+    nodelist = parser.parse(('endcachefragment',))
+    parser.delete_first_token()
+    return FragmentCacheNode(
+        nodelist,
+        parser.compile_filter(bits[1]),
+        [parser.compile_filter(bit) for bit in bits[2:]],
+    )
@@ -7,6 +7,8 @@ app_name = 'books'
 urlpatterns = [
     path('', views.home, name='home'),
     path('list/', views.book_list, name='book_list'),
+    path('api/list/', views.book_list_api, name='book_list_api'),  # 图书列表JSON接口（无限滚动）
+    path('api/suggest/', views.book_suggest, name='book_suggest'),  # 搜索建议JSON接口（自动补全）
     path('<int:book_id>/', views.book_detail, name='book_detail'),
     path('create/', views.book_create, name='book_create'),
     path('<int:book_id>/update/', views.book_update, name='book_update'),
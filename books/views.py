@@ -4,20 +4,26 @@ from django.contrib import messages
 from django.core.paginator import Paginator
 from django.db.models import Q
 from django.http import HttpResponse, JsonResponse
-from django.views.decorators.http import require_http_methods
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import urlencode
+from django.views.decorators.http import require_http_methods, require_GET
+import hashlib
+import json
 import pandas as pd
 from datetime import datetime
 import logging
 from accounts.models import CustomUser
 from .models import Book
 from .forms import BookForm
+from .search import search_book_ids
+from .suggest import book_suggester
 from library_management.cache import (
     cache, CACHE_KEY_HOME_STATS, CACHE_KEY_CATEGORIES, CACHE_KEY_PAGINATED_BOOKS,
     CACHE_KEY_BOOK_LIST, CACHE_KEY_POPULAR_BOOKS, CACHE_KEY_RECENT_BOOKS,
-    CACHE_KEY_BOOK_DETAIL, CACHE_KEY_SEARCH_RESULTS, cache_query, get_cache_key_with_params,
+    CACHE_KEY_BOOK_DETAIL, CACHE_KEY_SEARCH_RESULTS, cache_query, cache_result, get_cache_key_with_params,
     invalidate_book_cache
 )
-from library_management.pagination import get_paginated_books, get_pagination_context, PaginationCacheManager
+from library_management.pagination import get_paginated_books, get_pagination_context, PaginationCacheManager, prefetch_client
 from library_management.excel_export import ExcelExporter, ExcelImporter
 
 logger = logging.getLogger(__name__)
@@ -32,7 +38,13 @@ def check_admin_permission(request, error_message="您没有权限执行此操
         return False
     return True
 
-@cache_query(timeout=600, namespace='books')
+# 缓存标签：相关模型或对象变更时，依赖它的缓存项自动失效
+BOOK_LIST_TAGS = ['model:Book', 'model:Category']
+
+# 首页数据：10分钟后软过期，30分钟内先返回旧值并在后台刷新，避免过期瞬间阻塞请求；
+# 使用固定的缓存键，管理页面"清除首页缓存"按键删除
+@cache_result(key_func=lambda: CACHE_KEY_POPULAR_BOOKS, timeout=600, namespace='books', hard_timeout=1800,
+              negative_timeout=60, tags=['model:Book', 'model:BorrowRecord'])
 def get_popular_books():
     """获取热门图书（按借阅次数排序）"""
     from borrowing.models import BorrowRecord
@@ -45,12 +57,14 @@ def get_popular_books():
 
     return list(popular_books)
 
-@cache_query(timeout=600, namespace='books')
+@cache_result(key_func=lambda: CACHE_KEY_RECENT_BOOKS, timeout=600, namespace='books', hard_timeout=1800,
+              tags=BOOK_LIST_TAGS)
 def get_recent_books():
     """获取最新添加的图书"""
     return list(Book.objects.all().order_by('-created_at')[:8])
 
-@cache_query(timeout=600, namespace='books')
+@cache_result(key_func=lambda: CACHE_KEY_HOME_STATS, timeout=600, namespace='books', hard_timeout=1800,
+              tags=BOOK_LIST_TAGS)
 def get_home_stats():
     """获取首页统计数据"""
     return {
@@ -61,22 +75,23 @@ def get_home_stats():
 
 def home(request):
     """首页视图，使用缓存优化"""
-    # 并行获取缓存数据
-    recent_books = cache.get_or_set(CACHE_KEY_RECENT_BOOKS, get_recent_books, timeout=600, namespace='books')
-    popular_books = cache.get_or_set(CACHE_KEY_POPULAR_BOOKS, get_popular_books, timeout=600, namespace='books')
-    stats = cache.get_or_set(CACHE_KEY_HOME_STATS, get_home_stats, timeout=600, namespace='books')
-
     home_data = {
-        'recent_books': recent_books,
-        'popular_books': popular_books,
-        **stats
+        'recent_books': get_recent_books(),
+        'popular_books': get_popular_books(),
+        **get_home_stats()
     }
 
     return render(request, 'books/home.html', home_data)
 
-@cache_query(timeout=300, namespace='books')
+@cache_query(timeout=300, namespace='books', negative_timeout=60, tags=BOOK_LIST_TAGS)
 def get_books_with_filters(query='', category_id=''):
-    """获取带筛选条件的图书列表（缓存版本）"""
+    """获取带筛选条件的图书列表（缓存版本），有搜索词时按相关度排序"""
+    if query:
+        ranked_ids = search_book_ids(query, category_id)
+        if ranked_ids is not None:
+            books = Book.objects.select_related('category').in_bulk(ranked_ids)
+            return [books[book_id] for book_id in ranked_ids if book_id in books]
+
     books = Book.objects.select_related('category').all().order_by('title')
 
     if query:
@@ -96,6 +111,7 @@ def book_list(request):
     query = request.GET.get('q', '').strip()
     category_id = request.GET.get('category', '').strip()
     page_number = request.GET.get('page', 1)
+    cursor = request.GET.get('cursor') or None
     per_page = int(request.GET.get('per_page', 12))
 
     # 验证页码
@@ -118,7 +134,7 @@ def book_list(request):
         categories = list(Book.objects.values('category__name', 'category__id')
                           .filter(category__isnull=False)
                           .distinct())
-        cache.set(categories_cache_key, categories, timeout=1800, namespace='books')  # 30分钟缓存
+        cache.set(categories_cache_key, categories, timeout=1800, namespace='books', tags=BOOK_LIST_TAGS)  # 30分钟缓存
 
     # 使用优化的分页获取数据
     try:
@@ -126,7 +142,9 @@ def book_list(request):
             query=query,
             category_id=category_id,
             page=page_number,
-            per_page=per_page
+            per_page=per_page,
+            cursor=cursor,
+            client=prefetch_client(request)
         )
 
         # 生成分页上下文
@@ -163,7 +181,96 @@ def book_list(request):
             'error_message': "分页功能暂时不可用，显示前12条记录"
         })
 
-@cache_query(timeout=600, namespace='books')
+def _slim_book(row):
+    """图书列表 API 的精简行，只包含滚动列表需要的字段"""
+    return {
+        'id': row.id,
+        'title': row.title,
+        'author': row.author,
+        'available': row.available_copies > 0,
+        'available_copies': row.available_copies,
+        'cover_url': row.cover_image_url,
+    }
+
+@login_required
+@require_GET
+def book_list_api(request):
+    """
+    图书列表 JSON 接口（无限滚动）
+
+    参数与图书列表页相同（q、category、per_page），翻页使用上一次响应的 next_url
+    （浏览时为 cursor，搜索结果为 page）。
+    数据来自与列表页相同的分页缓存（紧凑行 + 缓存的总数），不渲染模板、不重新计数；
+    响应带 ETag，内容未变化时返回 304。
+    """
+    query = request.GET.get('q', '').strip()
+    category_id = request.GET.get('category', '').strip()
+    cursor = request.GET.get('cursor') or None
+    try:
+        per_page = int(request.GET.get('per_page', 12))
+        page_number = max(1, int(request.GET.get('page', 1)))
+    except (ValueError, TypeError):
+        per_page, page_number = 12, 1
+    if per_page not in (12, 24, 48, 96):
+        per_page = 12
+
+    data = get_paginated_books(query=query, category_id=category_id, page=page_number, per_page=per_page,
+                               cursor=cursor, client=prefetch_client(request))
+
+    # 浏览时按游标翻页；搜索结果按相关度排序，没有游标，按页码翻页
+    next_cursor = data.get('next_cursor')
+    next_params = None
+    if next_cursor:
+        next_params = {'cursor': next_cursor}
+    elif data.get('has_next'):
+        next_params = {'page': data['next_page_number']}
+    next_url = None
+    if next_params:
+        next_url = request.path + '?' + urlencode(
+            {'q': query, 'category': category_id, 'per_page': per_page, **next_params}
+        )
+    body = json.dumps({
+        'results': [_slim_book(row) for row in data['object_list']],
+        'next': next_cursor,
+        'next_url': next_url,
+        'total': data.get('total_items', 0),
+        'total_is_estimate': data.get('count_is_estimate', False),
+    }, ensure_ascii=False).encode('utf-8')
+
+    etag = f'"{hashlib.md5(body).hexdigest()}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    # 需要登录才能访问，只允许浏览器缓存，且每次使用前用 ETag 重新验证
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+@login_required
+@require_GET
+def book_suggest(request):
+    """
+    图书搜索建议 JSON 接口（搜索框自动补全）
+
+    参数 q 为输入内容，limit 为返回条数（最多 20）。结果来自进程内的 n-gram 索引，
+    容忍个别错字，按相似度排序，不查询数据库；进程内索引未构建时 ready 为 false，
+    结果改由数据库全文索引给出。
+    """
+    query = request.GET.get('q', '').strip()[:100]
+    try:
+        limit = min(max(1, int(request.GET.get('limit', 10))), 20)
+    except (ValueError, TypeError):
+        limit = 10
+
+    results = book_suggester.suggest(query, limit) if query else []
+    ready = book_suggester.is_ready()
+    response = JsonResponse({'query': query, 'results': results, 'ready': ready},
+                            json_dumps_params={'ensure_ascii': False})
+    patch_cache_control(response, private=True, max_age=30)
+    return response
+
+@cache_query(timeout=600, namespace='books',
+             tags=lambda book_id, user_id=None: [f"book:{book_id}", 'model:Category'])
 def get_book_detail_data(book_id, user_id=None):
     """获取图书详情数据的缓存函数"""
     book = Book.objects.select_related('category').get(id=book_id)
@@ -186,19 +293,9 @@ def get_book_detail_data(book_id, user_id=None):
 @login_required
 def book_detail(request, book_id):
     """图书详情视图，使用缓存优化"""
-    cache_key = get_cache_key_with_params(CACHE_KEY_BOOK_DETAIL, book_id=book_id)
-
-    # 生成缓存键的函数
-    def key_func():
-        user_id = request.user.id if request.user.is_authenticated else None
-        return get_cache_key_with_params(CACHE_KEY_BOOK_DETAIL, book_id=book_id, user_id=user_id)
-
-    # 获取缓存数据或执行查询
-    data = cache.get(key_func())
-    if data is None:
-        user_id = request.user.id if request.user.is_authenticated else None
-        data = get_book_detail_data(book_id, user_id)
-        cache.set(key_func(), data, timeout=600)  # 10分钟缓存
+    # get_book_detail_data 自身按参数缓存（键与调用方式无关），无需再包一层缓存
+    user_id = request.user.id if request.user.is_authenticated else None
+    data = get_book_detail_data(book_id, user_id)
 
     return render(request, 'books/book_detail.html', data)
 
@@ -402,19 +499,7 @@ def import_books_excel(request):
         logger.info(f"导入结果: {result}")
 
         if result['success']:
-            # 清除相关缓存 - 清除所有图书相关的缓存
-            patterns_to_clear = [
-                "popular_books",
-                "recent_books",
-                "home_stats",
-                "book_list",
-                "category_stats",
-                "search_results",
-                "pagination_cache"
-            ]
-
-            for pattern in patterns_to_clear:
-                cache.delete(pattern, namespace='books')
+            # 导入的图书和分类通过 post_save 信号自动失效 model:Book、model:Category 等缓存标签
 
             # 记录操作日志
             logger.info(f"管理员 {request.user.username} 成功导入 {result['imported_count']} 本图书")
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-17 05:03
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0005_book_query_indexes'),
+        ('borrowing', '0002_bookreservation'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='borrowrecord',
+            index=models.Index(fields=['-borrow_date'], name='borrowing_b_borrow__6f5971_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='borrowrecord',
+            index=models.Index(fields=['user', '-borrow_date'], name='borrowing_b_user_id_262624_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='borrowrecord',
+            index=models.Index(fields=['user', 'book', 'status'], name='borrowing_b_user_id_fc88cd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='borrowrecord',
+            index=models.Index(fields=['user', 'status', 'due_date'], name='borrowing_b_user_id_41b79a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='borrowrecord',
+            index=models.Index(condition=models.Q(('status', 'borrowed')), fields=['due_date'], name='borrow_active_due_idx'),
+        ),
+    ]
@@ -1,9 +1,10 @@
 from django.db import models, transaction
-from django.db.models import F
+from django.db.models import F, Q
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 from books.models import Book
+from library_management.cache import connect_cache_tags
 import logging
 
 logger = logging.getLogger(__name__)
@@ -30,6 +31,14 @@ class BorrowRecord(models.Model):
         verbose_name = '借阅记录'
         verbose_name_plural = '借阅记录'
         ordering = ['-borrow_date']
+        indexes = [
+            models.Index(fields=['-borrow_date']),                # 借阅记录列表
+            models.Index(fields=['user', '-borrow_date']),        # 我的借阅记录
+            models.Index(fields=['user', 'book', 'status']),      # 重复借阅检查、图书详情中的个人记录
+            models.Index(fields=['user', 'status', 'due_date']),  # 更新个人的逾期状态
+            # 只索引借阅中的记录：到期提醒和逾期检查只查询 status='borrowed'，已归还的记录占大多数
+            models.Index(fields=['due_date'], condition=Q(status='borrowed'), name='borrow_active_due_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.book.title}"
@@ -291,4 +300,8 @@ class BookReservation(models.Model):
         # 尝试通知下一个等待的用户
         BookReservation.process_available_book(self.book)
 
-        return True
\ No newline at end of file
+        return True
+
+
+# 借阅记录变更后按标签失效相关缓存（book:<id>、user:<id>、model:BorrowRecord）
+connect_cache_tags(BorrowRecord)
@@ -109,15 +109,7 @@ def borrow_book(request, book_id):
         
         logger.info(f"用户{request.user.username}成功借阅图书{book.title}(ID:{book.id})")
 
-        # 在事务内部处理缓存清理
-        try:
-            cache.delete(CACHE_KEY_HOME_STATS, namespace='books')
-            cache.delete(CACHE_KEY_BOOK_LIST, namespace='books')
-            cache.delete(CACHE_KEY_CATEGORIES, namespace='books')
-            # 清除所有分页缓存
-            cache.clear('books')
-        except Exception as cache_error:
-            logger.warning(f"缓存清理失败: {str(cache_error)}")
+        # 缓存无需手动清理：borrow_book() 与借阅记录的 post_save 信号已失效 book:<id>、user:<id> 等相关标签
 
         # 检查用户选择的重定向目标
         redirect_to = request.POST.get('redirect_to', 'my_records')
@@ -1,4 +1,5 @@
 from django.db import models
+from library_management.cache import connect_cache_tags
 
 class Category(models.Model):
     name = models.CharField(max_length=100, unique=True, verbose_name='分类名称')
@@ -15,4 +16,8 @@ class Category(models.Model):
 
     @property
     def book_count(self):
-        return self.book_set.count()
\ No newline at end of file
+        return self.book_set.count()
+
+
+# 分类变更后按标签失效相关缓存（category:<id>、model:Category）
+connect_cache_tags(Category)
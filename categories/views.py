@@ -17,7 +17,8 @@ def category_list(request):
     categories = cache.get_or_set(
         CACHE_KEY_CATEGORY_LIST,
         lambda: list(Category.objects.all().order_by('name')),
-        timeout=1800  # 30分钟
+        timeout=1800,  # 30分钟
+        tags=['model:Category']
     )
 
     paginator = Paginator(categories, 10)
@@ -39,9 +40,7 @@ def category_create(request):
     if request.method == 'POST':
         form = CategoryForm(request.POST)
         if form.is_valid():
-            form.save()
-            # 清除缓存
-            cache.delete(CACHE_KEY_CATEGORY_LIST)
+            form.save()  # 分类列表缓存通过 model:Category 标签自动失效
             messages.success(request, '分类创建成功！')
             return redirect('categories:category_list')
     else:
@@ -57,9 +56,7 @@ def category_update(request, category_id):
     if request.method == 'POST':
         form = CategoryForm(request.POST, instance=category)
         if form.is_valid():
-            form.save()
-            # 清除缓存
-            cache.delete(CACHE_KEY_CATEGORY_LIST)
+            form.save()  # 分类列表缓存通过 model:Category 标签自动失效
             messages.success(request, '分类更新成功！')
             return redirect('categories:category_list')
     else:
@@ -1,49 +1,177 @@
+import os
+import json
 import time
-from threading import RLock
-from typing import Dict, Any, Optional, Callable, Tuple, List
-from collections import OrderedDict
+import hashlib
+import inspect
+import logging
+import datetime
+import functools
+import threading
+from decimal import Decimal
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, Optional, Callable, List, NamedTuple, Iterable, Tuple
+from .cache_backends import BaseCacheBackend, LocMemBackend, create_cache_backend
+
+logger = logging.getLogger(__name__)
+
+# 内部使用的"未命中"标记，与缓存中合法的 None 值区分
+_MISSING = object()
+
+# 当前请求的缓存命中/未命中计数（由 track_cache_usage 设置），后台线程不继承
+_request_usage: ContextVar[Optional[Dict[str, int]]] = ContextVar('cache_request_usage', default=None)
+
+
+@contextmanager
+def track_cache_usage():
+    """
+    统计代码块内（当前线程/协程）的缓存命中与未命中次数，供请求分析中间件使用
+
+    Yields:
+        {'hits': int, 'misses': int}，在代码块执行过程中实时累加
+    """
+    usage = {'hits': 0, 'misses': 0}
+    token = _request_usage.set(usage)
+    try:
+        yield usage
+    finally:
+        _request_usage.reset(token)
+
+
+def _record_usage(hits: int = 0, misses: int = 0) -> None:
+    """累加到当前请求的缓存使用计数（未启用 track_cache_usage 时不做任何事）"""
+    usage = _request_usage.get()
+    if usage is not None:
+        usage['hits'] += hits
+        usage['misses'] += misses
+
+
+def _is_negative(value: Any) -> bool:
+    """判断是否为"空结果"（None、空容器或 0），用于负缓存和负命中统计"""
+    if value is None:
+        return True
+    if isinstance(value, (list, tuple, dict, set, frozenset, str)):
+        return len(value) == 0
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value == 0
+    return False
+
+
+class _CacheEnvelope(NamedTuple):
+    """
+    带附加信息的缓存值
+
+    fresh_until: 软过期时间，超过后仍可返回，但需要后台刷新；None 表示未启用
+    tag_versions: 写入时各标签的版本，任一标签版本变化即视为失效
+    """
+    value: Any
+    fresh_until: Optional[float] = None
+    tag_versions: Tuple[Tuple[str, int], ...] = ()
+
+
+class _InFlightCall:
+    """正在进行中的一次缓存计算，供同一键的并发调用者等待其结果"""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+    def set_result(self, result: Any) -> None:
+        self.result = result
+        self._event.set()
+
+    def set_error(self, error: BaseException) -> None:
+        self.error = error
+        self._event.set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._event.wait(timeout)
 
 
 class EnhancedCache:
-    """增强版内存缓存实现，支持过期时间、线程安全、命名空间、LRU策略和统计"""
+    """增强版缓存实现，支持过期时间、线程安全、命名空间、LRU策略、统计和可插拔存储后端"""
     
-    def __init__(self, default_timeout: int = 300, max_size: int = 1000):
+    def __init__(self, default_timeout: int = 300, max_size: int = 1000, backend: Optional[BaseCacheBackend] = None,
+                 sweep_interval: Optional[float] = None):
         """
         初始化缓存
         
         Args:
             default_timeout: 默认缓存过期时间（秒），默认为5分钟
             max_size: 缓存最大项数，超过将使用LRU策略移除
+            backend: 存储后端，默认使用进程内的 LocMemBackend
+            sweep_interval: 后台过期清理的间隔（秒），None 或 0 表示不启用，仅在读取时惰性删除
         """
-        self._cache: Dict[str, Tuple[Any, float, float]] = {}  # (value, expiry, last_accessed)
-        self._lock = RLock()  # 使用可重入锁保证线程安全
         self.default_timeout = default_timeout
         self.max_size = max_size
-        # 用于LRU策略的有序字典
-        self._lru = OrderedDict()
-        # 统计信息
-        self._stats = {
-            'hits': 0,
-            'misses': 0,
-            'sets': 0,
-            'deletes': 0,
-            'expired': 0
-        }
+        self.backend = backend if backend is not None else LocMemBackend(max_size=max_size)
+        # 单飞（single-flight）控制：键 -> 正在进行的计算
+        self._inflight: Dict[str, _InFlightCall] = {}
+        self._inflight_lock = threading.Lock()
+        # 后台过期清理线程（首次写入时按进程启动，fork 后的子进程会重新启动）
+        self.sweep_interval = sweep_interval
+        self._sweeper_pid: Optional[int] = None
+        self._sweeper_stop = threading.Event()
+        self._sweeper_lock = threading.Lock()
+        self._last_sweep_ms = 0.0
+        self._max_sweep_ms = 0.0
+        # 本进程写入过的最长存活时间（秒），决定失效后的代数记录需要保留多久
+        self._longest_ttl = float(default_timeout)
     
-    def _make_key(self, key: Any, namespace: Optional[str] = None) -> str:
-        """将任意类型的键转换为字符串，支持命名空间"""
-        if namespace:
-            return f"{namespace}:{str(key)}"
-        return str(key)
+    @staticmethod
+    def _namespace_levels(namespace: str) -> List[str]:
+        """拆分嵌套命名空间，例如 'books:search' -> ['books', 'books:search']"""
+        parts = namespace.split(':')
+        return [':'.join(parts[:i]) for i in range(1, len(parts) + 1)]
     
-    def _enforce_lru(self) -> None:
-        """实施LRU策略，当缓存超过最大大小时删除最久未使用的项"""
-        while len(self._cache) >= self.max_size:
-            # 移除最久未使用的项
-            oldest_key, _ = self._lru.popitem(last=False)
-            if oldest_key in self._cache:
-                del self._cache[oldest_key]
+    def _make_key(self, key: Any, namespace: Optional[str] = None) -> str:
+        """
+        将任意类型的键转换为字符串，支持命名空间
+        
+        命名空间键中包含各级命名空间的代数，例如 'books:search#3.1:key'。
+        清空命名空间只需让其代数加一，旧键不再被访问，随 LRU 或过期自然淘汰；
+        父命名空间的代数变化同样会使所有子命名空间失效。
+        """
+        return f"{self._key_prefix(namespace)}{str(key)}"
     
+    def _key_prefix(self, namespace: Optional[str]) -> str:
+        """生成命名空间键前缀（含代数），批量操作时只需计算一次"""
+        if not namespace:
+            return ''
+        generations = self.backend.get_generations(self._namespace_levels(namespace))
+        token = '.'.join(str(generation) for generation in generations)
+        return f"{namespace}#{token}:"
+
+    # 标签版本与命名空间代数共用后端的代数存储，加前缀避免与命名空间重名
+    TAG_PREFIX = 'tag#'
+    # 代数记录在最长存活时间之外再保留的秒数：覆盖失效前读取版本、失效后才写入的计算
+    GENERATION_GRACE = 300
+
+    def _generation_retain_until(self) -> float:
+        """
+        失效时代数记录的保留期限
+
+        此后依赖旧代数的缓存项都已过期，后台清理删除该记录（代数回到 0），
+        失效过的标签和命名空间不会在后端无限累积。
+        """
+        return time.time() + self._longest_ttl + self.GENERATION_GRACE
+
+    def _tag_versions(self, tags: Optional[Iterable[str]]) -> Tuple[Tuple[str, int], ...]:
+        """读取标签的当前版本，写入缓存时与值一起保存"""
+        if not tags:
+            return ()
+        tags = sorted(set(tags))
+        versions = self.backend.get_generations([self.TAG_PREFIX + tag for tag in tags])
+        return tuple(zip(tags, versions))
+
+    def _tags_valid(self, tag_versions: Tuple[Tuple[str, int], ...]) -> bool:
+        """检查缓存项写入后其依赖的标签是否被失效过"""
+        if not tag_versions:
+            return True
+        current = self.backend.get_generations([self.TAG_PREFIX + tag for tag, _ in tag_versions])
+        return all(version == latest for (_, version), latest in zip(tag_versions, current))
+
     def get(self, key: Any, default: Any = None, namespace: Optional[str] = None) -> Any:
         """
         获取缓存值
@@ -56,39 +184,57 @@ class EnhancedCache:
         Returns:
             缓存的值或默认值
         """
-        key_str = self._make_key(key, namespace)
-        current_time = time.time()
+        value = self._lookup(self._make_key(key, namespace))
+        if value is _MISSING:
+            return default
+        if isinstance(value, _CacheEnvelope):
+            return value.value
+        return value
+    
+    def _lookup(self, key_str: str, record_stats: bool = True) -> Any:
+        """按完整键读取缓存，未命中或已过期时返回 _MISSING"""
+        entry = self.backend.get(key_str)
         
-        with self._lock:
-            # 检查键是否存在
-            if key_str not in self._cache:
-                self._stats['misses'] += 1
-                return default
-            
-            # 获取缓存值和过期时间
-            value, expiry, _ = self._cache[key_str]
-            
-            # 检查是否已过期
-            if expiry < current_time:
-                # 删除过期缓存
-                del self._cache[key_str]
-                if key_str in self._lru:
-                    del self._lru[key_str]
-                self._stats['misses'] += 1
-                self._stats['expired'] += 1
-                return default
-            
-            # 更新访问时间和LRU顺序
-            self._cache[key_str] = (value, expiry, current_time)
-            if key_str in self._lru:
-                self._lru.move_to_end(key_str)
+        # 检查键是否存在
+        if entry is None:
+            if record_stats:
+                self.backend.incr_stats(misses=1)
+                _record_usage(misses=1)
+            return _MISSING
+        
+        value, expiry = entry
+        
+        # 检查是否已过期
+        if expiry < time.time():
+            # 删除过期缓存
+            self.backend.delete(key_str)
+            if record_stats:
+                self.backend.incr_stats(misses=1, expired=1)
+                _record_usage(misses=1)
+            return _MISSING
+
+        # 检查依赖的标签是否已失效
+        if isinstance(value, _CacheEnvelope) and not self._tags_valid(value.tag_versions):
+            self.backend.delete(key_str)
+            if record_stats:
+                self.backend.incr_stats(misses=1, tag_evictions=1)
+                _record_usage(misses=1)
             else:
-                self._lru[key_str] = current_time
-            
-            self._stats['hits'] += 1
-            return value
+                self.backend.incr_stats(tag_evictions=1)
+            return _MISSING
+
+        if record_stats:
+            inner = value.value if isinstance(value, _CacheEnvelope) else value
+            if _is_negative(inner):
+                # 负命中（缓存的空结果）单独计数，同时计入总命中
+                self.backend.incr_stats(hits=1, negative_hits=1)
+            else:
+                self.backend.incr_stats(hits=1)
+            _record_usage(hits=1)
+        return value
     
-    def set(self, key: Any, value: Any, timeout: Optional[int] = None, namespace: Optional[str] = None) -> None:
+    def set(self, key: Any, value: Any, timeout: Optional[int] = None, namespace: Optional[str] = None,
+            tags: Optional[Iterable[str]] = None) -> None:
         """
         设置缓存值
         
@@ -97,26 +243,38 @@ class EnhancedCache:
             value: 缓存值
             timeout: 过期时间（秒），None表示使用默认值
             namespace: 命名空间，用于隔离缓存
+            tags: 依赖标签（可选），例如 ['book:42', 'model:Book']，invalidate_tags 时一并失效
         """
-        key_str = self._make_key(key, namespace)
-        timeout = self.default_timeout if timeout is None else timeout
-        expiry = time.time() + timeout
-        current_time = time.time()
+        self._store(self._make_key(key, namespace), value, timeout, tag_versions=self._tag_versions(tags))
+    
+    def _store(self, key_str: str, value: Any, timeout: Optional[int] = None, hard_timeout: Optional[int] = None,
+               negative_timeout: Optional[int] = None, tag_versions: Tuple[Tuple[str, int], ...] = ()) -> None:
+        """
+        按完整键写入缓存
         
-        with self._lock:
-            # 实施LRU策略
-            if key_str not in self._cache and len(self._cache) >= self.max_size:
-                self._enforce_lru()
-            
-            # 存储缓存值
-            self._cache[key_str] = (value, expiry, current_time)
-            # 更新LRU顺序
-            if key_str in self._lru:
-                self._lru.move_to_end(key_str)
-            else:
-                self._lru[key_str] = current_time
-            
-            self._stats['sets'] += 1
+        指定 hard_timeout 时，timeout 作为软过期时间：软过期后到 hard_timeout 之前，
+        get_or_set 仍返回旧值并在后台刷新。
+        指定 negative_timeout 时，空结果使用该（通常更短的）过期时间，且不启用后台刷新。
+        tag_versions 应在计算值之前读取：计算期间标签被失效时，写入的结果随即作废。
+        """
+        if self.sweep_interval and self._sweeper_pid != os.getpid():
+            self.start_sweeper()
+        timeout = self.default_timeout if timeout is None else timeout
+        now = time.time()
+        fresh_until = None
+        if negative_timeout is not None and _is_negative(value):
+            expiry = now + negative_timeout
+            self.backend.incr_stats(negative_sets=1)
+        elif hard_timeout is not None and hard_timeout > timeout:
+            expiry = now + hard_timeout
+            fresh_until = now + timeout
+        else:
+            expiry = now + timeout
+        self._longest_ttl = max(self._longest_ttl, expiry - now)
+        if fresh_until is not None or tag_versions:
+            value = _CacheEnvelope(value, fresh_until, tag_versions)
+        self.backend.set(key_str, value, expiry)
+        self.backend.incr_stats(sets=1)
     
     def delete(self, key: Any, namespace: Optional[str] = None) -> bool:
         """
@@ -131,176 +289,513 @@ class EnhancedCache:
         """
         key_str = self._make_key(key, namespace)
         
-        with self._lock:
-            if key_str in self._cache:
-                del self._cache[key_str]
-                if key_str in self._lru:
-                    del self._lru[key_str]
-                self._stats['deletes'] += 1
-                return True
-            return False
+        if self.backend.delete(key_str):
+            self.backend.incr_stats(deletes=1)
+            return True
+        return False
     
     def clear(self, namespace: Optional[str] = None) -> None:
         """
         清空所有缓存或指定命名空间的缓存
         
         Args:
-            namespace: 命名空间，如果指定则只清空该命名空间的缓存
-        """
-        with self._lock:
-            if namespace:
-                # 清空指定命名空间的缓存
-                namespace_prefix = f"{namespace}:"
-                keys_to_delete = [k for k in self._cache.keys() if k.startswith(namespace_prefix)]
-                for key in keys_to_delete:
-                    del self._cache[key]
-                    if key in self._lru:
-                        del self._lru[key]
-                    self._stats['deletes'] += 1
-            else:
-                # 清空所有缓存
-                self._cache.clear()
-                self._lru.clear()
-                self._stats['deletes'] += len(self._cache)
+            namespace: 命名空间，如果指定则只清空该命名空间（及其子命名空间）的缓存
+        """
+        if namespace:
+            # O(1) 失效：递增代数即可，不扫描键
+            self.backend.incr_generation(namespace, self._generation_retain_until())
+            self.backend.incr_stats(invalidations=1)
+            return
+        deleted = self.backend.clear()
+        self.backend.incr_stats(deletes=deleted)
+    
+    def invalidate_tags(self, *tags: str) -> None:
+        """
+        使带有任一指定标签的缓存项失效
+        
+        与清空命名空间相同，只递增标签版本而不扫描键；依赖这些标签的缓存项
+        在下次读取时被删除，未带这些标签的缓存不受影响。
+        
+        Args:
+            *tags: 标签，例如 'book:42'、'category:7'、'model:Book'
+        """
+        tags = set(tags)
+        if tags:
+            # 一次加锁（SQLite 后端为一个事务）递增全部标签版本
+            self.backend.incr_generations(
+                [self.TAG_PREFIX + tag for tag in sorted(tags)], self._generation_retain_until()
+            )
+            self.backend.incr_stats(invalidations=len(tags))
+    
+    # 等待其他线程计算结果的最长时间（秒），超时后自行计算
+    INFLIGHT_WAIT_TIMEOUT = 30
     
-    def get_or_set(self, key: Any, func: Callable[[], Any], timeout: Optional[int] = None, namespace: Optional[str] = None) -> Any:
+    def get_or_set(self, key: Any, func: Callable[[], Any], timeout: Optional[int] = None, namespace: Optional[str] = None,
+                   hard_timeout: Optional[int] = None, negative_timeout: Optional[int] = None,
+                   tags: Optional[Iterable[str]] = None) -> Any:
         """
         获取缓存，如果不存在则执行函数并缓存结果
         
+        同一进程内对同一键的并发未命中只会执行一次 func（single-flight），
+        其余调用者等待该次计算的结果，避免缓存过期瞬间的查询风暴。
+        func 返回的 None、[]、0 等空结果同样会被缓存。
+        
         Args:
             key: 缓存键
             func: 生成缓存值的函数
-            timeout: 过期时间
+            timeout: 过期时间；指定 hard_timeout 时为软过期时间
             namespace: 命名空间
+            hard_timeout: 硬过期时间（可选）。软过期后、硬过期前的请求直接返回旧值，
+                由后台线程重新计算（stale-while-revalidate）
+            negative_timeout: 空结果的过期时间（可选），不指定时与 timeout 相同
+            tags: 依赖标签（可选），invalidate_tags 其中任一标签时缓存失效
             
         Returns:
             缓存的值或函数的执行结果
         """
+        key_str = self._make_key(key, namespace)
+        tags = tuple(tags) if tags else ()
+        
         # 尝试获取缓存
-        value = self.get(key, namespace=namespace)
+        value = self._lookup(key_str)
+        if isinstance(value, _CacheEnvelope):
+            if value.fresh_until is not None and value.fresh_until < time.time():
+                # 已软过期：返回旧值，并在后台刷新
+                self.backend.incr_stats(stale_hits=1)
+                self._refresh_in_background(key_str, func, timeout, hard_timeout, negative_timeout, tags)
+            value = value.value
+        if value is not _MISSING:
+            return value
         
-        # 如果缓存不存在，执行函数并缓存结果
-        if value is None:
-            value = func()
-            self.set(key, value, timeout, namespace)
+        with self._inflight_lock:
+            call = self._inflight.get(key_str)
+            is_leader = call is None
+            if is_leader:
+                call = self._inflight[key_str] = _InFlightCall()
         
-        return value
+        if not is_leader:
+            # 已有线程在计算，等待其结果
+            if call.wait(self.INFLIGHT_WAIT_TIMEOUT):
+                self.backend.incr_stats(stampedes_avoided=1)
+                if call.error is not None:
+                    raise call.error
+                return call.result
+            return func()
+        
+        try:
+            # 再次检查：可能在获取计算权之前，上一轮计算刚刚写入了缓存
+            value = self._lookup(key_str, record_stats=False)
+            if value is _MISSING:
+                tag_versions = self._tag_versions(tags)
+                value = func()
+                # 使用计算开始前的键和标签版本写入：若计算期间命名空间被清空或标签被失效，结果不会被新请求读到
+                self._store(key_str, value, timeout, hard_timeout, negative_timeout, tag_versions)
+            elif isinstance(value, _CacheEnvelope):
+                value = value.value
+            call.set_result(value)
+            return value
+        except BaseException as e:
+            call.set_error(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key_str, None)
+    
+    def _refresh_in_background(self, key_str: str, func: Callable[[], Any], timeout: Optional[int],
+                               hard_timeout: Optional[int], negative_timeout: Optional[int] = None,
+                               tags: Tuple[str, ...] = ()) -> None:
+        """在后台线程中重新计算软过期的缓存项，同一键同时只有一个刷新任务"""
+        with self._inflight_lock:
+            if key_str in self._inflight:
+                return
+            call = self._inflight[key_str] = _InFlightCall()
+        
+        def refresh():
+            from django.db import connections
+            try:
+                tag_versions = self._tag_versions(tags)
+                value = func()
+                self._store(key_str, value, timeout, hard_timeout, negative_timeout, tag_versions)
+                self.backend.incr_stats(background_refreshes=1)
+                call.set_result(value)
+            except Exception as e:
+                logger.warning(f"后台刷新缓存失败: {key_str} ({str(e)})")
+                call.set_error(e)
+            finally:
+                with self._inflight_lock:
+                    self._inflight.pop(key_str, None)
+                # 后台线程使用独立的数据库连接，结束时关闭
+                connections.close_all()
+        
+        threading.Thread(target=refresh, name=f"cache-refresh:{key_str}", daemon=True).start()
     
     def clear_expired(self) -> int:
         """
-        清理过期缓存
+        清理过期缓存（后台清理线程和管理页面共用），并记录清理次数与耗时
         
         Returns:
             清理的过期项数量
         """
-        current_time = time.time()
-        expired_keys = []
+        start = time.perf_counter()
+        count = self.backend.clear_expired(time.time())
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self._last_sweep_ms = elapsed_ms
+        self._max_sweep_ms = max(self._max_sweep_ms, elapsed_ms)
+        self.backend.incr_stats(
+            deletes=count, expired=count, sweeps=1, swept=count, sweep_time_us=int(elapsed_ms * 1000)
+        )
+        return count
+    
+    def start_sweeper(self, interval: Optional[float] = None) -> None:
+        """
+        启动后台过期清理线程
         
-        with self._lock:
-            # 找出所有过期的键
-            for key, (_, expiry, _) in self._cache.items():
-                if expiry < current_time:
-                    expired_keys.append(key)
-            
-            # 删除过期的缓存项
-            for key in expired_keys:
-                del self._cache[key]
-                if key in self._lru:
-                    del self._lru[key]
-                self._stats['deletes'] += 1
-                self._stats['expired'] += 1
-            
-            return len(expired_keys)
+        Args:
+            interval: 清理间隔（秒），默认使用 sweep_interval
+        """
+        with self._sweeper_lock:
+            if self._sweeper_pid == os.getpid():
+                return
+            if interval is not None:
+                self.sweep_interval = interval
+            if not self.sweep_interval:
+                return
+            self._sweeper_pid = os.getpid()
+            self._sweeper_stop = threading.Event()
+            stop_event = self._sweeper_stop
+        
+        def sweep_loop():
+            while not stop_event.wait(self.sweep_interval):
+                try:
+                    self.clear_expired()
+                except Exception as e:
+                    logger.warning(f"后台清理过期缓存失败: {str(e)}")
+        
+        threading.Thread(target=sweep_loop, name='cache-expiry-sweeper', daemon=True).start()
+    
+    def stop_sweeper(self) -> None:
+        """停止后台过期清理线程"""
+        with self._sweeper_lock:
+            self._sweeper_stop.set()
+            self._sweeper_pid = None
     
-    def get_stats(self) -> Dict[str, int]:
+    def keys(self) -> List[str]:
         """
-        获取缓存统计信息
+        获取当前所有缓存键（包含命名空间前缀）
+        
+        Returns:
+            缓存键列表
+        """
+        return self.backend.keys()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取缓存统计信息，共享后端下为所有 worker 进程的汇总
         
         Returns:
             包含缓存统计信息的字典
         """
-        with self._lock:
-            # 计算命中率
-            total = self._stats['hits'] + self._stats['misses']
-            hit_rate = (self._stats['hits'] / total * 100) if total > 0 else 0
-            
-            return {
-                **self._stats,
-                'total': total,
-                'hit_rate': round(hit_rate, 2),
-                'current_size': len(self._cache)
-            }
+        stats = {
+            'hits': 0, 'misses': 0, 'sets': 0, 'deletes': 0,
+            'expired': 0, 'evictions': 0, 'invalidations': 0, 'stampedes_avoided': 0,
+            'stale_hits': 0, 'background_refreshes': 0, 'negative_hits': 0, 'negative_sets': 0,
+            'oversized': 0, 'sweeps': 0, 'swept': 0, 'sweep_time_us': 0, 'tag_evictions': 0,
+        }
+        stats.update(self.backend.get_stats())
+        
+        # 计算命中率
+        total = stats['hits'] + stats['misses']
+        hit_rate = (stats['hits'] / total * 100) if total > 0 else 0
+        
+        namespace_bytes = self.backend.memory_usage()
+        
+        return {
+            **stats,
+            'total': total,
+            'hit_rate': round(hit_rate, 2),
+            'current_size': len(self.backend),
+            'current_bytes': sum(namespace_bytes.values()),
+            'max_bytes': self.backend.max_bytes,
+            'namespace_bytes': namespace_bytes,
+            'avg_sweep_ms': round(stats['sweep_time_us'] / stats['sweeps'] / 1000, 3) if stats['sweeps'] else 0,
+            'last_sweep_ms': round(self._last_sweep_ms, 3),
+            'max_sweep_ms': round(self._max_sweep_ms, 3),
+            'sweep_interval': self.sweep_interval,
+            'generations': self.backend.generation_count(),
+            'backend': self.backend.name,
+        }
     
     def get_many(self, keys: List[Any], namespace: Optional[str] = None) -> Dict[Any, Any]:
         """
-        批量获取缓存
+        批量获取缓存（后端一次加锁/一次往返）
         
         Args:
             keys: 键列表
             namespace: 命名空间
             
         Returns:
-            键值对字典
+            键值对字典，只包含命中的键
         """
+        prefix = self._key_prefix(namespace)
+        key_map = {f"{prefix}{str(key)}": key for key in keys}
+        entries = self.backend.get_many(list(key_map))
+        
+        now = time.time()
         result = {}
-        for key in keys:
-            value = self.get(key, namespace=namespace)
-            if value is not None:
-                result[key] = value
+        expired_keys = []
+        invalid_keys = []
+        negative_hits = 0
+        for key_str, (value, expiry) in entries.items():
+            if expiry < now:
+                expired_keys.append(key_str)
+                continue
+            if isinstance(value, _CacheEnvelope):
+                if not self._tags_valid(value.tag_versions):
+                    invalid_keys.append(key_str)
+                    continue
+                value = value.value
+            if _is_negative(value):
+                negative_hits += 1
+            result[key_map[key_str]] = value
+        
+        if expired_keys or invalid_keys:
+            self.backend.delete_many(expired_keys + invalid_keys)
+        self.backend.incr_stats(
+            hits=len(result), misses=len(key_map) - len(result),
+            expired=len(expired_keys), tag_evictions=len(invalid_keys), negative_hits=negative_hits
+        )
+        _record_usage(hits=len(result), misses=len(key_map) - len(result))
         return result
     
     def set_many(self, data: Dict[Any, Any], timeout: Optional[int] = None, namespace: Optional[str] = None) -> None:
         """
-        批量设置缓存
+        批量设置缓存（后端一次加锁/一次往返）
 
         Args:
             data: 键值对字典
             timeout: 过期时间
             namespace: 命名空间
         """
-        for key, value in data.items():
-            self.set(key, value, timeout, namespace)
+        if not data:
+            return
+        prefix = self._key_prefix(namespace)
+        timeout = self.default_timeout if timeout is None else timeout
+        self._longest_ttl = max(self._longest_ttl, timeout)
+        expiry = time.time() + timeout
+        self.backend.set_many([(f"{prefix}{str(key)}", value, expiry) for key, value in data.items()])
+        self.backend.incr_stats(sets=len(data))
+    
+    def delete_many(self, keys: List[Any], namespace: Optional[str] = None) -> int:
+        """
+        批量删除缓存（后端一次加锁/一次往返）
+
+        Args:
+            keys: 键列表
+            namespace: 命名空间
+
+        Returns:
+            实际删除的数量
+        """
+        if not keys:
+            return 0
+        prefix = self._key_prefix(namespace)
+        deleted = self.backend.delete_many([f"{prefix}{str(key)}" for key in keys])
+        self.backend.incr_stats(deletes=deleted)
+        return deleted
 
 # 缓存装饰器和辅助函数
-def cache_result(key_func=None, timeout=None, namespace=None):
+def _coerce_argument(value, param):
+    """
+    按参数的类型注解或默认值类型规范化实参，例如默认值为 1 时 '1' -> 1，默认值为 '' 时 5 -> '5'
+
+    只在 int 与 str 之间转换（bool 不参与），无法转换时保持原值。
+    """
+    if param.annotation in (int, str):
+        target = param.annotation
+    elif param.default is not inspect.Parameter.empty and param.default is not None:
+        target = type(param.default)
+    else:
+        return value
+    if target is bool or isinstance(value, bool):
+        return value
+    if target is int and isinstance(value, str):
+        try:
+            return int(value.strip())
+        except ValueError:
+            return value
+    if target is str and isinstance(value, int):
+        return str(value)
+    return value
+
+
+def _is_int_string(value):
+    """是否为整数的标准写法（'5'、'-3'，不含 '05'、' 5'）"""
+    try:
+        return isinstance(value, str) and str(int(value)) == value
+    except ValueError:
+        return False
+
+
+def _canonical(value):
+    """将参数转换为可稳定序列化的结构，用于生成与进程无关的缓存键"""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return [_canonical(item) for item in value]
+    if isinstance(value, (set, frozenset)):
+        return sorted((_canonical(item) for item in value), key=repr)
+    if isinstance(value, dict):
+        return {str(key): _canonical(item) for key, item in value.items()}
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    meta = getattr(value, '_meta', None)
+    if meta is not None and hasattr(value, 'pk'):
+        # 模型实例按 "<app_label>.<模型名>:<主键>" 区分
+        return f"{meta.label_lower}:{value.pk}"
+    return f"{type(value).__qualname__}:{value}"
+
+
+def make_call_key(func, signature, args, kwargs):
+    """
+    生成函数调用的缓存键（cache_result 的默认键）
+
+    按函数签名绑定参数并补全默认值，位置参数和关键字参数写法不同、省略默认值、
+    '1' 与 1 等写法都得到同一个键（有默认值或注解的参数同时按其类型转换实参）；
+    参数用 md5 摘要，结果与进程和 PYTHONHASHSEED 无关，多个 worker 共享缓存后端时同样命中。
+
+    Args:
+        func: 被缓存的函数
+        signature: 函数签名（inspect.signature(func)）
+        args: 位置参数
+        kwargs: 关键字参数
+
+    Returns:
+        (缓存键, 规范化后的 BoundArguments)
+    """
+    bound = signature.bind(*args, **kwargs)
+    bound.apply_defaults()
+    key_arguments = {}
+    for name, value in bound.arguments.items():
+        param = signature.parameters[name]
+        value = bound.arguments[name] = _coerce_argument(value, param)
+        if param.default is inspect.Parameter.empty and _is_int_string(value):
+            # 无默认值的参数（如 book_id）：只在键中把 '5' 视为 5，实参保持不变
+            value = int(value)
+        key_arguments[name] = value
+    payload = json.dumps(_canonical(key_arguments), sort_keys=True, ensure_ascii=False,
+                         separators=(',', ':'))
+    digest = hashlib.md5(payload.encode('utf-8')).hexdigest()
+    return f"{func.__module__}.{func.__qualname__}:{digest}", bound
+
+
+def cache_result(key_func=None, timeout=None, namespace=None, hard_timeout=None, negative_timeout=None, tags=None):
     """
     缓存函数结果的装饰器
 
+    未指定 key_func 时使用 make_call_key 按签名生成确定的键，函数以规范化后的参数调用，
+    保证同一个键对应同一次计算。
+
     Args:
         key_func: 生成缓存键的函数，接收函数的参数
-        timeout: 过期时间
+        timeout: 过期时间；指定 hard_timeout 时为软过期时间
         namespace: 命名空间
+        hard_timeout: 硬过期时间（可选），启用过期后返回旧值并后台刷新
+        negative_timeout: 空结果（None、[]、0 等）的过期时间（可选）
+        tags: 依赖标签列表，或接收函数参数、返回标签列表的函数（可选）
     """
     def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
         def wrapper(*args, **kwargs):
             # 生成缓存键
             if key_func:
                 cache_key = key_func(*args, **kwargs)
             else:
-                cache_key = f"{func.__name__}_{hash(str(args) + str(sorted(kwargs.items())))}"
+                cache_key, bound = make_call_key(func, signature, args, kwargs)
+                args, kwargs = bound.args, bound.kwargs
 
-            # 尝试从缓存获取
-            cached_result = cache.get(cache_key, namespace=namespace)
-            if cached_result is not None:
-                return cached_result
+            entry_tags = tags(*args, **kwargs) if callable(tags) else tags
 
-            # 执行函数并缓存结果
-            result = func(*args, **kwargs)
-            cache.set(cache_key, result, timeout, namespace)
-            return result
+            # 从缓存获取，未命中时执行函数并缓存结果（并发未命中只计算一次）
+            return cache.get_or_set(cache_key, lambda: func(*args, **kwargs), timeout, namespace,
+                                    hard_timeout=hard_timeout, negative_timeout=negative_timeout, tags=entry_tags)
 
         return wrapper
     return decorator
 
-def cache_query(timeout=None, namespace='query'):
+def cache_query(timeout=None, namespace='query', hard_timeout=None, negative_timeout=None, tags=None):
     """
     缓存数据库查询结果的装饰器
 
     Args:
         timeout: 过期时间，默认15分钟
         namespace: 命名空间
+        hard_timeout: 硬过期时间（可选），启用过期后返回旧值并后台刷新
+        negative_timeout: 空结果的过期时间（可选）
+        tags: 依赖标签（可选），例如 ['model:Book']，相关模型变更时自动失效
+    """
+    return cache_result(timeout=timeout or 900, namespace=namespace, hard_timeout=hard_timeout,
+                        negative_timeout=negative_timeout, tags=tags)
+
+# 事务内待失效的标签，按数据库连接记录，事务提交时去重后一次性失效
+_PENDING_INVALIDATIONS_ATTR = '_cache_pending_invalidations'
+
+
+def _flush_invalidations(connection):
+    """事务提交后调用：失效该连接上登记的全部标签，同一事务的其余回调随后不再重复失效"""
+    pending = getattr(connection, _PENDING_INVALIDATIONS_ATTR, None)
+    if pending:
+        setattr(connection, _PENDING_INVALIDATIONS_ATTR, set())
+        cache.invalidate_tags(*pending)
+
+
+def discard_pending_invalidations():
+    """丢弃已回滚的事务留下的待失效标签（请求结束时由缓存失效中间件调用）"""
+    from django.db import connections
+    for connection in connections.all(initialized_only=True):
+        if not connection.in_atomic_block:
+            setattr(connection, _PENDING_INVALIDATIONS_ATTR, set())
+
+
+def invalidate_tags_on_commit(*tags, using=None):
+    """
+    在当前事务提交后失效标签；事务回滚时不失效，不在事务中时立即生效
+
+    同一事务内登记的标签去重后在提交时一次性失效，提交之后同一请求中的读取即可看到新数据。
+
+    Args:
+        *tags: 标签
+        using: 数据库别名，默认 'default'
+    """
+    from django.db import transaction
+    if not tags:
+        return
+    connection = transaction.get_connection(using)
+    if not connection.in_atomic_block:
+        cache.invalidate_tags(*tags)
+        return
+    pending = getattr(connection, _PENDING_INVALIDATIONS_ATTR, None)
+    if pending is None:
+        pending = set()
+        setattr(connection, _PENDING_INVALIDATIONS_ATTR, pending)
+    pending.update(tags)
+    # 每次登记都注册回调：保存点回滚会丢弃其中注册的回调，其余回调仍会失效全部标签（多失效无害）
+    transaction.on_commit(lambda: _flush_invalidations(connection), using=using)
+
+def process_local_invalidation_warning() -> Optional[str]:
+    """
+    进程内缓存后端下，在管理命令等独立进程中失效缓存对运行中的 Web 进程无效
+
+    Returns:
+        需要提示的说明；后端在进程之间共享时返回 None
     """
-    return cache_result(timeout=timeout or 900, namespace=namespace)
+    if cache.backend.shared:
+        return None
+    return (f"缓存后端 {cache.backend.name} 为进程内存储，本命令的缓存失效不会影响运行中的 Web 进程："
+            f"相关页面在缓存过期后更新，或重启 Web 进程立即生效（CACHE_BACKEND = 'file' 时各进程共享失效）")
 
 def invalidate_user_cache(user_id):
     """
@@ -309,33 +804,16 @@ def invalidate_user_cache(user_id):
     Args:
         user_id: 用户ID
     """
-    patterns = [
-        f"user_stats:{user_id}",
-        f"user_borrow_records:{user_id}",
-        f"user_recommendations:{user_id}",
-    ]
-
-    for pattern in patterns:
-        cache.delete(pattern, namespace='user')
+    invalidate_tags_on_commit(f"user:{user_id}")
 
 def invalidate_book_cache(book_id):
     """
-    清除与特定图书相关的所有缓存
+    清除与特定图书相关的所有缓存（详情及所有包含图书的列表）
 
     Args:
         book_id: 图书ID
     """
-    patterns = [
-        f"book_detail:{book_id}",
-        f"popular_books",
-        f"recent_books",
-        f"home_stats",
-        f"book_list",
-        f"category_stats",
-    ]
-
-    for pattern in patterns:
-        cache.delete(pattern, namespace='books')
+    invalidate_tags_on_commit(f"book:{book_id}", 'model:Book')
 
 def invalidate_category_cache(category_id):
     """
@@ -344,15 +822,49 @@ def invalidate_category_cache(category_id):
     Args:
         category_id: 分类ID
     """
-    patterns = [
-        f"category_stats:{category_id}",
-        f"categories",
-        f"home_stats",
-        f"book_list",
-    ]
+    invalidate_tags_on_commit(f"category:{category_id}", 'model:Category')
+
+def model_cache_tags(instance):
+    """
+    生成模型实例的缓存标签
+
+    包括 'model:<类名>'、'<模型名>:<主键>'，以及每个外键的 '<字段名>:<外键值>'，
+    例如借阅记录 -> ['model:BorrowRecord', 'borrowrecord:5', 'user:3', 'book:42']
+
+    Args:
+        instance: 模型实例
+
+    Returns:
+        标签列表
+    """
+    opts = instance._meta
+    tags = [f"model:{opts.object_name}", f"{opts.model_name}:{instance.pk}"]
+    for field in opts.concrete_fields:
+        if field.many_to_one:
+            value = getattr(instance, field.attname)
+            if value is not None:
+                tags.append(f"{field.name}:{value}")
+    return tags
 
-    for pattern in patterns:
-        cache.delete(pattern, namespace='categories')
+def _invalidate_instance_tags(sender, instance, using=None, **kwargs):
+    """模型保存或删除后，在事务提交时失效其相关标签"""
+    try:
+        invalidate_tags_on_commit(*model_cache_tags(instance), using=using)
+    except Exception as e:
+        logger.warning(f"缓存标签失效失败: {sender.__name__}({instance.pk}) ({str(e)})")
+
+def connect_cache_tags(*models):
+    """
+    为模型连接 post_save/post_delete 信号，变更提交后自动失效 model_cache_tags 生成的标签
+
+    Args:
+        *models: 模型类
+    """
+    from django.db.models.signals import post_save, post_delete
+    for model in models:
+        uid = f"cache_tags:{model._meta.label}"
+        post_save.connect(_invalidate_instance_tags, sender=model, dispatch_uid=uid)
+        post_delete.connect(_invalidate_instance_tags, sender=model, dispatch_uid=uid)
 
 def get_cache_key_with_params(base_key, **params):
     """
@@ -375,12 +887,36 @@ def get_cache_key_with_params(base_key, **params):
 
 
 # 在文件开头添加
+import tempfile
 from django.conf import settings
 
 # 然后在创建缓存实例时使用配置
+def _create_default_backend():
+    """根据 settings.CACHE_BACKEND 创建存储后端"""
+    backend_name = getattr(settings, 'CACHE_BACKEND', 'locmem')
+    max_size = getattr(settings, 'CACHE_MAX_SIZE', 1000)
+    max_bytes = getattr(settings, 'CACHE_MAX_BYTES', None)
+    if backend_name == 'file':
+        return create_cache_backend(
+            'file',
+            path=getattr(settings, 'CACHE_FILE_PATH', os.path.join(tempfile.gettempdir(), 'library_cache.sqlite3')),
+            max_size=max_size,
+            max_bytes=max_bytes,
+        )
+    if backend_name == 'sharded':
+        return create_cache_backend(
+            'sharded',
+            shards=getattr(settings, 'CACHE_SHARDS', 8),
+            max_size=max_size,
+            max_bytes=max_bytes,
+        )
+    return create_cache_backend(backend_name, max_size=max_size, max_bytes=max_bytes)
+
 cache = EnhancedCache(
     default_timeout=getattr(settings, 'CACHE_DEFAULT_TIMEOUT', 300),
-    max_size=getattr(settings, 'CACHE_MAX_SIZE', 1000)
+    max_size=getattr(settings, 'CACHE_MAX_SIZE', 1000),
+    backend=_create_default_backend(),
+    sweep_interval=getattr(settings, 'CACHE_SWEEP_INTERVAL', None)
 )
 
 # 缓存键常量，用于保持一致性
@@ -0,0 +1,987 @@
+"""
+EnhancedCache 的存储后端
+
+EnhancedCache 负责键生成、过期判断和统计口径，具体的数据存放由后端完成：
+- LocMemBackend: 进程内字典 + LRU（默认，与原实现一致）
+- ShardedBackend: 按键哈希分段的进程内存储，每段独立加锁，适合多线程服务器
+- SQLiteFileBackend: 基于本机 SQLite 文件的共享存储，同一主机上的多个
+  worker 进程共用一份缓存、一份失效结果和一份统计数据
+"""
+import atexit
+import heapq
+import itertools
+import logging
+import os
+import pickle
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from threading import RLock
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def namespace_of(key: str) -> str:
+    """取出完整缓存键的顶级命名空间，例如 'books:search#0.1:q' -> 'books'"""
+    if ':' not in key:
+        return 'global'
+    return key.split(':', 1)[0].split('#', 1)[0]
+
+
+# 元素多于该数量的列表/元组只序列化均匀抽取的这些元素，按比例估算整体大小
+SIZE_SAMPLE = 32
+
+
+def _pickled_size(value: Any) -> int:
+    try:
+        return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return sys.getsizeof(value)
+
+
+def estimate_size(value: Any) -> int:
+    """
+    以序列化后的字节数估算缓存值的内存占用
+
+    大列表/元组按抽样估算，写入路径上不序列化整个值；未求值的 QuerySet 不序列化
+    （序列化会执行查询），只按对象本身的大小计算。
+    """
+    if getattr(value, '_result_cache', False) is None and hasattr(value, 'query'):
+        return sys.getsizeof(value)
+    if isinstance(value, (list, tuple)) and len(value) > SIZE_SAMPLE:
+        step = len(value) / SIZE_SAMPLE
+        sample = [value[int(i * step)] for i in range(SIZE_SAMPLE)]
+        return _pickled_size(sample) * len(value) // SIZE_SAMPLE
+    return _pickled_size(value)
+
+
+class GenerationStore:
+    """
+    进程内的代数存储（LocMemBackend、ShardedBackend 共用）
+
+    递增时可指定保留期限 retain_until：此后依赖旧代数的缓存项都已过期，
+    clear_expired 时删除该记录（代数回到 0），失效过的标签和命名空间不会无限累积。
+    """
+
+    def __init__(self):
+        self._lock = RLock()
+        self._generations: Dict[str, int] = {}
+        self._retain: Dict[str, float] = {}
+        # (retain_until, namespace) 最小堆，记录被再次递增后旧的堆记录惰性丢弃
+        self._heap: List[Tuple[float, str]] = []
+
+    def get(self, namespaces: List[str]) -> List[int]:
+        # 单次字典读取是原子的，读取代数无需加锁
+        return [self._generations.get(namespace, 0) for namespace in namespaces]
+
+    def incr(self, namespaces: List[str], retain_until: Optional[float] = None) -> List[int]:
+        with self._lock:
+            generations = []
+            for namespace in namespaces:
+                permanent = namespace in self._generations and namespace not in self._retain
+                generation = self._generations.get(namespace, 0) + 1
+                self._generations[namespace] = generation
+                generations.append(generation)
+                if retain_until is None:
+                    # 未指定期限的代数永久保留
+                    self._retain.pop(namespace, None)
+                elif not permanent:
+                    retain = max(self._retain.get(namespace, retain_until), retain_until)
+                    self._retain[namespace] = retain
+                    heapq.heappush(self._heap, (retain, namespace))
+            return generations
+
+    def prune(self, now: float) -> int:
+        """删除保留期限已过的代数记录"""
+        count = 0
+        with self._lock:
+            while self._heap and self._heap[0][0] < now:
+                retain, namespace = heapq.heappop(self._heap)
+                if self._retain.get(namespace) == retain:
+                    del self._retain[namespace]
+                    del self._generations[namespace]
+                    count += 1
+        return count
+
+    def __len__(self):
+        return len(self._generations)
+
+
+class BaseCacheBackend:
+    """缓存存储后端基类，约定 EnhancedCache 依赖的最小接口"""
+
+    name = 'base'
+    # 存储是否在进程之间共享；不共享时其他进程（如管理命令）的失效对 Web 进程无效
+    shared = False
+    max_bytes: Optional[int] = None
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        """返回 (value, expiry)，不存在时返回 None；命中时需要刷新 LRU 顺序"""
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any, expiry: float) -> None:
+        """写入缓存项，超过容量时按 LRU 淘汰"""
+        raise NotImplementedError
+
+    def delete(self, key: str) -> bool:
+        """删除缓存项，返回是否存在"""
+        raise NotImplementedError
+
+    def get_many(self, keys: List[str]) -> Dict[str, Tuple[Any, float]]:
+        """批量读取，只返回存在的键；远程后端应实现为一次往返"""
+        result = {}
+        for key in keys:
+            entry = self.get(key)
+            if entry is not None:
+                result[key] = entry
+        return result
+
+    def set_many(self, items: List[Tuple[str, Any, float]]) -> None:
+        """批量写入 (key, value, expiry)"""
+        for key, value, expiry in items:
+            self.set(key, value, expiry)
+
+    def delete_many(self, keys: List[str]) -> int:
+        """批量删除，返回实际删除的数量"""
+        return sum(1 for key in keys if self.delete(key))
+
+    def clear(self, prefix: Optional[str] = None) -> int:
+        """清空全部或指定前缀的缓存项，返回删除数量"""
+        raise NotImplementedError
+
+    def clear_expired(self, now: float) -> int:
+        """删除所有已过期的缓存项，返回删除数量"""
+        raise NotImplementedError
+
+    def keys(self) -> List[str]:
+        """返回当前所有缓存键（仅用于检查器等管理页面）"""
+        raise NotImplementedError
+
+    def get_generations(self, namespaces: List[str]) -> List[int]:
+        """返回各命名空间当前的代数（未失效过的命名空间为 0）"""
+        raise NotImplementedError
+
+    def incr_generation(self, namespace: str, retain_until: Optional[float] = None) -> int:
+        """命名空间代数加一，返回新的代数"""
+        return self.incr_generations([namespace], retain_until)[0]
+
+    def incr_generations(self, namespaces: List[str], retain_until: Optional[float] = None) -> List[int]:
+        """
+        多个命名空间的代数各加一（一次加锁或一个事务内完成），返回新的代数
+
+        retain_until 为代数记录的保留期限（时间戳）：之后 clear_expired 删除该记录，代数回到 0。
+        调用方需保证届时依赖旧代数的缓存项都已过期；为 None 时永久保留。
+        """
+        raise NotImplementedError
+
+    def generation_count(self) -> int:
+        """当前保存的代数记录数"""
+        raise NotImplementedError
+
+    def memory_usage(self) -> Dict[str, int]:
+        """返回按顶级命名空间汇总的估算字节数"""
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def incr_stats(self, **deltas: int) -> None:
+        """累加统计计数"""
+        raise NotImplementedError
+
+    def get_stats(self) -> Dict[str, int]:
+        """返回统计计数（共享后端返回所有进程的汇总）"""
+        raise NotImplementedError
+
+
+class LocMemBackend(BaseCacheBackend):
+    """
+    进程内存储后端，使用有序字典同时保存数据和 LRU 顺序
+
+    设置 max_bytes 后启用字节预算：按序列化大小估算每个缓存项占用的内存，
+    并改用 GDSF（Greedy-Dual-Size-Frequency）策略淘汰，优先移除体积大、
+    访问少且久未使用的缓存项。未设置时不估算大小，写入不序列化，memory_usage 中的字节数为 0。
+    过期时间另有一个最小堆索引，清理过期项只需处理已过期的部分。
+    """
+
+    name = 'locmem'
+
+    def __init__(self, max_size: int = 1000, max_bytes: Optional[int] = None):
+        # key -> (value, expiry)，字典顺序即 LRU 顺序（末尾为最近使用）
+        self._cache: 'OrderedDict[str, Tuple[Any, float]]' = OrderedDict()
+        self._lock = RLock()
+        self.max_size = max_size
+        self.max_bytes = max_bytes
+        self._stats: Dict[str, int] = {}
+        # 命名空间 -> 代数
+        self._generations = GenerationStore()
+        # 内存占用：key -> 估算字节数，以及按顶级命名空间汇总的字节数
+        self._sizes: Dict[str, int] = {}
+        self._namespace_bytes: Dict[str, int] = {}
+        self._total_bytes = 0
+        # GDSF 状态：访问频次、当前优先级、最小堆（惰性删除）和膨胀因子 L
+        self._freq: Dict[str, int] = {}
+        self._priority: Dict[str, float] = {}
+        self._heap: List[Tuple[float, int, str]] = []
+        self._inflation = 0.0
+        self._seq = itertools.count()
+        # 过期索引：(expiry, seq, key) 最小堆，键被覆盖或删除后旧记录惰性丢弃
+        self._expiry_heap: List[Tuple[float, int, str]] = []
+
+    def _touch(self, key: str) -> None:
+        """记录一次访问（需持有锁）"""
+        if self.max_bytes is None:
+            self._cache.move_to_end(key)
+            return
+        freq = self._freq[key] = self._freq.get(key, 0) + 1
+        priority = self._inflation + freq / max(self._sizes.get(key, 1), 1)
+        self._priority[key] = priority
+        heapq.heappush(self._heap, (priority, next(self._seq), key))
+        # 堆中的过期优先级过多时重建，避免无限增长
+        if len(self._heap) > 2 * len(self._cache) + 64:
+            self._heap = [(p, next(self._seq), k) for k, p in self._priority.items()]
+            heapq.heapify(self._heap)
+
+    def _remove(self, key: str) -> bool:
+        """删除缓存项并更新内存统计（需持有锁）"""
+        if self._cache.pop(key, None) is None:
+            return False
+        size = self._sizes.pop(key, 0)
+        self._total_bytes -= size
+        namespace = namespace_of(key)
+        remaining = self._namespace_bytes.get(namespace, 0) - size
+        if remaining > 0:
+            self._namespace_bytes[namespace] = remaining
+        else:
+            self._namespace_bytes.pop(namespace, None)
+        self._freq.pop(key, None)
+        self._priority.pop(key, None)
+        return True
+
+    def _evict_one(self) -> None:
+        """按当前策略淘汰一个缓存项（需持有锁）"""
+        if self.max_bytes is None:
+            # LRU：移除最久未使用的项
+            key = next(iter(self._cache))
+        else:
+            # GDSF：移除优先级最低的项，并把膨胀因子提高到该优先级
+            while True:
+                priority, _, key = heapq.heappop(self._heap)
+                if self._priority.get(key) == priority:
+                    break
+            self._inflation = priority
+        self._remove(key)
+        self._stats['evictions'] = self._stats.get('evictions', 0) + 1
+
+    def get(self, key):
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                self._touch(key)
+            return entry
+
+    def _estimate(self, value: Any) -> int:
+        """只有设置了字节预算时才估算大小（需要序列化），否则记为 0"""
+        return estimate_size(value) if self.max_bytes is not None else 0
+
+    def set(self, key, value, expiry):
+        # 序列化估算放在锁外进行
+        size = self._estimate(value)
+        with self._lock:
+            self._insert(key, value, expiry, size)
+
+    def _insert(self, key: str, value: Any, expiry: float, size: int) -> None:
+        """写入一个缓存项并执行容量淘汰（需持有锁）"""
+        self._remove(key)
+        if self.max_bytes is not None and size > self.max_bytes:
+            # 单项超过整个预算，不缓存
+            self._stats['oversized'] = self._stats.get('oversized', 0) + 1
+            return
+        while self._cache and (
+            len(self._cache) >= self.max_size
+            or (self.max_bytes is not None and self._total_bytes + size > self.max_bytes)
+        ):
+            self._evict_one()
+        self._cache[key] = (value, expiry)
+        heapq.heappush(self._expiry_heap, (expiry, next(self._seq), key))
+        if len(self._expiry_heap) > 2 * len(self._cache) + 64:
+            self._rebuild_expiry_heap()
+        self._sizes[key] = size
+        self._total_bytes += size
+        namespace = namespace_of(key)
+        self._namespace_bytes[namespace] = self._namespace_bytes.get(namespace, 0) + size
+        self._touch(key)
+
+    def delete(self, key):
+        with self._lock:
+            return self._remove(key)
+
+    def get_many(self, keys):
+        result = {}
+        with self._lock:
+            for key in keys:
+                entry = self._cache.get(key)
+                if entry is not None:
+                    self._touch(key)
+                    result[key] = entry
+        return result
+
+    def set_many(self, items):
+        sized = [(key, value, expiry, self._estimate(value)) for key, value, expiry in items]
+        with self._lock:
+            for key, value, expiry, size in sized:
+                self._insert(key, value, expiry, size)
+
+    def delete_many(self, keys):
+        with self._lock:
+            return sum(1 for key in keys if self._remove(key))
+
+    def clear(self, prefix=None):
+        with self._lock:
+            if prefix is None:
+                count = len(self._cache)
+                self._cache.clear()
+                self._sizes.clear()
+                self._namespace_bytes.clear()
+                self._total_bytes = 0
+                self._freq.clear()
+                self._priority.clear()
+                self._heap = []
+                self._expiry_heap = []
+                return count
+            keys_to_delete = [k for k in self._cache if k.startswith(prefix)]
+            for key in keys_to_delete:
+                self._remove(key)
+            return len(keys_to_delete)
+
+    def clear_expired(self, now):
+        # 只弹出堆顶已过期的记录，工作量与过期项数量成正比
+        count = 0
+        with self._lock:
+            heap = self._expiry_heap
+            while heap and heap[0][0] < now:
+                expiry, _, key = heapq.heappop(heap)
+                entry = self._cache.get(key)
+                if entry is not None and entry[1] == expiry:
+                    self._remove(key)
+                    count += 1
+        self._generations.prune(now)
+        return count
+
+    def _rebuild_expiry_heap(self) -> None:
+        """丢弃过期索引中已失效的记录（需持有锁）"""
+        self._expiry_heap = [(expiry, next(self._seq), key) for key, (_, expiry) in self._cache.items()]
+        heapq.heapify(self._expiry_heap)
+
+    def keys(self):
+        with self._lock:
+            return list(self._cache.keys())
+
+    def get_generations(self, namespaces):
+        return self._generations.get(namespaces)
+
+    def incr_generations(self, namespaces, retain_until=None):
+        return self._generations.incr(namespaces, retain_until)
+
+    def generation_count(self):
+        return len(self._generations)
+
+    def memory_usage(self):
+        with self._lock:
+            return dict(self._namespace_bytes)
+
+    def __len__(self):
+        return len(self._cache)
+
+    def incr_stats(self, **deltas):
+        with self._lock:
+            for name, delta in deltas.items():
+                self._stats[name] = self._stats.get(name, 0) + delta
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+
+class SQLiteFileBackend(BaseCacheBackend):
+    """
+    基于 SQLite 文件的共享存储后端
+
+    同一主机上的所有 worker 进程打开同一个数据库文件（WAL 模式），
+    因此缓存内容、失效操作和统计数据在进程之间共享。值使用 pickle 序列化。
+    设置 max_bytes 后按序列化后的实际字节数控制总大小，并使用近似 GDSF 策略淘汰
+    （访问频次随访问时间回写一起更新）。
+    """
+
+    name = 'file'
+    shared = True
+    # 表结构版本，不一致时重建缓存表（缓存数据可随时丢弃）
+    SCHEMA_VERSION = 4
+
+    # 命中时最多每隔多少秒回写一次访问时间，避免每次读取都产生写事务
+    TOUCH_INTERVAL = 1.0
+    # 统计计数在本进程内累积，超过该间隔（秒）后批量写入共享表
+    STATS_FLUSH_INTERVAL = 1.0
+
+    def __init__(self, path, max_size: int = 1000, max_bytes: Optional[int] = None, timeout: float = 5.0):
+        self.path = str(path)
+        self.max_size = max_size
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        # GDSF 膨胀因子的本地副本，每次写入时从共享表同步
+        self._inflation = 0.0
+        self._local = threading.local()
+        self._stats_lock = RLock()
+        self._pending_stats: Dict[str, int] = {}
+        self._last_flush = time.time()
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._init_schema()
+        # 进程退出前写入尚未提交的统计增量
+        atexit.register(self._flush_stats)
+
+    def _connection(self) -> sqlite3.Connection:
+        """每个线程、每个进程使用独立连接（fork 之后会重新建立连接）"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _init_schema(self):
+        conn = self._connection()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            if conn.execute('PRAGMA user_version').fetchone()[0] != self.SCHEMA_VERSION:
+                # 缓存项与代数一起重建，不会留下依赖已删除代数的缓存项；
+                # 计数器与膨胀因子描述的是旧表，一并丢弃
+                conn.execute('DROP TABLE IF EXISTS cache_entries')
+                conn.execute('DROP TABLE IF EXISTS cache_generations')
+                conn.execute('DROP TABLE IF EXISTS cache_meta')
+                conn.execute(f'PRAGMA user_version = {self.SCHEMA_VERSION}')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS cache_entries ('
+                ' key TEXT PRIMARY KEY, value BLOB NOT NULL,'
+                ' expiry REAL NOT NULL, accessed REAL NOT NULL,'
+                ' size INTEGER NOT NULL DEFAULT 0, hits INTEGER NOT NULL DEFAULT 1,'
+                ' priority REAL NOT NULL DEFAULT 0)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS cache_entries_accessed ON cache_entries (accessed)')
+            conn.execute('CREATE INDEX IF NOT EXISTS cache_entries_priority ON cache_entries (priority)')
+            conn.execute('CREATE INDEX IF NOT EXISTS cache_entries_expiry ON cache_entries (expiry)')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS cache_stats ('
+                ' name TEXT PRIMARY KEY, value INTEGER NOT NULL DEFAULT 0)'
+            )
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS cache_generations ('
+                ' namespace TEXT PRIMARY KEY, generation INTEGER NOT NULL DEFAULT 0, retain_until REAL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS cache_generations_retain ON cache_generations (retain_until)')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS cache_meta ('
+                ' name TEXT PRIMARY KEY, value REAL NOT NULL)'
+            )
+            # 条目数与总字节数由触发器在每次插入、更新大小和删除时维护，
+            # 容量检查只需读取 cache_meta，不必在写事务内扫描整张表
+            conn.execute(
+                "INSERT OR IGNORE INTO cache_meta (name, value)"
+                " SELECT 'entry_count', COUNT(*) FROM cache_entries"
+            )
+            conn.execute(
+                "INSERT OR IGNORE INTO cache_meta (name, value)"
+                " SELECT 'total_bytes', COALESCE(SUM(size), 0) FROM cache_entries"
+            )
+            conn.execute(
+                'CREATE TRIGGER IF NOT EXISTS cache_entries_count_insert AFTER INSERT ON cache_entries BEGIN'
+                " UPDATE cache_meta SET value = value + 1 WHERE name = 'entry_count';"
+                " UPDATE cache_meta SET value = value + NEW.size WHERE name = 'total_bytes';"
+                ' END'
+            )
+            conn.execute(
+                'CREATE TRIGGER IF NOT EXISTS cache_entries_count_update AFTER UPDATE OF size ON cache_entries BEGIN'
+                " UPDATE cache_meta SET value = value + NEW.size - OLD.size WHERE name = 'total_bytes';"
+                ' END'
+            )
+            conn.execute(
+                'CREATE TRIGGER IF NOT EXISTS cache_entries_count_delete AFTER DELETE ON cache_entries BEGIN'
+                " UPDATE cache_meta SET value = value - 1 WHERE name = 'entry_count';"
+                " UPDATE cache_meta SET value = value - OLD.size WHERE name = 'total_bytes';"
+                ' END'
+            )
+
+    # 覆盖已有键时走 UPDATE 分支（触发大小更新触发器），
+    # 不用 INSERT OR REPLACE：其隐式删除默认不会触发 DELETE 触发器，计数器会偏大
+    _UPSERT_SQL = (
+        'INSERT INTO cache_entries (key, value, expiry, accessed, size, hits, priority)'
+        ' VALUES (?, ?, ?, ?, ?, 1, ?)'
+        ' ON CONFLICT (key) DO UPDATE SET value = excluded.value, expiry = excluded.expiry,'
+        ' accessed = excluded.accessed, size = excluded.size, hits = 1, priority = excluded.priority'
+    )
+
+    @staticmethod
+    def _prefix_range(prefix: str) -> Tuple[str, str]:
+        """把前缀匹配转换成可以走主键索引的范围查询"""
+        return prefix, prefix + '\U0010ffff'
+
+    def get(self, key):
+        try:
+            conn = self._connection()
+            row = conn.execute(
+                'SELECT value, expiry, accessed FROM cache_entries WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, expiry, accessed = row
+            now = time.time()
+            if now - accessed > self.TOUCH_INTERVAL:
+                conn.execute(
+                    'UPDATE cache_entries SET accessed = ?, hits = hits + 1,'
+                    ' priority = ? + (hits + 1) * 1.0 / MAX(size, 1) WHERE key = ?',
+                    (now, self._inflation, key)
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"读取共享缓存失败: {str(e)}")
+            return None
+        try:
+            return pickle.loads(value), expiry
+        except Exception as e:
+            # 反序列化可能抛出任意异常（类已被移动/删除、数据损坏等），删除坏数据避免反复失败
+            logger.warning(f"共享缓存值无法反序列化，已删除: {key} ({e!r})")
+            self.delete(key)
+            return None
+
+    def set(self, key, value, expiry):
+        try:
+            data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except (pickle.PickleError, TypeError, AttributeError) as e:
+            logger.warning(f"缓存值无法序列化，已跳过: {key} ({str(e)})")
+            return
+        size = len(data)
+        if self.max_bytes is not None and size > self.max_bytes:
+            # 单项超过整个预算，不缓存
+            self.delete(key)
+            self.incr_stats(oversized=1)
+            return
+        try:
+            conn = self._connection()
+            with conn:
+                conn.execute('BEGIN IMMEDIATE')
+                row = conn.execute("SELECT value FROM cache_meta WHERE name = 'inflation'").fetchone()
+                self._inflation = row[0] if row else 0.0
+                conn.execute(
+                    self._UPSERT_SQL,
+                    (key, data, expiry, time.time(), size, self._inflation + 1.0 / max(size, 1))
+                )
+                evicted = self._evict(conn, key)
+        except sqlite3.Error as e:
+            logger.warning(f"写入共享缓存失败: {str(e)}")
+            return
+        if evicted > 0:
+            self.incr_stats(evictions=evicted)
+
+    def _evict(self, conn: sqlite3.Connection, new_key: str) -> int:
+        """在写事务内执行容量淘汰，返回淘汰数量"""
+        order = 'priority' if self.max_bytes is not None else 'accessed'
+        counters = dict(conn.execute(
+            "SELECT name, value FROM cache_meta WHERE name IN ('entry_count', 'total_bytes')"
+        ))
+        count = counters.get('entry_count', 0)
+        total_bytes = counters.get('total_bytes', 0)
+        overflow_count = count - self.max_size
+        overflow_bytes = total_bytes - self.max_bytes if self.max_bytes is not None else 0
+        if overflow_count <= 0 and overflow_bytes <= 0:
+            return 0
+
+        victims = []
+        max_priority = None
+        for victim, size, priority in conn.execute(
+            f'SELECT key, size, priority FROM cache_entries WHERE key != ? ORDER BY {order}', (new_key,)
+        ):
+            if overflow_count <= 0 and overflow_bytes <= 0:
+                break
+            victims.append((victim,))
+            overflow_count -= 1
+            overflow_bytes -= size
+            max_priority = priority
+        conn.executemany('DELETE FROM cache_entries WHERE key = ?', victims)
+        if self.max_bytes is not None and max_priority is not None:
+            # GDSF：膨胀因子提高到被淘汰项的最高优先级
+            self._inflation = max_priority
+            conn.execute(
+                "INSERT OR REPLACE INTO cache_meta (name, value) VALUES ('inflation', ?)", (max_priority,)
+            )
+        return len(victims)
+
+    def delete(self, key):
+        try:
+            cursor = self._connection().execute('DELETE FROM cache_entries WHERE key = ?', (key,))
+            return cursor.rowcount > 0
+        except sqlite3.Error as e:
+            logger.warning(f"删除共享缓存失败: {str(e)}")
+            return False
+
+    # 单条 SQL 中 IN (...) 参数的最大数量
+    BATCH_SIZE = 500
+
+    def get_many(self, keys):
+        result = {}
+        touched = []
+        corrupted = []
+        now = time.time()
+        try:
+            conn = self._connection()
+            for start in range(0, len(keys), self.BATCH_SIZE):
+                batch = keys[start:start + self.BATCH_SIZE]
+                placeholders = ', '.join('?' * len(batch))
+                for key, value, expiry, accessed in conn.execute(
+                    f'SELECT key, value, expiry, accessed FROM cache_entries WHERE key IN ({placeholders})', batch
+                ):
+                    try:
+                        result[key] = (pickle.loads(value), expiry)
+                    except Exception as e:
+                        logger.warning(f"共享缓存值无法反序列化，已删除: {key} ({e!r})")
+                        corrupted.append(key)
+                        continue
+                    if now - accessed > self.TOUCH_INTERVAL:
+                        touched.append((now, self._inflation, key))
+            if touched:
+                conn.executemany(
+                    'UPDATE cache_entries SET accessed = ?, hits = hits + 1,'
+                    ' priority = ? + (hits + 1) * 1.0 / MAX(size, 1) WHERE key = ?',
+                    touched
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"批量读取共享缓存失败: {str(e)}")
+        if corrupted:
+            self.delete_many(corrupted)
+        return result
+
+    def set_many(self, items):
+        rows = []
+        oversized = []
+        now = time.time()
+        for key, value, expiry in items:
+            try:
+                data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            except (pickle.PickleError, TypeError, AttributeError) as e:
+                logger.warning(f"缓存值无法序列化，已跳过: {key} ({str(e)})")
+                continue
+            if self.max_bytes is not None and len(data) > self.max_bytes:
+                oversized.append(key)
+                continue
+            rows.append((key, data, expiry, now, len(data)))
+        if oversized:
+            self.delete_many(oversized)
+            self.incr_stats(oversized=len(oversized))
+        if not rows:
+            return
+        evicted = 0
+        try:
+            conn = self._connection()
+            with conn:
+                conn.execute('BEGIN IMMEDIATE')
+                row = conn.execute("SELECT value FROM cache_meta WHERE name = 'inflation'").fetchone()
+                self._inflation = row[0] if row else 0.0
+                conn.executemany(
+                    self._UPSERT_SQL,
+                    [(*entry, self._inflation + 1.0 / max(entry[4], 1)) for entry in rows]
+                )
+                evicted = self._evict(conn, rows[-1][0])
+        except sqlite3.Error as e:
+            logger.warning(f"批量写入共享缓存失败: {str(e)}")
+            return
+        if evicted > 0:
+            self.incr_stats(evictions=evicted)
+
+    def delete_many(self, keys):
+        if not keys:
+            return 0
+        try:
+            conn = self._connection()
+            deleted = 0
+            with conn:
+                conn.execute('BEGIN IMMEDIATE')
+                for start in range(0, len(keys), self.BATCH_SIZE):
+                    batch = keys[start:start + self.BATCH_SIZE]
+                    placeholders = ', '.join('?' * len(batch))
+                    deleted += conn.execute(
+                        f'DELETE FROM cache_entries WHERE key IN ({placeholders})', batch
+                    ).rowcount
+            return deleted
+        except sqlite3.Error as e:
+            logger.warning(f"批量删除共享缓存失败: {str(e)}")
+            return 0
+
+    def clear(self, prefix=None):
+        try:
+            conn = self._connection()
+            if prefix is None:
+                cursor = conn.execute('DELETE FROM cache_entries')
+            else:
+                cursor = conn.execute(
+                    'DELETE FROM cache_entries WHERE key >= ? AND key < ?', self._prefix_range(prefix)
+                )
+            return cursor.rowcount
+        except sqlite3.Error as e:
+            logger.warning(f"清空共享缓存失败: {str(e)}")
+            return 0
+
+    def clear_expired(self, now):
+        try:
+            conn = self._connection()
+            cursor = conn.execute('DELETE FROM cache_entries WHERE expiry < ?', (now,))
+            conn.execute('DELETE FROM cache_generations WHERE retain_until < ?', (now,))
+            return cursor.rowcount
+        except sqlite3.Error as e:
+            logger.warning(f"清理共享缓存失败: {str(e)}")
+            return 0
+
+    def keys(self):
+        try:
+            return [row[0] for row in self._connection().execute('SELECT key FROM cache_entries')]
+        except sqlite3.Error:
+            return []
+
+    def get_generations(self, namespaces):
+        try:
+            placeholders = ', '.join('?' * len(namespaces))
+            rows = dict(self._connection().execute(
+                f'SELECT namespace, generation FROM cache_generations WHERE namespace IN ({placeholders})',
+                namespaces
+            ).fetchall())
+        except sqlite3.Error as e:
+            logger.warning(f"读取命名空间代数失败: {str(e)}")
+            rows = {}
+        return [rows.get(namespace, 0) for namespace in namespaces]
+
+    def incr_generations(self, namespaces, retain_until=None):
+        namespaces = list(namespaces)
+        if not namespaces:
+            return []
+        try:
+            conn = self._connection()
+            with conn:
+                conn.execute('BEGIN IMMEDIATE')
+                if retain_until is not None:
+                    # 其他进程写入的缓存项可能比调用方估计的存活更久，至少保留到现有缓存项全部过期
+                    max_expiry = conn.execute('SELECT MAX(expiry) FROM cache_entries').fetchone()[0]
+                    retain_until = max(retain_until, max_expiry or 0)
+                # 保留期限取较晚者；已永久保留（retain_until 为空）的记录保持永久
+                conn.executemany(
+                    'INSERT INTO cache_generations (namespace, generation, retain_until) VALUES (?, 1, ?) '
+                    'ON CONFLICT(namespace) DO UPDATE SET generation = generation + 1, retain_until = '
+                    'CASE WHEN retain_until IS NULL OR excluded.retain_until IS NULL THEN NULL '
+                    'ELSE MAX(retain_until, excluded.retain_until) END',
+                    [(namespace, retain_until) for namespace in namespaces]
+                )
+                placeholders = ', '.join('?' * len(namespaces))
+                rows = dict(conn.execute(
+                    f'SELECT namespace, generation FROM cache_generations WHERE namespace IN ({placeholders})',
+                    namespaces
+                ).fetchall())
+                return [rows[namespace] for namespace in namespaces]
+        except sqlite3.Error as e:
+            # 代数递增失败时退回到按前缀删除，保证失效语义
+            logger.warning(f"递增命名空间代数失败，改为按前缀删除: {str(e)}")
+            for namespace in namespaces:
+                self.clear(f"{namespace}:")
+                self.clear(f"{namespace}#")
+            return [0] * len(namespaces)
+
+    def generation_count(self):
+        try:
+            return self._connection().execute('SELECT COUNT(*) FROM cache_generations').fetchone()[0]
+        except sqlite3.Error:
+            return 0
+
+    def memory_usage(self):
+        usage: Dict[str, int] = {}
+        try:
+            for key, size in self._connection().execute('SELECT key, size FROM cache_entries'):
+                namespace = namespace_of(key)
+                usage[namespace] = usage.get(namespace, 0) + size
+        except sqlite3.Error:
+            pass
+        return usage
+
+    def __len__(self):
+        try:
+            return self._connection().execute('SELECT COUNT(*) FROM cache_entries').fetchone()[0]
+        except sqlite3.Error:
+            return 0
+
+    def incr_stats(self, **deltas):
+        with self._stats_lock:
+            for name, delta in deltas.items():
+                self._pending_stats[name] = self._pending_stats.get(name, 0) + delta
+            if time.time() - self._last_flush >= self.STATS_FLUSH_INTERVAL:
+                self._flush_stats()
+
+    def _flush_stats(self):
+        """把本进程累积的统计增量写入共享表"""
+        with self._stats_lock:
+            pending, self._pending_stats = self._pending_stats, {}
+            self._last_flush = time.time()
+            if not pending:
+                return
+            try:
+                conn = self._connection()
+                with conn:
+                    conn.execute('BEGIN IMMEDIATE')
+                    conn.executemany(
+                        'INSERT INTO cache_stats (name, value) VALUES (?, ?) '
+                        'ON CONFLICT(name) DO UPDATE SET value = value + excluded.value',
+                        list(pending.items())
+                    )
+            except sqlite3.Error as e:
+                logger.warning(f"写入缓存统计失败: {str(e)}")
+
+    def get_stats(self):
+        self._flush_stats()
+        try:
+            return dict(self._connection().execute('SELECT name, value FROM cache_stats').fetchall())
+        except sqlite3.Error:
+            return {}
+
+
+class ShardedBackend(BaseCacheBackend):
+    """
+    分段（锁分离）进程内存储后端
+
+    按键的哈希把缓存项分配到 N 个相互独立的 LocMemBackend 分段，每个分段拥有
+    自己的锁、LRU/GDSF 状态和统计计数，多线程服务器上不同键的读写不再争用同一把锁。
+    命名空间代数是全局的，单独保存；统计信息在 get_stats() 中合并。
+    """
+
+    name = 'sharded'
+
+    def __init__(self, shards: int = 8, max_size: int = 1000, max_bytes: Optional[int] = None):
+        self.shard_count = max(1, shards)
+        self.max_size = max_size
+        self.max_bytes = max_bytes
+        # 容量按分段均分
+        self._shards = [
+            LocMemBackend(
+                max_size=max(1, max_size // self.shard_count),
+                max_bytes=max_bytes // self.shard_count if max_bytes is not None else None,
+            )
+            for _ in range(self.shard_count)
+        ]
+        self._generations = GenerationStore()
+
+    def _shard(self, key: str) -> LocMemBackend:
+        return self._shards[hash(key) % self.shard_count]
+
+    def get(self, key):
+        # 读路径最热，直接内联分段选择
+        return self._shards[hash(key) % self.shard_count].get(key)
+
+    def set(self, key, value, expiry):
+        self._shard(key).set(key, value, expiry)
+
+    def delete(self, key):
+        return self._shard(key).delete(key)
+
+    def _group_by_shard(self, keys) -> Dict[int, list]:
+        """按分段分组，使每个分段只加锁一次"""
+        groups: Dict[int, list] = {}
+        for item in keys:
+            key = item[0] if isinstance(item, tuple) else item
+            groups.setdefault(hash(key) % self.shard_count, []).append(item)
+        return groups
+
+    def get_many(self, keys):
+        result = {}
+        for index, shard_keys in self._group_by_shard(keys).items():
+            result.update(self._shards[index].get_many(shard_keys))
+        return result
+
+    def set_many(self, items):
+        for index, shard_items in self._group_by_shard(items).items():
+            self._shards[index].set_many(shard_items)
+
+    def delete_many(self, keys):
+        return sum(
+            self._shards[index].delete_many(shard_keys)
+            for index, shard_keys in self._group_by_shard(keys).items()
+        )
+
+    def clear(self, prefix=None):
+        return sum(shard.clear(prefix) for shard in self._shards)
+
+    def clear_expired(self, now):
+        count = sum(shard.clear_expired(now) for shard in self._shards)
+        self._generations.prune(now)
+        return count
+
+    def keys(self):
+        return [key for shard in self._shards for key in shard.keys()]
+
+    def get_generations(self, namespaces):
+        return self._generations.get(namespaces)
+
+    def incr_generations(self, namespaces, retain_until=None):
+        return self._generations.incr(namespaces, retain_until)
+
+    def generation_count(self):
+        return len(self._generations)
+
+    def memory_usage(self):
+        return _merge_counts(shard.memory_usage() for shard in self._shards)
+
+    def __len__(self):
+        return sum(len(shard) for shard in self._shards)
+
+    def incr_stats(self, **deltas):
+        # 统计计数按线程分散到各分段，避免所有线程争用同一个计数器
+        self._shards[threading.get_ident() % self.shard_count].incr_stats(**deltas)
+
+    def get_stats(self):
+        return _merge_counts(shard.get_stats() for shard in self._shards)
+
+    def shard_sizes(self) -> List[int]:
+        """各分段当前的缓存项数量，用于观察键分布是否均匀"""
+        return [len(shard) for shard in self._shards]
+
+
+def _merge_counts(counters) -> Dict[str, int]:
+    """合并多个计数字典"""
+    merged: Dict[str, int] = {}
+    for counter in counters:
+        for name, value in counter.items():
+            merged[name] = merged.get(name, 0) + value
+    return merged
+
+
+CACHE_BACKENDS = {
+    LocMemBackend.name: LocMemBackend,
+    ShardedBackend.name: ShardedBackend,
+    SQLiteFileBackend.name: SQLiteFileBackend,
+}
+
+
+def create_cache_backend(name: str = 'locmem', **options) -> BaseCacheBackend:
+    """
+    按名称创建缓存后端
+
+    Args:
+        name: 后端名称（'locmem'、'sharded' 或 'file'）
+        **options: 传给后端构造函数的参数
+
+    Returns:
+        缓存后端实例
+    """
+    try:
+        backend_class = CACHE_BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"未知的缓存后端: {name}，可选值: {', '.join(CACHE_BACKENDS)}")
+    return backend_class(**options)
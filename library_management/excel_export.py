@@ -4,7 +4,9 @@ from django.utils import timezone
 from datetime import datetime
 import io
 from django.core.exceptions import ValidationError
+from django.db.models import Q
 from books.models import Book, Category
+from books.isbn import normalize_isbn
 from accounts.models import CustomUser
 
 
@@ -299,6 +301,9 @@ class ExcelImporter:
                     title = str(row['书名']).strip()
                     author = str(row['作者']).strip()
                     isbn = str(row['ISBN']).strip()
+                    if isbn.endswith('.0') and isbn[:-2].isdigit():
+                        # ISBN 列有空单元格时 pandas 按浮点数读取整列
+                        isbn = isbn[:-2]
 
                     # 验证必填字段
                     if not title or title == 'nan':
@@ -313,8 +318,12 @@ class ExcelImporter:
                         errors.append(f'第{index+2}行: ISBN不能为空')
                         continue
 
-                    # 检查ISBN是否已存在
-                    if Book.objects.filter(isbn=isbn).exists():
+                    # 检查ISBN是否已存在（按原样和规范化的 ISBN-13 比较，带连字符或 ISBN-10 形式的同一本书也视为重复）
+                    duplicates = Q(isbn=isbn)
+                    isbn13 = normalize_isbn(isbn)
+                    if isbn13:
+                        duplicates |= Q(isbn13=isbn13)
+                    if Book.objects.filter(duplicates).exists():
                         skipped_count += 1
                         continue
 
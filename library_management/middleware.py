@@ -1,155 +1,348 @@
 """
-缓存中间件，用于页面级缓存
+缓存中间件，用于页面级缓存、请求分析和缓存失效
 """
 import hashlib
-from django.utils.cache import patch_vary_headers
-from django.core.cache import cache
+import math
+import random
+import threading
+import time
+from collections import deque
+from contextlib import ExitStack
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
 from django.http import HttpResponse
-from library_management.cache import get_cache_key_with_params
+from django.urls import resolve, Resolver404
+from django.utils.cache import get_conditional_response
+from django.utils.html import escape
+from django.utils.http import http_date
+from library_management.cache import cache, track_cache_usage, discard_pending_invalidations
+
+
+# 导航栏中的用户名"挖洞"：缓存时替换为占位符，命中时填入当前用户名，
+# 这样同一角色的所有用户可以共享同一份页面缓存
+USERNAME_HOLE = '<span class="page-cache-username">{}</span>'
+USERNAME_PLACEHOLDER = USERNAME_HOLE.format('\x00username\x00')
+
+# 页面缓存的变化维度：名称 -> 从请求中取值的函数
+PAGE_CACHE_VARY_FUNCTIONS = {
+    # 匿名/已登录
+    'auth': lambda request: 'user' if request.user.is_authenticated else 'anonymous',
+    # 匿名/各角色（普通用户、管理员）
+    'role': lambda request: getattr(request.user, 'role', 'user') if request.user.is_authenticated else 'anonymous',
+    # 每个用户单独缓存
+    'user': lambda request: f"user_{request.user.id}" if request.user.is_authenticated else 'anonymous',
+}
+
+# 不随缓存页面一起保存的响应头
+UNCACHEABLE_HEADERS = {'set-cookie', 'content-length', 'etag', 'last-modified'}
 
 
 class PageCacheMiddleware:
     """
     页面缓存中间件
-    为静态内容和查询结果较慢的页面提供缓存
+    
+    缓存渲染后的响应正文和响应头（而非 HttpResponse 对象），命中时不经过视图、ORM 和模板。
+    缓存键按路径、（可选的）GET 参数和 PAGE_CACHE_VARY_ON 中的维度（默认按匿名/角色）划分，
+    页面缓存带有 PAGE_CACHE_PAGES 中配置的标签，相关模型变更时自动失效。
+    响应附带 ETag 和 Last-Modified，客户端条件请求未变化时返回 304。
+    
+    需放在 AuthenticationMiddleware 之后。
     """
 
     def __init__(self, get_response):
         self.get_response = get_response
         # 定义需要缓存的页面及其配置
-        self.cache_config = {
-            # 页面路径: (缓存时间秒, 是否缓存GET参数)
-            '/': (300, False),  # 首页，5分钟
-            '/books/list/': (180, True),  # 图书列表，3分钟，缓存GET参数
-            '/books/': (300, False),  # 图书首页，5分钟
-        }
+        self.cache_config = getattr(settings, 'PAGE_CACHE_PAGES', {})
+        self.vary_on = getattr(settings, 'PAGE_CACHE_VARY_ON', ['role'])
 
     def __call__(self, request):
-        # 只缓存GET请求
-        if request.method != 'GET':
+        # 只缓存GET/HEAD请求
+        if request.method not in ('GET', 'HEAD'):
             return self.get_response(request)
 
         # 检查是否需要缓存该页面
-        path = request.path
-        if path not in self.cache_config:
+        config = self.cache_config.get(request.path)
+        if config is None:
             return self.get_response(request)
 
-        cache_timeout, cache_params = self.cache_config[path]
-
-        # 生成缓存键
-        if cache_params:
-            # 包含GET参数
-            cache_key = self._generate_cache_key(request, include_params=True)
-        else:
-            # 不包含GET参数
-            cache_key = self._generate_cache_key(request, include_params=False)
+        cache_key = self._generate_cache_key(request, include_params=config.get('query_params', False))
 
-        # 尝试从缓存获取响应
-        cached_response = cache.get(cache_key)
-        if cached_response is not None:
-            return cached_response
+        # 尝试从缓存获取页面
+        entry = cache.get(cache_key, namespace='pages')
+        if entry is not None:
+            response = self._build_response(request, entry)
+            response['X-Page-Cache'] = 'HIT'
+            return self._conditional(request, response, entry['last_modified'])
 
         # 生成响应并缓存
         response = self.get_response(request)
+        if not self._should_cache(request, response):
+            return response
 
-        # 只缓存成功的响应
-        if response.status_code == 200:
-            # 为响应添加Vary头，确保不同用户看到正确的内容
-            patch_vary_headers(response, ['Cookie', 'User-Agent'])
-
-            # 缓存响应
-            cache.set(cache_key, response, cache_timeout)
-
-        return response
+        entry = self._make_entry(request, response)
+        cache.set(cache_key, entry, timeout=config.get('timeout', 300), namespace='pages', tags=config.get('tags'))
+        self._set_validators(response, response.content, entry['last_modified'])
+        response['X-Page-Cache'] = 'MISS'
+        return self._conditional(request, response, entry['last_modified'])
 
     def _generate_cache_key(self, request, include_params=False):
         """生成页面缓存键"""
-        # 基础键包含路径和方法
-        key_parts = [
-            'page_cache',
-            request.path,
-            request.method,
-        ]
+        # 基础键包含路径
+        key_parts = ['page_cache', request.path]
 
         # 如果需要包含GET参数
         if include_params:
             # 对参数进行排序以确保一致性
-            sorted_params = sorted(request.GET.items())
-            params_str = '&'.join(f"{k}={v}" for k, v in sorted_params)
+            sorted_params = sorted(request.GET.lists())
+            params_str = '&'.join(f"{k}={v}" for k, values in sorted_params for v in values)
             key_parts.append(params_str)
 
-        # 如果用户已登录，包含用户ID（但这样会导致每个用户都有单独的缓存）
-        # 可以根据需要调整
-        if request.user.is_authenticated:
-            key_parts.append(f"user_{request.user.id}")
+        # 按配置的维度（例如匿名/角色）区分，而不是每个用户一份
+        for name in self.vary_on:
+            key_parts.append(f"{name}={PAGE_CACHE_VARY_FUNCTIONS[name](request)}")
 
         # 生成MD5哈希作为最终的键
         key_string = ':'.join(str(part) for part in key_parts)
         return hashlib.md5(key_string.encode('utf-8')).hexdigest()
 
+    @staticmethod
+    def _should_cache(request, response):
+        """只缓存不含会话/用户私有状态的成功响应"""
+        if response.status_code != 200 or response.streaming:
+            return False
+        # 设置了 Cookie（如登录会话）的响应不能共享给其他用户
+        if response.cookies:
+            return False
+        if 'no-store' in response.get('Cache-Control', '') or 'private' in response.get('Cache-Control', ''):
+            return False
+        # 渲染时用到了 CSRF 令牌或显示了一次性消息的页面不能共享
+        if request.META.get('CSRF_COOKIE_NEEDS_UPDATE') or request.META.get('CSRF_COOKIE_USED'):
+            return False
+        messages = getattr(request, '_messages', None)
+        if messages is not None and messages.used:
+            return False
+        return True
+
+    @staticmethod
+    def _make_entry(request, response):
+        """序列化响应：正文（用户名替换为占位符）、状态码和响应头"""
+        content = response.content
+        if request.user.is_authenticated:
+            username_html = USERNAME_HOLE.format(escape(request.user.get_username())).encode('utf-8')
+            content = content.replace(username_html, USERNAME_PLACEHOLDER.encode('utf-8'))
+        return {
+            'content': content,
+            'status': response.status_code,
+            'headers': [(k, v) for k, v in response.items() if k.lower() not in UNCACHEABLE_HEADERS],
+            'last_modified': int(time.time()),
+        }
+
+    def _build_response(self, request, entry):
+        """由缓存的正文和响应头重建响应，并填入当前用户名"""
+        content = entry['content']
+        if USERNAME_PLACEHOLDER.encode('utf-8') in content:
+            username = escape(request.user.get_username()) if request.user.is_authenticated else ''
+            content = content.replace(USERNAME_PLACEHOLDER.encode('utf-8'),
+                                      USERNAME_HOLE.format(username).encode('utf-8'))
+        response = HttpResponse(content, status=entry['status'])
+        for header, value in entry['headers']:
+            response[header] = value
+        self._set_validators(response, content, entry['last_modified'])
+        return response
 
-class CacheStatsMiddleware:
-    """
-    缓存统计中间件
-    用于监控和收集缓存性能数据
-    """
+    @staticmethod
+    def _set_validators(response, content, last_modified):
+        """设置 ETag（按实际正文计算，不同用户名的页面 ETag 不同）和 Last-Modified"""
+        response['ETag'] = f'"{hashlib.md5(content).hexdigest()}"'
+        response['Last-Modified'] = http_date(last_modified)
 
-    def __init__(self, get_response):
-        self.get_response = get_response
+    @staticmethod
+    def _conditional(request, response, last_modified):
+        """处理 If-None-Match / If-Modified-Since，未变化时返回 304"""
+        return get_conditional_response(
+            request, etag=response['ETag'], last_modified=last_modified, response=response
+        )
 
-    def __call__(self, request):
-        # 在请求开始前记录时间
-        from library_management.cache import cache
-        stats_before = cache.get_stats()
 
-        response = self.get_response(request)
+# 当前请求的分析数据（由 RequestProfilingMiddleware 设置），供模板渲染计时使用
+_current_profile = ContextVar('request_profile', default=None)
 
-        # 在请求结束后记录时间
-        stats_after = cache.get_stats()
 
-        # 将统计信息添加到响应头（仅在DEBUG模式下）
-        if hasattr(response, 'items') and hasattr(response, '__setitem__'):
-            response['X-Cache-Hits-Before'] = stats_before.get('hits', 0)
-            response['X-Cache-Hits-After'] = stats_after.get('hits', 0)
-            response['X-Cache-Hit-Rate'] = f"{stats_after.get('hit_rate', 0)}%"
+def _install_template_timer():
+    """
+    包装 Django 模板后端的 Template.render，将渲染耗时累加到当前请求的分析数据中
 
-        return response
+    只包装顶层模板（render()/render_to_string() 的入口），include/extends 的子模板耗时已包含在内。
+    仅在启用请求分析（REQUEST_PROFILING）时由 RequestProfilingMiddleware 安装；未被抽样的请求
+    不设置分析数据，包装只多一次 ContextVar 读取。template_rendered 信号只在测试环境中发送，无法用于计时。
+    """
+    from django.template.backends.django import Template
 
+    if getattr(Template.render, '_profiled', False):
+        return
+    original_render = Template.render
 
-class CacheInvalidationMiddleware:
+    def render(self, *args, **kwargs):
+        profile = _current_profile.get()
+        if profile is None:
+            return original_render(self, *args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return original_render(self, *args, **kwargs)
+        finally:
+            profile['template_ms'] += (time.perf_counter() - start) * 1000
+
+    render._profiled = True
+    Template.render = render
+
+
+class RequestProfileStore:
     """
-    缓存失效中间件
-    当数据变更时自动清除相关缓存
+    按视图保存最近若干次请求的耗时样本（进程内），用于计算 p50/p95/p99
+    """
+
+    def __init__(self, max_samples: int = 1000):
+        self.max_samples = max_samples
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, view_name, profile):
+        """记录一次请求：(总耗时ms, SQL次数, SQL耗时ms, 模板耗时ms, 缓存命中, 缓存未命中)"""
+        sample = (profile['total_ms'], profile['sql_count'], profile['sql_ms'],
+                  profile['template_ms'], profile['cache_hits'], profile['cache_misses'])
+        with self._lock:
+            samples = self._samples.get(view_name)
+            if samples is None:
+                samples = self._samples[view_name] = deque(maxlen=self.max_samples)
+            samples.append(sample)
+
+    @staticmethod
+    def _percentile(sorted_values, percent):
+        """最近秩法计算百分位数"""
+        index = max(0, math.ceil(percent / 100 * len(sorted_values)) - 1)
+        return sorted_values[index]
+
+    def summary(self):
+        """
+        各视图的耗时分布，按 p95 从高到低排序
+
+        Returns:
+            字典列表：view、count、p50/p95/p99/max（毫秒）及平均 SQL 次数、SQL/模板耗时、缓存命中/未命中
+        """
+        with self._lock:
+            snapshot = {view: list(samples) for view, samples in self._samples.items()}
+
+        rows = []
+        for view, samples in snapshot.items():
+            count = len(samples)
+            totals = sorted(sample[0] for sample in samples)
+            rows.append({
+                'view': view,
+                'count': count,
+                'p50': round(self._percentile(totals, 50), 2),
+                'p95': round(self._percentile(totals, 95), 2),
+                'p99': round(self._percentile(totals, 99), 2),
+                'max': round(totals[-1], 2),
+                'avg_sql_count': round(sum(sample[1] for sample in samples) / count, 1),
+                'avg_sql_ms': round(sum(sample[2] for sample in samples) / count, 2),
+                'avg_template_ms': round(sum(sample[3] for sample in samples) / count, 2),
+                'avg_cache_hits': round(sum(sample[4] for sample in samples) / count, 1),
+                'avg_cache_misses': round(sum(sample[5] for sample in samples) / count, 1),
+            })
+        rows.sort(key=lambda row: row['p95'], reverse=True)
+        return rows
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+
+
+request_profiles = RequestProfileStore(getattr(settings, 'REQUEST_PROFILE_SAMPLES', 1000))
+
+
+class RequestProfilingMiddleware:
+    """
+    请求分析中间件
+
+    记录每个请求的总耗时、SQL 次数与耗时（通过数据库 execute wrapper）、本请求的缓存命中/未命中
+    和模板渲染耗时，以 Server-Timing 响应头返回，并按视图累计耗时样本（见 cache/stats 页面）。
+    应放在 MIDDLEWARE 的最前面，使耗时包含其他中间件（包括页面缓存命中）。
+    REQUEST_PROFILING 关闭时不加载；只分析 REQUEST_PROFILE_SAMPLE_RATE 比例的请求，其余请求直接放行。
     """
 
     def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_PROFILING', True):
+            raise MiddlewareNotUsed
         self.get_response = get_response
+        self.sample_rate = getattr(settings, 'REQUEST_PROFILE_SAMPLE_RATE', 1.0)
+        _install_template_timer()
 
     def __call__(self, request):
-        response = self.get_response(request)
-
-        # 检查是否是数据修改请求
-        if request.method in ['POST', 'PUT', 'DELETE', 'PATCH']:
-            # 根据请求路径自动清除相关缓存
-            self._auto_invalidate_cache(request.path, request.user)
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return self.get_response(request)
 
+        profile = {'sql_count': 0, 'sql_ms': 0.0, 'template_ms': 0.0}
+
+        def sql_timer(execute, sql, params, many, context):
+            start = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                profile['sql_count'] += 1
+                profile['sql_ms'] += (time.perf_counter() - start) * 1000
+
+        token = _current_profile.set(profile)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack, track_cache_usage() as usage:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(sql_timer))
+                response = self.get_response(request)
+        finally:
+            _current_profile.reset(token)
+
+        profile['total_ms'] = (time.perf_counter() - start) * 1000
+        profile['cache_hits'] = usage['hits']
+        profile['cache_misses'] = usage['misses']
+        request_profiles.record(self._view_name(request), profile)
+
+        response['Server-Timing'] = (
+            f"total;dur={profile['total_ms']:.1f}, "
+            f"db;dur={profile['sql_ms']:.1f};desc=\"{profile['sql_count']} queries\", "
+            f"tpl;dur={profile['template_ms']:.1f}, "
+            f"cache;desc=\"{usage['hits']} hits {usage['misses']} misses\""
+        )
         return response
 
-    def _auto_invalidate_cache(self, path, user):
-        """根据路径自动失效缓存"""
-        from library_management.cache import cache, invalidate_user_cache
+    @staticmethod
+    def _view_name(request):
+        """请求对应的视图名称；页面缓存命中时未经过 URL 解析，需自行解析"""
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            try:
+                match = resolve(request.path_info)
+            except Resolver404:
+                return 'unmatched'
+        return match.view_name or match._func_path
 
-        # 如果是图书相关的修改，清除图书缓存
-        if '/books/' in path:
-            cache.clear(namespace='books')
 
-        # 如果是用户相关的修改，清除用户缓存
-        if '/accounts/' in path and user.is_authenticated:
-            invalidate_user_cache(user.id)
+class CacheInvalidationMiddleware:
+    """
+    缓存失效中间件
 
-        # 如果是借阅记录相关的修改，清除借阅缓存
-        if '/borrowing/' in path:
-            cache.clear(namespace='borrowing')
+    模型变更通过 post_save/post_delete 信号登记缓存标签（见 connect_cache_tags），同一事务内登记的标签
+    去重后在事务提交时一次性失效，提交之后同一请求中的读取即可看到新数据；回滚的写入不会失效任何标签，
+    只读请求（包括失败的表单提交和搜索）也不会清除缓存。
+    本中间件在请求结束时丢弃被回滚的事务留下的待失效标签。
+    """
 
-        # 清除首页缓存（通常包含各种统计信息）
-        cache.delete('home_stats', namespace='books')
\ No newline at end of file
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            return self.get_response(request)
+        finally:
+            discard_pending_invalidations()
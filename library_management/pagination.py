@@ -2,11 +2,186 @@
 优化的分页工具类
 提供高效的数据库分页查询和缓存机制
 """
+import os
+import time
+import logging
+import threading
+from collections import namedtuple, deque, OrderedDict, Counter
 from math import ceil
-from django.core.paginator import Paginator
-from django.db import models
-from django.core.cache import cache
-from .cache import get_cache_key_with_params, cache_query
+from django.conf import settings
+from django.core import signing
+from django.core.paginator import Paginator, InvalidPage
+from django.db import models, connections, router, DatabaseError
+from django.db.models import Q
+from .cache import get_cache_key_with_params, cache_query, track_cache_usage, cache as enhanced_cache
+
+logger = logging.getLogger(__name__)
+
+
+# 超过该页码视为深分页：页码链接会使用 OFFSET，此时只提供基于游标的翻页
+DEEP_PAGE_THRESHOLD = 50
+
+# 计数缓存：按模型和规范化后的过滤条件缓存 COUNT(*) 结果，模型变更时通过 model:<类名> 标签失效
+COUNT_CACHE_NAMESPACE = 'counts'
+COUNT_CACHE_TIMEOUT = 600
+
+
+def normalize_filters(filters):
+    """
+    规范化过滤条件，作为计数缓存的键
+
+    去掉空值，字符串去除首尾空白，按字段名排序；同一组条件无论传参顺序和空值如何，得到相同的键。
+
+    Args:
+        filters: 过滤条件字典
+
+    Returns:
+        (字段名, 值) 元组组成的有序元组
+    """
+    normalized = []
+    for name, value in (filters or {}).items():
+        if isinstance(value, str):
+            value = value.strip()
+        if value is None or value == '' or value == [] or value == ():
+            continue
+        normalized.append((name, str(value)))
+    return tuple(sorted(normalized))
+
+
+def estimate_count(model, using=None):
+    """
+    从数据库统计信息读取表的估算行数，不扫描表
+
+    SQLite 读取 sqlite_stat1（需执行过 ANALYZE），PostgreSQL 读取 pg_class.reltuples。
+
+    Args:
+        model: 模型类
+        using: 数据库别名，默认为模型的读库
+
+    Returns:
+        估算行数；没有统计信息或数据库不支持时返回 None
+    """
+    connection = connections[using or router.db_for_read(model)]
+    table = model._meta.db_table
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = %s", [table])
+                counts = [int(row[0].split()[0]) for row in cursor.fetchall() if row[0]]
+                return max(counts) if counts else None
+            if connection.vendor == 'postgresql':
+                cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table])
+                row = cursor.fetchone()
+                # 从未 ANALYZE 的表 reltuples 为 -1（旧版本为 0）
+                return int(row[0]) if row and row[0] > 0 else None
+    except DatabaseError:
+        # 例如 SQLite 从未执行过 ANALYZE，sqlite_stat1 表不存在
+        return None
+    return None
+
+
+def get_cached_count(queryset, filters=None, tags=None, timeout=COUNT_CACHE_TIMEOUT, estimate_above=None):
+    """
+    获取查询集的总数（带缓存，可选估算）
+
+    缓存键由模型和规范化后的过滤条件组成，filters 须完整描述 queryset 的过滤条件。
+    未过滤的查询集在设置了 estimate_above（默认读取 PAGINATION_ESTIMATE_COUNT_ABOVE）时，
+    若统计信息中的行数不小于该值，直接使用估算值，不执行 COUNT(*)。
+
+    Args:
+        queryset: 查询集
+        filters: 过滤条件字典
+        tags: 额外的依赖标签（模型自身的 model:<类名> 标签总会加上）
+        timeout: 缓存时间（秒）
+        estimate_above: 启用估算的最小行数，None 时读取配置
+
+    Returns:
+        (总数, 是否为估算值)
+    """
+    model = queryset.model
+    normalized = normalize_filters(filters)
+    if estimate_above is None:
+        estimate_above = getattr(settings, 'PAGINATION_ESTIMATE_COUNT_ABOVE', None)
+    query = queryset.query
+    can_estimate = (estimate_above is not None and not normalized and not query.where
+                    and not query.is_sliced and not query.distinct)
+
+    def compute():
+        if can_estimate:
+            estimated = estimate_count(model, queryset.db)
+            if estimated is not None and estimated >= estimate_above:
+                return estimated, True
+        return queryset.count(), False
+
+    return enhanced_cache.get_or_set(
+        (model._meta.label, normalized, can_estimate),
+        compute,
+        timeout=timeout,
+        namespace=COUNT_CACHE_NAMESPACE,
+        tags=[f"model:{model._meta.object_name}", *(tags or ())],
+    )
+
+
+class CompactRow:
+    """
+    紧凑行：只包含列表模板用到的字段的不可变元组
+
+    子类同时继承 namedtuple，例如 BookRow。缓存分页数据时保存紧凑行而不是模型实例或 Page 对象，
+    缓存项体积小，命中时直接用于渲染，不访问数据库。字段须包含主键 id；
+    字段可以是模型属性（如 cover_image_url），在写入缓存时计算一次。
+    """
+    __slots__ = ()
+    # 模型标识（'<app_label>.<model_name>'），与模型实例的片段缓存键格式一致
+    model_label = ''
+
+    @classmethod
+    def from_instance(cls, instance):
+        """从模型实例生成紧凑行"""
+        return cls._make(getattr(instance, field) for field in cls._fields)
+
+    @property
+    def pk(self):
+        return self.id
+
+    def cache_key(self):
+        """片段缓存键：'<模型>:<主键>@<updated_at>'，与模型实例相同"""
+        updated_at = getattr(self, 'updated_at', None)
+        stamp = updated_at.timestamp() if updated_at else ''
+        return f"{self.model_label}:{self.pk}@{stamp}"
+
+    def cache_tags(self):
+        """片段缓存标签（'<模型名>:<主键>' 以及外键标签）"""
+        return [f"{self.model_label.split('.')[-1]}:{self.pk}"]
+
+
+class BookRow(CompactRow, namedtuple('BookRow', [
+    'id', 'title', 'author', 'available_copies', 'cover_image_url', 'category_id', 'updated_at',
+])):
+    """图书列表的紧凑行"""
+    __slots__ = ()
+    model_label = 'books.book'
+
+    def cache_tags(self):
+        tags = super().cache_tags()
+        if self.category_id is not None:
+            tags.append(f"category:{self.category_id}")
+        return tags
+
+
+def to_rows(items, row_type=None):
+    """
+    将模型实例转换为紧凑行元组
+
+    Args:
+        items: 模型实例的可迭代对象
+        row_type: CompactRow 子类，None 时保留模型实例
+
+    Returns:
+        元组
+    """
+    if row_type is None:
+        return tuple(items)
+    return tuple(row_type.from_instance(item) for item in items)
 
 
 class OptimizedPaginator:
@@ -14,7 +189,8 @@ class OptimizedPaginator:
     优化的分页器，支持缓存和高效查询
     """
 
-    def __init__(self, queryset, per_page=12, cache_timeout=300, cache_namespace='pagination'):
+    def __init__(self, queryset, per_page=12, cache_timeout=300, cache_namespace='pagination', row_type=None,
+                 use_cache=True):
         """
         初始化优化分页器
 
@@ -23,11 +199,15 @@ class OptimizedPaginator:
             per_page: 每页显示数量
             cache_timeout: 缓存超时时间（秒）
             cache_namespace: 缓存命名空间
+            row_type: 紧凑行类型（CompactRow 子类），指定时缓存和返回紧凑行而不是模型实例
+            use_cache: 是否缓存页面数据；调用方已缓存整个结果时传 False，避免同一页保存两份
         """
         self.queryset = queryset
         self.per_page = per_page
+        self.use_cache = use_cache
         self.cache_timeout = cache_timeout
         self.cache_namespace = cache_namespace
+        self.row_type = row_type
         self.paginator = None
 
     def get_page_data(self, page_number, **filters):
@@ -41,27 +221,42 @@ class OptimizedPaginator:
         Returns:
             包含分页数据的字典
         """
-        # 生成缓存键
-        cache_key = get_cache_key_with_params(
-            'page_data',
-            page=page_number,
-            per_page=self.per_page,
-            total=self.queryset.count(),
-            **filters
-        )
-
-        # 尝试从缓存获取
-        cached_data = cache.get(cache_key)
-        if cached_data:
-            return cached_data
+        # 总数只计算一次（带缓存），用于缓存键，并直接交给 Paginator，避免重复 COUNT(*)
+        total_items, is_estimate = get_cached_count(self.queryset, filters)
+
+        # 尝试从缓存获取（命中时直接返回紧凑行，不访问数据库）
+        if self.use_cache:
+            cache_key = get_cache_key_with_params(
+                'page_data',
+                page=page_number,
+                per_page=self.per_page,
+                total=total_items,
+                rows=self.row_type.__name__ if self.row_type else '',
+                **filters
+            )
+            cached_data = enhanced_cache.get(cache_key, namespace=self.cache_namespace)
+            if cached_data:
+                return cached_data
 
         # 从数据库获取数据
-        self.paginator = Paginator(self.queryset, self.per_page)
+        self.paginator = self._make_paginator(total_items)
 
         try:
             page_obj = self.paginator.page(page_number)
-        except:
-            page_obj = self.paginator.page(1)
+        except InvalidPage:
+            page_obj = None
+
+        if is_estimate and (page_obj is None or not page_obj.object_list
+                            or page_obj.number >= self.paginator.num_pages):
+            # 估算值只用于"约 N"的显示：请求的页超出估算范围、为空页或是末页时，
+            # 按准确的总数重新分页，避免返回错误的页或缺行
+            total_items, is_estimate = self.queryset.count(), False
+            self.paginator = self._make_paginator(total_items)
+            page_obj = None
+
+        if page_obj is None:
+            # 页码不是整数时返回第一页，超出范围时返回末页
+            page_obj = self.paginator.get_page(page_number)
 
         # 计算分页信息
         total_pages = self.paginator.num_pages
@@ -74,13 +269,14 @@ class OptimizedPaginator:
         # 生成页码范围
         page_range = self._get_page_range(current_page, total_pages)
 
-        # 组织数据
+        # 组织数据：只保存本页的行，不保存 Page 对象
+        # （序列化 Page 会连同其 Paginator 的整个查询集一起求值和保存）
         data = {
-            'object_list': page_obj.object_list,
-            'page_obj': page_obj,
+            'object_list': to_rows(page_obj.object_list, self.row_type),
             'current_page': current_page,
             'total_pages': total_pages,
-            'total_items': self.paginator.count,
+            'total_items': total_items,
+            'count_is_estimate': is_estimate,
             'per_page': self.per_page,
             'has_next': has_next,
             'has_previous': has_previous,
@@ -91,11 +287,19 @@ class OptimizedPaginator:
             'end_index': page_obj.end_index()
         }
 
-        # 缓存数据
-        cache.set(cache_key, data, self.cache_timeout)
+        # 缓存数据：行中含可借册数等字段，模型变更时通过标签失效
+        if self.use_cache:
+            enhanced_cache.set(cache_key, data, self.cache_timeout, namespace=self.cache_namespace,
+                               tags=[f"model:{self.queryset.model._meta.object_name}"])
 
         return data
 
+    def _make_paginator(self, count):
+        """创建使用已知总数的 Paginator（Paginator.count 是 cached_property，预先赋值后不再查询）"""
+        paginator = Paginator(self.queryset, self.per_page)
+        paginator.count = count
+        return paginator
+
     def _get_page_range(self, current_page, total_pages, window_size=5):
         """
         生成页码范围
@@ -125,85 +329,245 @@ class OptimizedPaginator:
         return range(start_page, end_page + 1)
 
 
+class RankedPagination(OptimizedPaginator):
+    """
+    按预先排好序的主键列表分页，用于全文搜索结果（按相关度排序）
+
+    主键列表来自搜索索引且数量有上限，分页只需对列表切片，再按主键批量读取本页的行，
+    不需要 COUNT(*) 或 OFFSET。结果数达到上限时总数标记为估算值。
+    """
+
+    def __init__(self, queryset, ids, per_page=12, row_type=None, limit=None):
+        """
+        初始化排序结果分页器
+
+        Args:
+            queryset: 用于读取本页数据的查询集
+            ids: 按相关度排序的主键列表
+            per_page: 每页显示数量
+            row_type: 紧凑行类型（可选）
+            limit: 搜索结果上限（可选），结果数达到上限时总数为估算值
+        """
+        super().__init__(queryset, per_page, row_type=row_type)
+        self.ids = list(ids)
+        self.limit = limit
+
+    def get_page_data(self, page_number, **filters):
+        self.paginator = Paginator(self.ids, self.per_page)
+        page_obj = self.paginator.get_page(page_number)
+        objects = self.queryset.in_bulk(page_obj.object_list)
+        items = [objects[pk] for pk in page_obj.object_list if pk in objects]
+
+        total_items = len(self.ids)
+        current_page = page_obj.number
+        return {
+            'object_list': to_rows(items, self.row_type),
+            'current_page': current_page,
+            'total_pages': self.paginator.num_pages,
+            'total_items': total_items,
+            'count_is_estimate': bool(self.limit) and total_items >= self.limit,
+            'per_page': self.per_page,
+            'has_next': page_obj.has_next(),
+            'has_previous': page_obj.has_previous(),
+            'next_page_number': current_page + 1 if page_obj.has_next() else None,
+            'prev_page_number': current_page - 1 if page_obj.has_previous() else None,
+            'page_range': self._get_page_range(current_page, self.paginator.num_pages),
+            'start_index': page_obj.start_index(),
+            'end_index': page_obj.end_index(),
+            'pagination_mode': 'ranked',
+        }
+
+
 class CursorPagination:
     """
-    基于游标的分页器，适用于大数据集
+    基于游标（keyset）的分页器，适用于大数据集
+
+    支持多列排序（例如 ('title', 'id')），按上一页边界行的排序键定位：
+    WHERE title > t OR (title = t AND id > i)，无论翻到第几页都只读取 per_page + 1 行，
+    不使用 OFFSET。游标经过签名和编码，客户端无法伪造或解析其中的值。
+    排序字段须非空；未包含主键时自动追加主键，保证排序唯一。
     """
 
-    def __init__(self, queryset, per_page=12, ordering='-id'):
+    CURSOR_SALT = 'library_management.pagination.cursor'
+
+    def __init__(self, queryset, per_page=12, ordering=None, row_type=None):
         """
         初始化游标分页器
 
         Args:
             queryset: 查询集
             per_page: 每页显示数量
-            ordering: 排序字段
+            ordering: 排序字段（字符串或元组），默认使用查询集的排序，都没有时为 '-id'
+            row_type: 紧凑行类型（可选），其字段须包含所有排序字段
         """
         self.queryset = queryset
         self.per_page = per_page
+        self.row_type = row_type
+
+        if ordering is None:
+            ordering = tuple(field for field in queryset.query.order_by if isinstance(field, str)) or ('-id',)
+        elif isinstance(ordering, str):
+            ordering = (ordering,)
+        ordering = tuple(ordering)
+
+        # 追加主键作为最后的排序字段，保证排序键唯一
+        pk_name = queryset.model._meta.pk.name
+        if not any(field.lstrip('-') in (pk_name, 'pk') for field in ordering):
+            ordering += (('-' if ordering[-1].startswith('-') else '') + pk_name,)
+
         self.ordering = ordering
+        self.fields = [field.lstrip('-') for field in ordering]
+
+    def _reversed_ordering(self):
+        """反向排序，用于向前翻页和末页"""
+        return [field[1:] if field.startswith('-') else f'-{field}' for field in self.ordering]
+
+    def _keyset_filter(self, values, reverse=False):
+        """
+        生成"排在 values 之后"（reverse 时为"之前"）的过滤条件
+
+        例如 ('title', 'id') -> Q(title__gt=t) | Q(title=t, id__gt=i)
+        """
+        condition = Q()
+        for i, field in enumerate(self.ordering):
+            descending = field.startswith('-') != reverse
+            term = Q(**{f"{self.fields[i]}__{'lt' if descending else 'gt'}": values[i]})
+            for prev_field, prev_value in zip(self.fields[:i], values[:i]):
+                term &= Q(**{prev_field: prev_value})
+            condition |= term
+        return condition
+
+    @staticmethod
+    def _cursor_value(value):
+        """游标中的值需可 JSON 序列化，日期等其他类型转为字符串（过滤时由 Django 解析）"""
+        if value is None or isinstance(value, (str, int, float, bool)):
+            return value
+        return str(value)
+
+    def _encode(self, payload):
+        payload['o'] = list(self.ordering)
+        return signing.dumps(payload, salt=self.CURSOR_SALT, compress=True)
+
+    def encode_cursor(self, item, direction, page_number):
+        """
+        生成游标
+
+        Args:
+            item: 边界行（向后翻页为本页最后一行，向前翻页为本页第一行）
+            direction: 'next' 或 'prev'
+            page_number: 游标指向的页码（仅用于显示）
+
+        Returns:
+            签名后的游标字符串
+        """
+        return self._encode({
+            'd': 'n' if direction == 'next' else 'p',
+            'p': page_number,
+            'k': [self._cursor_value(getattr(item, field)) for field in self.fields],
+        })
+
+    def last_page_cursor(self, total_count):
+        """生成指向末页的游标：反向排序取末尾若干行，同样不需要 OFFSET；total_count 须为准确的总数"""
+        total_pages = max(1, ceil(total_count / self.per_page))
+        tail = total_count - (total_pages - 1) * self.per_page
+        return self._encode({'d': 'l', 'p': total_pages, 'n': max(tail, 1), 'k': []})
+
+    def decode_cursor(self, cursor):
+        """
+        解析游标
+
+        Returns:
+            游标内容；签名无效、格式错误或排序不一致时返回 None（按第一页处理）
+        """
+        try:
+            payload = signing.loads(cursor, salt=self.CURSOR_SALT)
+        except (signing.BadSignature, ValueError, TypeError):
+            return None
+        if not isinstance(payload, dict) or payload.get('o') != list(self.ordering):
+            return None
+        if payload.get('d') in ('n', 'p') and len(payload.get('k') or []) != len(self.fields):
+            return None
+        return payload
 
     def get_page_data(self, cursor=None):
         """
         获取基于游标的分页数据
 
         Args:
-            cursor: 游标值
+            cursor: 游标字符串，None 表示第一页
 
         Returns:
             包含分页数据的字典
         """
-        queryset = self.queryset.order_by(self.ordering)
-
-        if cursor:
-            if self.ordering.startswith('-'):
-                field_name = self.ordering[1:]
-                queryset = queryset.filter(**{f'{field_name}__lt': cursor})
-            else:
-                field_name = self.ordering
-                queryset = queryset.filter(**{f'{field_name}__gt': cursor})
-
-        items = list(queryset[:self.per_page + 1])
-        has_next = len(items) > self.per_page
-        if has_next:
-            items = items[:-1]
-
-        # 计算下一页游标
-        next_cursor = None
-        if has_next and items:
-            last_item = items[-1]
-            if self.ordering.startswith('-'):
-                field_name = self.ordering[1:]
-                next_cursor = getattr(last_item, field_name)
-            else:
-                field_name = self.ordering
-                next_cursor = getattr(last_item, field_name)
+        payload = self.decode_cursor(cursor) if cursor else None
+        direction = payload['d'] if payload else 'n'
+        current_page = payload.get('p', 1) if payload else 1
+
+        if direction == 'p':
+            # 向前翻页：反向排序取边界之前的行，再恢复正序
+            queryset = self.queryset.order_by(*self._reversed_ordering()).filter(
+                self._keyset_filter(payload['k'], reverse=True)
+            )
+            items = list(queryset[:self.per_page + 1])
+            has_previous = len(items) > self.per_page
+            items = items[:self.per_page][::-1]
+            has_next = True
+        elif direction == 'l':
+            # 末页：反向排序取末尾 n 行
+            items = list(self.queryset.order_by(*self._reversed_ordering())[:payload['n']])[::-1]
+            has_next = False
+            has_previous = current_page > 1
+        else:
+            queryset = self.queryset.order_by(*self.ordering)
+            if payload:
+                queryset = queryset.filter(self._keyset_filter(payload['k']))
+            items = list(queryset[:self.per_page + 1])
+            has_next = len(items) > self.per_page
+            items = items[:self.per_page]
+            has_previous = payload is not None
+
+        if not has_previous:
+            current_page = 1
+        items = to_rows(items, self.row_type)
 
         return {
             'object_list': items,
+            'current_page': current_page,
+            'per_page': self.per_page,
             'has_next': has_next,
-            'next_cursor': str(next_cursor) if next_cursor else None,
-            'per_page': self.per_page
+            'has_previous': has_previous,
+            'next_page_number': current_page + 1 if has_next else None,
+            'prev_page_number': current_page - 1 if has_previous else None,
+            'next_cursor': self.encode_cursor(items[-1], 'next', current_page + 1) if has_next and items else None,
+            'prev_cursor': self.encode_cursor(items[0], 'prev', current_page - 1) if has_previous and items else None,
+            'pagination_mode': 'cursor',
         }
 
 
 class SmartPagination:
     """
-    智能分页器，根据数据量自动选择最适合的分页策略
+    智能分页器，根据请求自动选择最适合的分页策略
+
+    带游标的请求使用 keyset 分页（任意深度的页面代价相同）；按页码请求使用传统分页，
+    同时附带上一页/下一页游标，之后的顺序翻页都走 keyset 分页。
     """
 
-    def __init__(self, queryset, per_page=12, strategy='auto'):
+    def __init__(self, queryset, per_page=12, strategy='auto', row_type=None, use_cache=True):
         """
         初始化智能分页器
 
         Args:
-            queryset: 查询集
+            queryset: 查询集（需有确定的排序，例如 order_by('title', 'id')）
             per_page: 每页显示数量
             strategy: 分页策略 ('auto', 'offset', 'cursor')
+            row_type: 紧凑行类型（可选），指定时 object_list 为紧凑行
+            use_cache: 传统分页是否缓存页面数据（见 OptimizedPaginator）
         """
         self.queryset = queryset
         self.per_page = per_page
         self.strategy = strategy
+        self.row_type = row_type
+        self.use_cache = use_cache
 
     def get_page_data(self, page_number=None, cursor=None, **filters):
         """
@@ -217,45 +581,213 @@ class SmartPagination:
         Returns:
             包含分页数据的字典
         """
-        # 自动选择策略
+        cursor_paginator = CursorPagination(self.queryset, self.per_page, row_type=self.row_type)
+
+        if self.strategy == 'cursor' or (self.strategy == 'auto' and cursor):
+            data = cursor_paginator.get_page_data(cursor)
+            total_items, is_estimate = get_cached_count(self.queryset, filters)
+            data.update({
+                'total_items': total_items,
+                'count_is_estimate': is_estimate,
+                'total_pages': max(1, ceil(total_items / self.per_page)),
+                # 末页游标的页码和行数依赖准确的总数；估算时由"末页"链接按页码跳转，由分页器重新计数
+                'last_cursor': cursor_paginator.last_page_cursor(total_items)
+                if data['has_next'] and not is_estimate else None,
+            })
+            return data
+
+        paginator = OptimizedPaginator(self.queryset, self.per_page, row_type=self.row_type, use_cache=self.use_cache)
+        data = dict(paginator.get_page_data(page_number or 1, **filters))
         if self.strategy == 'auto':
-            total_count = self.queryset.count()
-            if total_count > 10000:
-                # 大数据集使用游标分页
-                self.strategy = 'cursor'
-            else:
-                # 小数据集使用传统分页
-                self.strategy = 'offset'
-
-        if self.strategy == 'cursor':
-            paginator = CursorPagination(self.queryset, self.per_page)
-            return paginator.get_page_data(cursor)
-        else:
-            paginator = OptimizedPaginator(self.queryset, self.per_page)
-            return paginator.get_page_data(page_number or 1, **filters)
+            # 附带游标，使后续的顺序翻页和跳到末页不再使用 OFFSET
+            items = data['object_list']
+            data.update({
+                'next_cursor': cursor_paginator.encode_cursor(items[-1], 'next', data['current_page'] + 1)
+                if data['has_next'] and items else None,
+                'prev_cursor': cursor_paginator.encode_cursor(items[0], 'prev', data['current_page'] - 1)
+                if data['has_previous'] and items else None,
+                'last_cursor': cursor_paginator.last_page_cursor(data['total_items'])
+                if data['has_next'] and not data['count_is_estimate'] else None,
+            })
+        return data
 
 
-@cache_query(timeout=600, namespace='books')
-def get_paginated_books(query='', category_id='', page=1, per_page=12):
+class PagePrefetcher:
     """
-    获取分页图书数据（带缓存）
+    相邻页预取器
 
-    Args:
-        query: 搜索查询
-        category_id: 分类ID
-        page: 页码
-        per_page: 每页数量
+    返回第 N 页后，由后台线程调用 loader 预先计算第 N+1、N-1 页，参数与正常请求完全一致，
+    因此写入的是同一个缓存键，用户翻页时直接命中。
 
-    Returns:
-        分页数据
+    - 有界：固定数量的工作线程（默认 2 个），待执行任务数不超过 max_pending，队列满时丢弃新任务
+    - 可取消：同一用户浏览同一列表（相同的过滤条件）有新请求时，该用户尚未开始的旧预取任务自动作废，
+      不影响其他用户；cancel() 作废所有待执行任务
+    - 可统计：记录预取的页面被用户实际请求的次数（命中率），用于判断预取是否值得
     """
-    from books.models import Book, Category
-    from django.db.models import Q
+
+    def __init__(self, loader, max_pending=16, hit_window=600, track_size=1000, workers=2):
+        """
+        初始化预取器
+
+        Args:
+            loader: 加载函数（带缓存），以关键字参数调用
+            max_pending: 最多待执行的预取任务数
+            workers: 工作线程数
+            hit_window: 预取结果的有效期（秒，通常与缓存时间一致），过期后被请求不计为命中
+            track_size: 最多跟踪的已预取页面数
+        """
+        self.loader = loader
+        self.max_pending = max_pending
+        self.hit_window = hit_window
+        self.track_size = track_size
+        self.workers = max(1, workers)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._queue = deque()
+        self._pending = set()
+        self._latest = OrderedDict()  # 列表标识 -> 最近一次调度的序号
+        self._warmed = OrderedDict()  # 请求键 -> 预取完成时间
+        self._seq = 0
+        self._epoch = 0
+        self._worker_pid = None
+        self._stats = Counter()
+
+    @staticmethod
+    def _request_key(kwargs):
+        return tuple(sorted(kwargs.items()))
+
+    def schedule(self, stream, requests):
+        """
+        调度预取任务
+
+        Args:
+            stream: 列表标识，例如 (用户标识, 过滤条件...) 元组；同一标识的新调度会作废旧的待执行任务
+            requests: loader 的关键字参数字典列表
+        """
+        with self._lock:
+            self._seq += 1
+            self._latest[stream] = self._seq
+            self._latest.move_to_end(stream)
+            if len(self._latest) > self.track_size:
+                self._latest.popitem(last=False)
+
+            for kwargs in requests:
+                key = self._request_key(kwargs)
+                if key in self._pending:
+                    continue
+                if len(self._pending) >= self.max_pending:
+                    self._stats['dropped'] += 1
+                    continue
+                self._pending.add(key)
+                self._queue.append((key, kwargs, stream, self._seq, self._epoch))
+                self._stats['scheduled'] += 1
+
+            if self._queue:
+                self._ensure_worker()
+                self._wakeup.notify()
+
+    def record_request(self, kwargs):
+        """记录一次用户请求，若该页由预取写入缓存则计为命中"""
+        key = self._request_key(kwargs)
+        with self._lock:
+            warmed_at = self._warmed.pop(key, None)
+            if warmed_at is not None and time.time() - warmed_at <= self.hit_window:
+                self._stats['hits'] += 1
+
+    def cancel(self):
+        """作废所有尚未开始的预取任务"""
+        with self._lock:
+            self._epoch += 1
+
+    def _ensure_worker(self):
+        """启动工作线程（调用方持有锁）；fork 出的子进程中重新启动"""
+        if self._worker_pid == os.getpid():
+            return
+        self._worker_pid = os.getpid()
+        for i in range(self.workers):
+            threading.Thread(target=self._work_loop, name=f'page-prefetcher-{i}', daemon=True).start()
+
+    def _next_job(self):
+        """取出下一个未作废的任务，没有任务时等待"""
+        with self._lock:
+            while True:
+                while not self._queue:
+                    self._wakeup.wait()
+                key, kwargs, stream, seq, epoch = self._queue.popleft()
+                if epoch == self._epoch and self._latest.get(stream) == seq:
+                    return key, kwargs
+                self._pending.discard(key)
+                self._stats['cancelled'] += 1
+
+    def _work_loop(self):
+        while True:
+            key, kwargs = self._next_job()
+            try:
+                with track_cache_usage() as usage:
+                    self.loader(**kwargs)
+                with self._lock:
+                    if usage['misses']:
+                        # 有未命中说明确实计算并写入了缓存
+                        self._warmed[key] = time.time()
+                        self._warmed.move_to_end(key)
+                        if len(self._warmed) > self.track_size:
+                            self._warmed.popitem(last=False)
+                        self._stats['warmed'] += 1
+                    else:
+                        self._stats['already_cached'] += 1
+            except Exception as e:
+                logger.warning(f"预取分页数据失败: {kwargs} ({str(e)})")
+                with self._lock:
+                    self._stats['errors'] += 1
+            finally:
+                with self._lock:
+                    self._pending.discard(key)
+                # 工作线程使用独立的数据库连接，每个任务结束后关闭
+                connections.close_all()
+
+    def get_stats(self):
+        """
+        获取预取统计
+
+        Returns:
+            scheduled（已调度）、dropped（队列满丢弃）、cancelled（作废）、warmed（实际预取）、
+            already_cached（已在缓存中）、errors、hits（预取页面被请求）、hit_rate、pending
+        """
+        with self._lock:
+            stats = {name: self._stats[name] for name in (
+                'scheduled', 'dropped', 'cancelled', 'warmed', 'already_cached', 'errors', 'hits')}
+            stats['pending'] = len(self._pending)
+        stats['hit_rate'] = round(stats['hits'] / stats['warmed'] * 100, 2) if stats['warmed'] else 0
+        return stats
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats.clear()
+            self._warmed.clear()
+
+
+@cache_query(timeout=600, namespace='books', tags=['model:Book', 'model:Category', 'pagination:book'])
+def _get_paginated_books(query='', category_id='', page=1, per_page=12, cursor=None):
+    """获取分页图书数据（带缓存），参数须已规范化，见 get_paginated_books"""
+    from books.models import Book
+    from books.search import search_book_ids
+
+    if query:
+        # 有搜索词时使用全文索引，结果按相关度排序并按页切片
+        ranked_ids = search_book_ids(query, category_id)
+        if ranked_ids is not None:
+            paginator = RankedPagination(
+                Book.objects.all(), ranked_ids, per_page=per_page, row_type=BookRow,
+                limit=getattr(settings, 'SEARCH_MAX_RESULTS', 1000),
+            )
+            return paginator.get_page_data(page)
 
     # 构建查询
-    queryset = Book.objects.select_related('category').all().order_by('title')
+    # (title, id) 保证排序唯一，keyset 分页依赖它
+    queryset = Book.objects.select_related('category').all().order_by('title', 'id')
 
     if query:
+        # 当前数据库不支持全文搜索时退回 icontains
         queryset = queryset.filter(
             Q(title__icontains=query) |
             Q(author__icontains=query) |
@@ -265,9 +797,81 @@ def get_paginated_books(query='', category_id='', page=1, per_page=12):
     if category_id:
         queryset = queryset.filter(category_id=category_id)
 
-    # 使用优化分页器
-    paginator = SmartPagination(queryset, per_page=per_page)
-    return paginator.get_page_data(page_number=page, query=query, category=category_id)
+    # 使用优化分页器，只保存列表模板用到的字段；结果由本函数的缓存保存一份，分页器不再另行缓存
+    paginator = SmartPagination(queryset, per_page=per_page, row_type=BookRow, use_cache=False)
+    return paginator.get_page_data(page_number=page, cursor=cursor, query=query, category=category_id)
+
+
+page_prefetcher = PagePrefetcher(
+    _get_paginated_books,
+    max_pending=getattr(settings, 'PAGINATION_PREFETCH_MAX_PENDING', 16),
+    hit_window=600,  # 与 _get_paginated_books 的缓存时间一致
+    workers=getattr(settings, 'PAGINATION_PREFETCH_WORKERS', 2),
+)
+
+
+def prefetch_client(request):
+    """
+    预取任务的用户标识：已登录用户的ID，否则为会话键或客户端地址
+
+    Args:
+        request: HTTP 请求
+    """
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return f"user:{user.pk}"
+    session = getattr(request, 'session', None)
+    if session is not None and session.session_key:
+        return f"session:{session.session_key}"
+    return f"addr:{request.META.get('REMOTE_ADDR', '')}"
+
+
+def _adjacent_page_requests(request, data):
+    """生成相邻页的请求参数：与页面上"上一页/下一页"链接一致，有游标时使用游标"""
+    requests = []
+    for cursor, page in ((data.get('next_cursor'), data.get('next_page_number')),
+                         (data.get('prev_cursor'), data.get('prev_page_number'))):
+        if cursor:
+            requests.append({**request, 'page': 1, 'cursor': cursor})
+        elif page:
+            requests.append({**request, 'page': page, 'cursor': None})
+    return requests
+
+
+def get_paginated_books(query='', category_id='', page=1, per_page=12, cursor=None, prefetch=None, client=None):
+    """
+    获取分页图书数据（带缓存）
+
+    Args:
+        query: 搜索查询
+        category_id: 分类ID
+        page: 页码
+        per_page: 每页数量
+        cursor: 翻页游标（可选），指定时忽略页码，使用 keyset 分页
+        prefetch: 是否在后台预取相邻页，None 时读取 PAGINATION_PREFETCH 配置
+        client: 用户标识（见 prefetch_client），不同用户的预取任务互不作废
+
+    Returns:
+        分页数据
+    """
+    # 规范化参数：查询集、计数缓存键和分页缓存键使用同一组值；
+    # 使用游标时页码无意义，固定为 1，使预取与用户请求的缓存键一致
+    request = {
+        'query': (query or '').strip(),
+        'category_id': str(category_id or '').strip(),
+        'page': 1 if cursor else page,
+        'per_page': per_page,
+        'cursor': cursor or None,
+    }
+    data = _get_paginated_books(**request)
+    page_prefetcher.record_request(request)
+
+    if prefetch is None:
+        prefetch = getattr(settings, 'PAGINATION_PREFETCH', False)
+    if prefetch:
+        stream = (client, request['query'], request['category_id'], per_page)
+        page_prefetcher.schedule(stream, _adjacent_page_requests(request, data))
+    return data
 
 
 class PaginationCacheManager:
@@ -280,20 +884,16 @@ class PaginationCacheManager:
         """
         失效特定条件的分页缓存
 
+        只失效带有 'pagination:<queryset_key>' 标签的分页缓存，其他缓存不受影响。
+        图书、分类变更时分页缓存已通过 model:Book/model:Category 标签自动失效，
+        此方法仅用于需要手动刷新分页的场景。
+
         Args:
-            queryset_key: 查询集标识
-            **filters: 过滤条件
+            queryset_key: 查询集标识，例如 'book'
+            **filters: 过滤条件（分页缓存按整个查询集打标签，此参数保留以兼容旧调用）
         """
-        # 生成缓存键模式
-        pattern_parts = [f"page_data_*_{queryset_key}"]
-
-        for key, value in filters.items():
-            if value:
-                pattern_parts.append(f"{key}_{value}")
-
-        # 清理相关缓存
         from .cache import cache
-        cache.clear()
+        cache.invalidate_tags(f"pagination:{queryset_key}")
 
 
 def get_pagination_context(paginator_data, request_path=''):
@@ -323,13 +923,31 @@ def get_pagination_context(paginator_data, request_path=''):
     }
 
     # 添加额外的分页信息
+    current_page = paginator_data.get('current_page', 1)
+    total_pages = paginator_data.get('total_pages', 1)
     context.update({
-        'total_pages': paginator_data.get('total_pages', 1),
+        'total_pages': total_pages,
         'total_items': paginator_data.get('total_items', 0),
+        # 总数为估算值时页面显示"约 N 条"
+        'count_is_estimate': paginator_data.get('count_is_estimate', False),
         'per_page': paginator_data.get('per_page', 12),
-        'current_page': paginator_data.get('current_page', 1),
-        'show_first_page': context['current_page'] > 3,
-        'show_last_page': context['current_page'] < paginator_data.get('total_pages', 1) - 2,
+        'current_page': current_page,
+        'has_previous': paginator_data.get('has_previous', False),
+        'has_next': paginator_data.get('has_next', False),
+        'prev_page_number': paginator_data.get('prev_page_number'),
+        'next_page_number': paginator_data.get('next_page_number'),
+        'start_index': paginator_data.get('start_index', (current_page - 1) * paginator_data.get('per_page', 12) + 1),
+        'end_index': paginator_data.get(
+            'end_index', (current_page - 1) * paginator_data.get('per_page', 12) + len(context['object_list'])
+        ),
+        'show_first_page': current_page > 3,
+        'show_last_page': current_page < total_pages - 2,
+        # keyset 分页游标：上一页/下一页/末页链接优先使用游标，避免深分页的 OFFSET
+        'prev_cursor': paginator_data.get('prev_cursor'),
+        'next_cursor': paginator_data.get('next_cursor'),
+        'last_cursor': paginator_data.get('last_cursor'),
+        # 深分页时不显示页码窗口（页码链接使用 OFFSET）
+        'show_page_range': current_page <= DEEP_PAGE_THRESHOLD,
         'page_url_base': request_path,
     })
 
@@ -23,6 +23,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # 请求分析（耗时、SQL、缓存命中、模板渲染），放在最前面以包含其他中间件的耗时
+    'library_management.middleware.RequestProfilingMiddleware',
+    # 按请求批量执行已提交的缓存失效
+    'library_management.middleware.CacheInvalidationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -30,6 +34,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # 页面缓存，需在 AuthenticationMiddleware 之后
+    'library_management.middleware.PageCacheMiddleware',
 ]
 
 ROOT_URLCONF = 'library_management.urls'
@@ -114,6 +120,52 @@ DEFAULT_FROM_EMAIL = '3622075226@qq.com'  # 默认发件人邮箱
 CACHE_DEFAULT_TIMEOUT = 300  # 默认5分钟
 CACHE_LONG_TIMEOUT = 1800  # 30分钟，用于相对稳定的数据
 CACHE_SHORT_TIMEOUT = 60  # 1分钟，用于频繁变化的数据
+CACHE_MAX_SIZE = 1000  # 最大缓存项数
+# 缓存字节预算（按序列化大小估算），设置后按 GDSF 策略淘汰大而少用的缓存项；None 表示不限制
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+# 存储后端：'locmem' 为进程内缓存；'sharded' 为按键分段加锁的进程内缓存，适合多线程服务器；
+# 多 worker 部署（如 gunicorn）请使用 'file'，同一主机上的所有进程共享一个 SQLite 缓存文件，
+# 失效和统计对所有进程生效
+CACHE_BACKEND = 'locmem'
+CACHE_SHARDS = 8  # 'sharded' 后端的分段数
+CACHE_SWEEP_INTERVAL = 30  # 后台清理过期缓存的间隔（秒），0 表示只在读取时惰性删除
+CACHE_FILE_PATH = BASE_DIR / 'cache_data' / 'enhanced_cache.sqlite3'
+
+# 页面缓存（PageCacheMiddleware）：路径 -> 配置
+#   timeout: 缓存时间（秒）；query_params: 是否按 GET 参数区分；tags: 依赖的缓存标签，相关模型变更时失效
+PAGE_CACHE_PAGES = {
+    '/': {'timeout': 600},  # 欢迎页
+    '/home/': {'timeout': 300, 'tags': ['model:Book', 'model:Category', 'model:BorrowRecord']},  # 首页
+    '/books/': {'timeout': 300, 'tags': ['model:Book', 'model:Category', 'model:BorrowRecord']},  # 图书首页
+    '/books/list/': {'timeout': 180, 'query_params': True, 'tags': ['model:Book', 'model:Category']},  # 图书列表
+}
+# 页面缓存的区分维度：'auth'（匿名/已登录）、'role'（匿名/角色）、'user'（每个用户一份）
+PAGE_CACHE_VARY_ON = ['role']
+# 模板片段缓存（{% cachefragment %}）的过期时间（秒），键随对象 updated_at 变化，无需手动失效
+FRAGMENT_CACHE_TIMEOUT = 3600
+# 请求分析（RequestProfilingMiddleware）：关闭后中间件不加载，也不包装模板渲染
+REQUEST_PROFILING = DEBUG
+# 被分析的请求比例（0~1），未抽中的请求不计时、不返回 Server-Timing；生产环境开启时宜调低
+REQUEST_PROFILE_SAMPLE_RATE = 1.0
+# 请求分析：每个视图保留的最近耗时样本数，用于计算 p50/p95/p99
+REQUEST_PROFILE_SAMPLES = 1000
+# 分页总数估算：未过滤的列表行数（来自 sqlite_stat1 / pg_class.reltuples 统计信息）不少于该值时
+# 直接使用估算值并显示"约 N 条"，不执行 COUNT(*)；None 表示总是精确计数
+PAGINATION_ESTIMATE_COUNT_ABOVE = 100000
+# 图书列表返回第 N 页后在后台预取第 N+1/N-1 页；待执行的预取任务数上限（超出时丢弃）和工作线程数
+PAGINATION_PREFETCH = True
+PAGINATION_PREFETCH_MAX_PENDING = 16
+PAGINATION_PREFETCH_WORKERS = 2
+# 图书全文搜索（books/search.py）最多返回的结果数，结果按相关度排序
+SEARCH_MAX_RESULTS = 1000
+# 搜索建议索引（books/suggest.py）读取其他进程写入的间隔（秒）
+SUGGEST_INDEX_SYNC_INTERVAL = 30
+# 对比全部图书ID、移除其他进程删除的图书的间隔（秒）
+SUGGEST_INDEX_FULL_SYNC_INTERVAL = 600
+# 是否在进程内维护搜索建议索引（加载 WSGI 应用时构建一次），关闭后建议接口改用数据库全文索引
+SUGGEST_INDEX_ENABLED = True
+# 进程内索引最多容纳的图书数（每本约 420 字节），超过时不构建索引，同样改用全文索引
+SUGGEST_INDEX_MAX_BOOKS = 200000
 
 # CSRF配置
 CSRF_TRUSTED_ORIGINS = [
@@ -7,7 +7,11 @@ from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
 from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
+from django.utils import timezone
 from .cache import cache, CACHE_KEY_HOME_STATS, CACHE_KEY_POPULAR_BOOKS
+from .cache_backends import namespace_of
+from .middleware import request_profiles
+from .pagination import page_prefetcher
 
 
 def is_admin(user):
@@ -22,10 +26,7 @@ def cache_stats(request):
     stats = cache.get_stats()
 
     # 获取缓存大小信息
-    try:
-        cache_size = len(cache._cache)
-    except:
-        cache_size = 0
+    cache_size = stats.get('current_size', 0)
 
     # 测试缓存操作
     test_key = 'cache_test_key'
@@ -43,6 +44,8 @@ def cache_stats(request):
     context = {
         'stats': stats,
         'cache_size': cache_size,
+        'request_profiles': request_profiles.summary(),
+        'prefetch_stats': page_prefetcher.get_stats(),
         'test_result': {
             'set_success': cache.get(test_key) is not None,
             'get_success': retrieved_value == test_value,
@@ -93,7 +96,8 @@ def cache_health_check(request):
     health_data = {
         'status': 'healthy',
         'stats': cache.get_stats(),
-        'timestamp': str(cache._lru.get('last_access', 0)) if hasattr(cache, '_lru') else 'N/A'
+        'backend': cache.backend.name,
+        'timestamp': timezone.now().isoformat()
     }
 
     # 执行基本的缓存操作测试
@@ -132,28 +136,26 @@ def cache_inspector(request):
     cache_keys = []
 
     try:
-        if hasattr(cache, '_cache'):
-            cache_keys = list(cache._cache.keys())
-    except:
+        cache_keys = cache.keys()
+    except Exception:
         pass
 
-    # 按命名空间分组
+    # 按命名空间分组（去掉键中的命名空间代数标记，例如 'books#3:xxx' -> 'books'）
     namespaced_keys = {}
     for key in cache_keys:
-        if ':' in key:
-            namespace = key.split(':', 1)[0]
-            if namespace not in namespaced_keys:
-                namespaced_keys[namespace] = []
-            namespaced_keys[namespace].append(key)
-        else:
-            if 'global' not in namespaced_keys:
-                namespaced_keys['global'] = []
-            namespaced_keys['global'].append(key)
+        namespaced_keys.setdefault(namespace_of(key), []).append(key)
+
+    stats = cache.get_stats()
+    namespace_bytes = stats.get('namespace_bytes', {})
 
     context = {
         'namespaced_keys': namespaced_keys,
+        'namespace_sections': [
+            (namespace, keys, namespace_bytes.get(namespace, 0))
+            for namespace, keys in namespaced_keys.items()
+        ],
         'total_keys': len(cache_keys),
-        'stats': cache.get_stats()
+        'stats': stats
     }
 
     return render(request, 'cache/inspector.html', context)
\ No newline at end of file
@@ -4,4 +4,13 @@ from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'library_management.settings')
 
-application = get_wsgi_application()
\ No newline at end of file
+application = get_wsgi_application()
+
+# 加载应用时构建一次搜索建议索引：gunicorn --preload 等先加载再 fork 的部署中，
+# 各 worker 继承主进程构建好的索引，不必在处理请求时各自查询数据库重建
+from django.db import connections  # noqa: E402
+from books.suggest import book_suggester  # noqa: E402
+
+book_suggester.build()
+# 构建时打开的数据库连接不能被 fork 出的 worker 共用
+connections.close_all()
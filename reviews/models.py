@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 from books.models import Book
+from library_management.cache import connect_cache_tags
 
 User = get_user_model()
 
@@ -35,4 +36,8 @@ class Review(models.Model):
         return dict(self.RATING_CHOICES).get(self.rating, '')
 
     def get_rating_display(self):
-        return self.rating_stars
\ No newline at end of file
+        return self.rating_stars
+
+
+# 评论变更后按标签失效相关缓存（book:<id>、user:<id>、model:Review）
+connect_cache_tags(Review)
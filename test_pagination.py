@@ -15,7 +15,7 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'library_management.settings')
 django.setup()
 
 from books.models import Book
-from library_management.pagination import get_paginated_books, OptimizedPaginator, SmartPagination
+from library_management.pagination import get_paginated_books, OptimizedPaginator, SmartPagination, CursorPagination
 from django.core.paginator import Paginator
 
 
@@ -178,11 +178,47 @@ def test_page_range_display():
         print(f"{description}: 页码 {page}/{total} -> 显示 {len(page_range)} 页: {list(page_range)[:10]}...")
 
 
+
+def test_cursor_pagination():
+    """测试多列游标分页：向后、向前翻页与传统分页顺序一致"""
+    print("\n=== 游标分页测试 ===")
+
+    queryset = Book.objects.all().order_by('title', 'id')
+    expected = list(queryset.values_list('id', flat=True))
+    paginator = CursorPagination(queryset, per_page=2)
+    print(f"排序字段: {paginator.ordering}")
+
+    # 向后翻页
+    forward = []
+    data = paginator.get_page_data()
+    while True:
+        forward.extend(book.id for book in data['object_list'])
+        if not data['has_next']:
+            break
+        data = paginator.get_page_data(data['next_cursor'])
+    print(f"向后翻页: {len(forward)} 条，共 {data['current_page']} 页")
+    assert forward == expected
+
+    # 向前翻页
+    backward = [book.id for book in data['object_list']]
+    while data['has_previous']:
+        data = paginator.get_page_data(data['prev_cursor'])
+        backward = [book.id for book in data['object_list']] + backward
+    print(f"向前翻页: {len(backward)} 条，回到第 {data['current_page']} 页")
+    assert backward == expected
+    assert data['current_page'] == 1
+
+    # 被篡改的游标按第一页处理
+    assert paginator.get_page_data('invalid-cursor')['current_page'] == 1
+    print("[游标] 签名校验正常")
+
+
 if __name__ == "__main__":
     try:
         test_pagination_performance()
         test_database_queries()
         test_page_range_display()
+        test_cursor_pagination()
         print("\n[成功] 所有测试完成！")
     except Exception as e:
         print(f"\n[错误] 测试过程中出现错误: {str(e)}")